@@ -0,0 +1,208 @@
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import JsonResponse
+
+from .metrics import registry
+
+# Контроль допуска: при всплеске запросов лишние отклоняются сразу, а не ждут
+# соединения с БД вместе со всеми. Для маршрута (имя маршрута и метод, настройка
+# QA_ADMISSION['ROUTES']) задаются:
+#   concurrency — сколько его запросов процесс выполняет одновременно, сверх — 503;
+#   rate/burst  — корзина токенов на клиента (key='client', IP) или на пользователя
+#                 (key='user_id': из URL, параметров или JSON-тела), сверх — 429;
+#   priority    — cheap | normal | expensive: какую долю общего лимита процесса
+#                 MAX_INFLIGHT может занять маршрут (PRIORITY_SHARE). Дорогие выборки
+#                 отклоняются первыми, дешевые чтения по id проходят до полного лимита.
+# Ответы 429/503 содержат Retry-After. Лимиты и корзины — на процесс: с N воркерами
+# общий предел в N раз больше. Отклонения считаются в метрике qa_admission_shed_total
+
+PRIORITIES = ('cheap', 'normal', 'expensive')
+MAX_BUCKETS = 10000
+
+
+class Rule:
+    def __init__(self, name: str, priority: str = 'normal', concurrency: int | None = None,
+                 rate: float | None = None, burst: float | None = None, key: str = 'client'):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Неизвестный приоритет {priority!r} для {name}")
+        if key not in ('client', 'user_id'):
+            raise ValueError(f"Неизвестный ключ {key!r} для {name}")
+        self.name = name
+        self.priority = priority
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or (rate and max(1.0, rate))
+        self.key = key
+
+
+class Controller:
+    def __init__(self, config: dict[str, Any]):
+        self._lock = threading.Lock()
+        self.max_inflight = int(config.get('MAX_INFLIGHT') or 0)
+        self.shares = {**{'cheap': 1.0, 'normal': 0.9, 'expensive': 0.5}, **config.get('PRIORITY_SHARE', {})}
+        self.retry_after = int(config.get('RETRY_AFTER') or 1)
+        self.trust_forwarded = bool(config.get('TRUST_X_FORWARDED_FOR'))
+        self.rules = {name: Rule(name, **options) for name, options in config.get('ROUTES', {}).items()}
+        self.default = Rule('*')
+        self.inflight = 0
+        self.route_inflight: dict[str, int] = {}
+        # ключ -> [токены, время последнего пополнения]
+        self.buckets: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+
+    # Правило "маршрут МЕТОД" важнее правила для маршрута целиком
+    def rule_for(self, route: str, method: str) -> Rule:
+        return self.rules.get(f'{route} {method}') or self.rules.get(route) or self.default
+
+    def client_key(self, request, view_kwargs: dict, rule: Rule) -> str:
+        if rule.key == 'user_id':
+            user_id = view_kwargs.get('user_id') or request.GET.get('user_id') or _body_user_id(request)
+            if user_id:
+                return f'user:{user_id}'
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR') if self.trust_forwarded else None
+        address = forwarded.split(',')[0].strip() if forwarded else request.META.get('REMOTE_ADDR', '')
+        return f'client:{address}'
+
+    # None — запрос допущен (слот нужно вернуть через release), иначе (статус, причина, Retry-After)
+    def admit(self, rule: Rule, key: str) -> tuple[int, str, int] | None:
+        now = time.monotonic()
+        with self._lock:
+            if rule.concurrency is not None and self.route_inflight.get(rule.name, 0) >= rule.concurrency:
+                return 503, 'concurrency', self.retry_after
+            if self.max_inflight and self.inflight >= self.max_inflight * self.shares[rule.priority]:
+                return 503, 'overload', self.retry_after
+            if rule.rate:
+                bucket_key = (rule.name, key)
+                bucket = self.buckets.get(bucket_key)
+                if bucket is None:
+                    bucket = self.buckets[bucket_key] = [rule.burst, now]
+                    if len(self.buckets) > MAX_BUCKETS:
+                        self.buckets.popitem(last=False)
+                else:
+                    self.buckets.move_to_end(bucket_key)
+                    bucket[0] = min(rule.burst, bucket[0] + (now - bucket[1]) * rule.rate)
+                    bucket[1] = now
+                if bucket[0] < 1:
+                    return 429, 'rate', max(1, math.ceil((1 - bucket[0]) / rule.rate))
+                bucket[0] -= 1
+            self.inflight += 1
+            self.route_inflight[rule.name] = self.route_inflight.get(rule.name, 0) + 1
+        return None
+
+    def release(self, rule: Rule) -> None:
+        with self._lock:
+            self.inflight -= 1
+            self.route_inflight[rule.name] -= 1
+
+
+def _body_user_id(request) -> str | None:
+    if request.content_type != 'application/json':
+        return None
+    try:
+        if int(request.META.get('CONTENT_LENGTH') or 0) > 65536:
+            return None
+        data = json.loads(request.body or b'null')
+    except ValueError:
+        return None
+    return str(data['user_id']) if isinstance(data, dict) and data.get('user_id') else None
+
+
+_controller: Controller | None = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> Controller | None:
+    global _controller
+    config = getattr(settings, 'QA_ADMISSION', None) or {}
+    if not config.get('ENABLED', True):
+        return None
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = Controller(config)
+    return _controller
+
+
+@receiver(setting_changed)
+def _reset_controller(setting, **kwargs):
+    global _controller
+    if setting == 'QA_ADMISSION':
+        _controller = None
+
+
+def shed_response(status_code: int, reason: str, retry_after: int) -> JsonResponse:
+    message = "Слишком много запросов" if status_code == 429 else "Сервис перегружен, повторите позже"
+    response = JsonResponse(
+        {"success": False, "data": None, "message": message, "error": {"admission": reason}},
+        status=status_code,
+        json_dumps_params={'ensure_ascii': False},
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class AdmissionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Решение о допуске не блокирует — без перехода в поток в ASGI
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._finish(request, await self.get_response(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self._admit(request, view_kwargs)
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return self._admit(request, view_kwargs)
+
+    @staticmethod
+    def _admit(request, view_kwargs):
+        controller = get_controller()
+        if controller is None:
+            return None
+        route = request.resolver_match.view_name
+        rule = controller.rule_for(route, request.method)
+        decision = controller.admit(rule, controller.client_key(request, view_kwargs, rule))
+        if decision is None:
+            request._qa_admission = (controller, rule)
+            return None
+        status_code, reason, retry_after = decision
+        registry.inc('qa_admission_shed_total', route=route, reason=reason)
+        return shed_response(status_code, reason, retry_after)
+
+    # Слот возвращается после ответа, у потоковых ответов — при закрытии ответа
+    # сервером (response.close()): и когда поток дочитан, и когда клиент отключился
+    # раньше, и когда поток не начинали читать
+    @staticmethod
+    def _finish(request, response):
+        admitted = getattr(request, '_qa_admission', None)
+        if admitted is None:
+            return response
+        del request._qa_admission
+        controller, rule = admitted
+
+        if response.streaming:
+            response._resource_closers.append(lambda: controller.release(rule))
+        else:
+            controller.release(rule)
+        return response
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QaApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'qa_api'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
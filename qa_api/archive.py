@@ -0,0 +1,210 @@
+import functools
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Exists, OuterRef
+from django.utils.dateparse import parse_datetime
+
+from . import cache
+from .models import Answer, ArchiveSegment, Question, adjust_answers_count
+from .readers import ANSWER_VALUES, QUESTION_VALUES, answer_dicts
+from .shards import get_on_shards
+from .streaming import gzip_chunks, ndjson_chunks
+
+# Архив холодных данных: старые ответы и вопросы без свежей активности переносятся
+# из горячих таблиц в сжатые NDJSON-сегменты (gzip) в QA_ARCHIVE_DIR. Файл сегмента
+# пишется один раз и больше не меняется; диапазон id, число строк и sha256 каждого
+# сегмента хранятся в манифесте ArchiveSegment. Строки в сегменте — в том же виде,
+# что отдает API, поэтому чтение из архива не требует сериализации
+SEGMENT_SIZE = 10000
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, 'QA_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# Записывает сегмент атомарно (временный файл + fsync + rename) и возвращает
+# несохраненную запись манифеста
+def write_segment(kind: str, rows: list[dict[str, Any]]) -> ArchiveSegment:
+    first_id, last_id = rows[0]['id'], rows[-1]['id']
+    filename = f'{kind}/{kind}-{first_id:012d}-{last_id:012d}-{time.time_ns()}.ndjson.gz'
+    path = archive_dir() / filename
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + '.tmp')
+
+    digest = hashlib.sha256()
+    size = 0
+    with open(temporary, 'wb') as output:
+        for chunk in gzip_chunks(ndjson_chunks(rows)):
+            output.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(temporary, path)
+    _fsync_dir(path.parent)
+
+    created = [row['created_at'] for row in rows]
+    return ArchiveSegment(
+        kind=kind,
+        filename=filename,
+        first_id=first_id,
+        last_id=last_id,
+        first_created_at=min(created),
+        last_created_at=max(created),
+        rows=len(rows),
+        size_bytes=size,
+        sha256=digest.hexdigest(),
+    )
+
+
+def _move(kind: str, rows: list[dict[str, Any]], delete) -> ArchiveSegment:
+    segment = write_segment(kind, rows)
+    try:
+        segment.save()
+        delete([row['id'] for row in rows])
+    except BaseException:
+        (archive_dir() / segment.filename).unlink(missing_ok=True)
+        raise
+    return segment
+
+
+def _delete_answers(rows: list[dict[str, Any]], using: str):
+    def delete(ids: list[int]) -> None:
+        Answer.all_objects.filter(pk__in=ids)._raw_delete(using)
+        # Публичный answers_count не меняется: архивные ответы по-прежнему ответы
+        # вопроса и читаются по id. Их число ведет archived_answers_count, чтобы
+        # rebuild_answers_count сверял answers_count с горячей таблицей и архивом.
+        # Архивация не считается активностью, last_activity_at почти не меняется
+        deltas = Counter(row['question'] for row in rows)
+        adjust_answers_count(deltas, using=using, touch=False, field='archived_answers_count')
+        cache.invalidate_questions(deltas, using=using)
+    return delete
+
+
+def _delete_questions(using: str):
+    def delete(ids: list[int]) -> None:
+        Question.all_objects.filter(pk__in=ids)._raw_delete(using)
+        cache.invalidate_questions(ids, using=using)
+    return delete
+
+
+# Переносит в архив ответы шарда using старше cutoff, по segment_size строк на сегмент.
+# Каждый сегмент — отдельная транзакция: строки блокируются, файл пишется,
+# затем в той же транзакции создается запись манифеста и строки удаляются.
+# Манифест хранится в default: для других шардов он сохраняется до удаления строк,
+# и при сбое между ними строки попадут в архив повторно — find_archived это не мешает
+def archive_answers(cutoff: datetime, segment_size: int = SEGMENT_SIZE,
+                    using: str = DEFAULT_DB_ALIAS) -> Iterator[ArchiveSegment]:
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(
+                Answer.objects.using(using).filter(created_at__lt=cutoff, pk__gt=last_pk)
+                .select_for_update(of=('self',))
+                .order_by('pk')
+                .values(*ANSWER_VALUES)[:segment_size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1]['id']
+            rows = answer_dicts(rows)
+            segment = _move('answers', rows, _delete_answers(rows, using))
+        yield segment
+
+
+# Полностью холодные вопросы: созданы и последний раз менялись до cutoff и не
+# получили ни одного ответа. Вопрос с архивными ответами остается в горячей таблице:
+# архивный вопрос отдается из архива только с пустым списком ответов (find_archived)
+def cold_questions(cutoff: datetime):
+    return Question.objects.filter(created_at__lt=cutoff, last_activity_at__lt=cutoff, answers_count=0).filter(
+        ~Exists(Answer.all_objects.filter(question=OuterRef('pk')))
+    )
+
+
+def archive_questions(cutoff: datetime, segment_size: int = SEGMENT_SIZE,
+                      using: str = DEFAULT_DB_ALIAS) -> Iterator[ArchiveSegment]:
+    last_pk = 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(
+                cold_questions(cutoff).using(using).filter(pk__gt=last_pk)
+                .select_for_update()
+                .order_by('pk')
+                .values(*QUESTION_VALUES)[:segment_size]
+            )
+            if not rows:
+                return
+            last_pk = rows[-1]['id']
+            segment = _move('questions', rows, _delete_questions(using))
+        yield segment
+
+
+_DATETIME_FIELDS = ('created_at', 'last_activity_at')
+
+
+def _decode(row: dict[str, Any]) -> dict[str, Any]:
+    for name in _DATETIME_FIELDS:
+        if name in row:
+            row[name] = parse_datetime(row[name])
+    if 'user_id' in row:
+        row['user_id'] = uuid.UUID(row['user_id'])
+    return row
+
+
+# Последние прочитанные сегменты держим в памяти процесса: {id: строка}
+@functools.lru_cache(maxsize=8)
+def _load_segment(filename: str, sha256: str) -> dict[int, dict[str, Any]]:
+    data = (archive_dir() / filename).read_bytes()
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ArchiveError(f"Контрольная сумма сегмента {filename} не совпадает с манифестом")
+    rows = (json.loads(line) for line in gzip.decompress(data).splitlines() if line)
+    return {row['id']: _decode(row) for row in rows}
+
+
+# Строка из архива в формате API или None. Кандидаты выбираются по манифесту
+# (диапазоны id разных запусков могут пересекаться), затем ищем в самих сегментах
+def find_archived(kind: str, pk: int) -> dict[str, Any] | None:
+    segments = (
+        ArchiveSegment.objects.filter(kind=kind, first_id__lte=pk, last_id__gte=pk)
+        .order_by('-first_id')
+        .values_list('filename', 'sha256')
+    )
+    for filename, sha256 in segments:
+        row = _load_segment(filename, sha256).get(pk)
+        if row is not None:
+            return dict(row)
+    return None
+
+
+# Архивный ответ виден, пока жив его вопрос: удаленный (помеченный или уже
+# физически удаленный purge_deleted) вопрос скрывает и архивные ответы, как горячие.
+# Вопрос архивного ответа всегда в горячей таблице (cold_questions)
+def find_archived_answer(pk: int) -> dict[str, Any] | None:
+    row = find_archived('answers', pk)
+    if row is None:
+        return None
+    alias, _ = get_on_shards(Question.objects.values_list('pk', flat=True), row['question'])
+    return row if alias is not None else None
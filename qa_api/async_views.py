@@ -0,0 +1,160 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import reverse
+from django.views import View
+from rest_framework import status
+
+from . import cache as qa_cache
+from .archive import find_archived, find_archived_answer
+from .conditional import aget_question_stamp, not_modified, page_etag, question_etag, set_validators
+from .logqueue import log_event
+from .models import Answer, Question
+from .pagination import AnswerKeysetPagination, InvalidCursor, QuestionKeysetPagination
+from .readers import ANSWER_VALUES, QUESTION_VALUES, answer_dicts, question_detail_dict, question_dicts
+from .renderers import FastJSONRenderer
+from .shards import aget_on_shards, on_shard, read_querysets
+
+logger = logging.getLogger(__name__)
+
+# Асинхронные варианты read-эндпоинтов на async ORM (afirst, async for).
+# Под ASGI (qa_project.asgi) один воркер обслуживает много медленных клиентов
+# одновременно, не занимая поток на каждый запрос. Ответы совпадают с синхронными
+# представлениями из views.py
+
+
+def json_response(success=True, data=None, message=None, error=None, status_code=200) -> HttpResponse:
+    body = FastJSONRenderer().render({
+        "success": success,
+        "data": data,
+        "message": message,
+        "error": error
+    })
+    return HttpResponse(body, status=status_code, content_type='application/json')
+
+
+def invalid_cursor_response(exc: InvalidCursor) -> HttpResponse:
+    return json_response(
+        success=False,
+        error={"cursor": str(exc)},
+        message="Некорректные параметры пагинации",
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+
+# GET /api/async/questions/
+class AsyncQuestionListView(View):
+    pagination_class = QuestionKeysetPagination
+
+    async def get(self, request):
+        conditional = 'count' not in request.GET
+
+        async def build():
+            paginator = self.pagination_class()
+            page = await paginator.apaginate_querysets(read_querysets(Question.objects.values(*QUESTION_VALUES)), request)
+            etag = self.get_page_etag(request, paginator, [(row['id'], row['last_activity_at']) for row in page])
+            return paginator.get_paginated_data(question_dicts(page)), etag
+
+        try:
+            if conditional and request.headers.get('If-None-Match'):
+                paginator = self.pagination_class()
+                stamps = await paginator.apaginate_querysets(
+                    read_querysets(Question.objects.values('id', 'created_at', 'last_activity_at')), request
+                )
+                etag = self.get_page_etag(
+                    request, paginator, [(row['id'], row['last_activity_at']) for row in stamps]
+                )
+                response = not_modified(request, etag)
+                if response is not None:
+                    return response
+
+            key = await qa_cache.aquestion_list_key(request.build_absolute_uri())
+            data, etag = await qa_cache.aget_or_build(key, build)
+        except InvalidCursor as exc:
+            return invalid_cursor_response(exc)
+
+        response = json_response(
+            success=True,
+            data=data,
+            message="Список вопросов успешно получен"
+        )
+        if conditional:
+            set_validators(response, etag)
+        return response
+
+    @staticmethod
+    def get_page_etag(request, paginator, rows) -> str:
+        return page_etag(rows, paginator.has_next, paginator.has_previous, request.get_full_path())
+
+
+# GET /api/async/questions/{id}/
+class AsyncQuestionDetailView(View):
+    async def get(self, request, pk: int):
+        if request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since'):
+            stamp = await aget_question_stamp(pk)
+            if stamp is not None:
+                response = not_modified(request, question_etag(pk, stamp), stamp)
+                if response is not None:
+                    return response
+
+        async def build():
+            using, question = await aget_on_shards(Question.objects.values(*QUESTION_VALUES), pk)
+            if question is None:
+                archived = await sync_to_async(find_archived)('questions', pk)
+                if archived:
+                    return question_detail_dict(archived, [], None), archived['last_activity_at']
+                log_event(logger, 'question_not_found', "Попытка доступа к несуществующему вопросу",
+                          level=logging.WARNING, question_id=pk)
+                return None
+            paginator = AnswerKeysetPagination()
+            answers_url = request.build_absolute_uri(reverse('qa_api:answer-create', args=[pk]))
+            answers = await paginator.apaginate_first_page(
+                on_shard(Answer.objects.of_live_question(pk), using).values(*ANSWER_VALUES), answers_url
+            )
+            data = question_detail_dict(question, answers, paginator.get_next_link())
+            return data, question['last_activity_at']
+
+        key = await qa_cache.aquestion_key(pk, request.build_absolute_uri())
+        cached = await qa_cache.aget_or_build(key, build)
+        if cached is None:
+            return json_response(
+                success=False,
+                error={"id": f"Вопрос с id={pk} не найден"},
+                message="Вопрос не найден",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+
+        data, stamp = cached
+        response = json_response(
+            success=True,
+            data=data,
+            message="Детальная информация о вопросе успешно получена"
+        )
+        return set_validators(response, question_etag(pk, stamp), stamp)
+
+
+# GET /api/async/answers/{id}/
+class AsyncAnswerDetailView(View):
+    async def get(self, request, pk: int):
+        _, answer = await aget_on_shards(Answer.objects.values(*ANSWER_VALUES), pk)
+        if answer is not None:
+            [data] = answer_dicts([answer])
+        else:
+            data = await sync_to_async(find_archived_answer)(pk)
+        if data is None:
+            log_event(logger, 'answer_not_found', "Попытка доступа к несуществующему ответу",
+                      level=logging.WARNING, answer_id=pk)
+            return json_response(
+                success=False,
+                error={"answer_id": f"Ответ с id={pk} не найден"},
+                message="Ответ не найден",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+
+        return json_response(
+            success=True,
+            data=data,
+            message="Ответ получен",
+            status_code=status.HTTP_200_OK
+        )
@@ -0,0 +1,280 @@
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
+from typing import Any, Callable
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as qa_cache
+from .models import Answer, Question, new_answer_id
+from .shards import group_by_shard, shard_aliases
+
+# Бенчмарк эндпоинтов в процессе: запросы идут через тестовый клиент Django со всеми
+# middleware, без сети. Для каждого маршрута из qa_api/urls.py меряются задержка
+# (p50/p99), число и время запросов к БД (на всех алиасах), размер ответа и пик
+# памяти. Бюджет запросов к БД задан для каждого маршрута и не зависит от объема
+# данных: N+1 или выборка всей таблицы сразу выводят маршрут за бюджет. Этими же
+# бюджетами проверяют тесты (test_query_budgets), а отчет в JSON сравнивается между
+# релизами (python manage.py bench --compare old.json)
+
+BENCH_TERM = "производительность"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+# Считает запросы и их время на всех БД через connection.execute_wrapper
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+    def __enter__(self) -> 'QueryCounter':
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+# Вопросы с answers_per_question ответами каждый, пачками bulk_create по шардам.
+# Возвращает id и значения, которые подставляются в пути маршрутов
+def seed_bench_data(questions: int, answers_per_question: int, batch_size: int = 1000,
+                    seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)
+    users = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(max(1, questions // 10))]
+    now = timezone.now()
+    question_rows = [
+        Question(
+            text=f"Вопрос {index} про {BENCH_TERM} и индексы",
+            answers_count=answers_per_question,
+            created_at=now - timedelta(minutes=questions - index),
+        )
+        for index in range(questions)
+    ]
+    answer_rows = [
+        Answer(
+            id=new_answer_id(question.pk),
+            question_id=question.pk,
+            user_id=users[(index + number) % len(users)],
+            text=f"Ответ {number} на вопрос {index}: {BENCH_TERM}",
+            created_at=question.created_at + timedelta(seconds=number + 1),
+        )
+        for index, question in enumerate(question_rows)
+        for number in range(answers_per_question)
+    ]
+    for alias, rows in group_by_shard(question_rows, key=lambda row: row.pk).items():
+        Question.objects.using(alias).bulk_create(rows, batch_size=batch_size)
+    for alias, rows in group_by_shard(answer_rows, key=lambda row: row.question_id).items():
+        Answer.objects.using(alias).bulk_create(rows, batch_size=batch_size)
+    qa_cache.invalidate_question_list()
+
+    return {
+        'question': question_rows[-1].pk,
+        'answer': answer_rows[-1].pk if answer_rows else None,
+        'user': answer_rows[-1].user_id if answer_rows else users[0],
+    }
+
+
+def _fresh_question(answers: int = 0) -> Question:
+    question = Question.objects.create(text="Вопрос для удаления")
+    for number in range(answers):
+        Answer.objects.create(question=question, user_id=uuid.uuid4(), text=f"Ответ {number}")
+    return question
+
+
+class BenchCase:
+    """Маршрут для прогона: request(data) возвращает путь и тело запроса.
+
+    Подготовка (например, создание удаляемого вопроса) выполняется в request(),
+    вне замера. budget=None — маршрут по смыслу читает все строки (выгрузка),
+    бюджет не проверяется.
+    """
+
+    def __init__(self, label: str, route: str, budget: int | None, method: str = 'get',
+                 request: Callable[[dict], tuple[str, Any]] | None = None, params: str = ''):
+        self.label = label
+        self.route = route
+        self.budget = budget
+        self.method = method
+        self._request = request or (lambda data: (reverse(f'qa_api:{route}'), None))
+        self.params = params
+
+    def request(self, data: dict) -> tuple[str, Any]:
+        path, body = self._request(data)
+        return path + self.params, body
+
+
+def _detail(route: str, key: str, prepare: Callable[[dict], int] | None = None):
+    def request(data):
+        pk = prepare(data) if prepare else data[key]
+        return reverse(f'qa_api:{route}', args=[pk]), None
+    return request
+
+
+def _post(route: str, body: Callable[[dict], Any], args: Callable[[dict], list] | None = None):
+    def request(data):
+        return reverse(f'qa_api:{route}', args=args(data) if args else None), body(data)
+    return request
+
+
+BENCH_CASES = [
+    BenchCase('question-list', 'question-list-create', 1, params='?page_size=20'),
+    BenchCase('question-list-count', 'question-list-create', 2, params='?page_size=20&count=exact'),
+    BenchCase('question-create', 'question-list-create', 1, 'post',
+              _post('question-list-create', lambda data: {"text": "Новый вопрос бенчмарка"})),
+    BenchCase('question-bulk-create', 'question-bulk-create', 3, 'post',
+              _post('question-bulk-create',
+                    lambda data: {"questions": [{"text": f"Пакетный вопрос {i}"} for i in range(50)]})),
+    BenchCase('question-bulk-delete', 'question-bulk-delete', 4, 'post',
+              _post('question-bulk-delete', lambda data: {"ids": [_fresh_question(2).pk]})),
+    BenchCase('question-detail', 'question-detail', 2,
+              request=_detail('question-detail', 'question')),
+    BenchCase('question-delete', 'question-detail', 4, 'delete',
+              _detail('question-detail', 'question', lambda data: _fresh_question(2).pk)),
+    BenchCase('answer-list', 'answer-create', 2,
+              request=_detail('answer-create', 'question'), params='?page_size=20'),
+    BenchCase('answer-create', 'answer-create', 5, 'post',
+              _post('answer-create', lambda data: {"user_id": str(data['user']), "text": "Новый ответ"},
+                    args=lambda data: [data['question']])),
+    BenchCase('answer-bulk-create', 'answer-bulk-create', 5, 'post',
+              _post('answer-bulk-create',
+                    lambda data: {"answers": [{"question": data['question'], "user_id": str(data['user']),
+                                               "text": f"Пакетный ответ {i}"} for i in range(50)]})),
+    BenchCase('answer-detail', 'answer-detail', 1, request=_detail('answer-detail', 'answer')),
+    BenchCase('answer-delete', 'answer-detail', 5, 'delete',
+              _detail('answer-detail', 'answer',
+                      lambda data: Answer.objects.filter(question=_fresh_question(1)).get().pk)),
+    BenchCase('user-answers', 'user-answers', 1,
+              request=_detail('user-answers', 'user'), params='?page_size=20&include_question=true'),
+    BenchCase('async-question-list', 'async-question-list', 1, params='?page_size=20'),
+    BenchCase('async-question-detail', 'async-question-detail', 2,
+              request=_detail('async-question-detail', 'question')),
+    BenchCase('async-answer-detail', 'async-answer-detail', 1,
+              request=_detail('async-answer-detail', 'answer')),
+    BenchCase('export', 'export', None),
+    BenchCase('search', 'search', 1, params=f'?q={BENCH_TERM}&type=questions,answers'),
+    BenchCase('stats', 'stats', 0),
+]
+
+
+def _send(client: Client, case: BenchCase, path: str, body: Any):
+    kwargs = {}
+    if body is not None:
+        kwargs = {'data': json.dumps(body), 'content_type': 'application/json'}
+    response = getattr(client, case.method)(path, **kwargs)
+    # Потоковые ответы читаются целиком — иначе запросы выгрузки не попадут в замер
+    return response, len(response.getvalue())
+
+
+# Один маршрут: iterations замеров задержки и запросов, затем отдельный прогон под
+# tracemalloc (он замедляет выполнение и исказил бы задержку). warm=False очищает
+# кэш перед каждым запросом, чтобы мерить путь до БД
+def run_case(case: BenchCase, data: dict, iterations: int = 20, warm: bool = False) -> dict[str, Any]:
+    client = Client()
+    latencies, queries, query_seconds = [], [], []
+    status_code = size = 0
+    for _ in range(iterations):
+        path, body = case.request(data)
+        # Без cookie закрепления за основной БД, которую ставят POST/DELETE
+        client.cookies.clear()
+        if not warm:
+            qa_cache.get_cache().clear()
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            response, size = _send(client, case, path, body)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+        query_seconds.append(counter.seconds)
+        status_code = response.status_code
+
+    path, body = case.request(data)
+    client.cookies.clear()
+    if not warm:
+        qa_cache.get_cache().clear()
+    tracemalloc.start()
+    try:
+        _send(client, case, path, body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'route': f'qa_api:{case.route}',
+        'method': case.method.upper(),
+        'status': status_code,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        'queries': max(queries, default=0),
+        # Запросы без id опрашивают каждый шард, поэтому бюджет растет с числом шардов
+        'query_budget': None if case.budget is None else case.budget * len(shard_aliases()),
+        'query_ms': round(statistics.fmean(query_seconds) * 1000, 3) if query_seconds else 0.0,
+        'bytes': size,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def over_budget(result: dict[str, Any]) -> bool:
+    return result['query_budget'] is not None and result['queries'] > result['query_budget']
+
+
+# Контроль допуска отключается: бенчмарк меряет обработку запроса, а не лимиты
+def run_bench(data: dict, cases: list[BenchCase] = BENCH_CASES, iterations: int = 20,
+              warm: bool = False) -> dict[str, dict[str, Any]]:
+    with override_settings(QA_ADMISSION={**settings.QA_ADMISSION, 'ENABLED': False}):
+        return {case.label: run_case(case, data, iterations, warm) for case in cases}
+
+
+def bench_meta(**params) -> dict[str, Any]:
+    return {
+        **params,
+        'database': connections['default'].vendor,
+        'shards': len(shard_aliases()),
+        'django': django.get_version(),
+        'python': platform.python_version(),
+    }
+
+
+# Сравнение с прошлым отчетом: изменение p50/p99 в процентах и запросов в штуках
+def compare_reports(old: dict, new: dict) -> dict[str, dict[str, Any]]:
+    diff = {}
+    for label, current in new['routes'].items():
+        previous = old.get('routes', {}).get(label)
+        if previous is None:
+            continue
+        diff[label] = {
+            'queries': current['queries'] - previous['queries'],
+            **{
+                key: round((current[key] - previous[key]) / previous[key] * 100, 1) if previous[key] else None
+                for key in ('p50_ms', 'p99_ms', 'peak_kb')
+            },
+        }
+    return diff
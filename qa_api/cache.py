@@ -0,0 +1,176 @@
+import hashlib
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .routers import reads_from_primary, sticky_seconds
+
+# Кэш сериализованных ответов списка и карточки вопроса.
+# Ключи версионируются: при изменении вопроса или его ответов версия меняется,
+# и старые записи просто перестают читаться (доживают до TIMEOUT). Версия
+# меняется сразу и еще раз после коммита транзакции — иначе параллельный
+# запрос мог бы положить в кэш данные, прочитанные до коммита, под новой версией.
+# По той же причине данные, прочитанные с реплики в течение окна задержки
+# репликации после смены версии, отдаются, но в кэш не кладутся
+CACHE_ALIAS = getattr(settings, 'QA_CACHE_ALIAS', 'default')
+
+LIST_VERSION_KEY = 'qa:questions:version'
+EPOCH_KEY = 'qa:question:epoch'
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else None,
+            }
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+# Ключ кэша вместе с версиями, из которых он построен
+class VersionedKey(str):
+    versions: tuple[int, ...] = ()
+
+    @classmethod
+    def build(cls, value: str, versions) -> 'VersionedKey':
+        key = cls(value)
+        key.versions = tuple(versions)
+        return key
+
+
+def _may_store(key: str) -> bool:
+    if reads_from_primary():
+        return True
+    settled_before = time.time_ns() - sticky_seconds() * 1_000_000_000
+    return all(version < settled_before for version in getattr(key, 'versions', ()))
+
+
+def _question_version_key(pk: int) -> str:
+    return f'qa:question:{pk}:version'
+
+
+def _versions(*keys: str) -> list[int]:
+    cache = get_cache()
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key, 0)
+        versions.append(found[key])
+    return versions
+
+
+async def _aversions(*keys: str) -> list[int]:
+    cache = get_cache()
+    found = await cache.aget_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            found[key] = await cache.aget(key, 0)
+        versions.append(found[key])
+    return versions
+
+
+def _bump(*keys: str, using: str | None = None) -> None:
+    def bump():
+        version = time.time_ns()
+        get_cache().set_many({key: version for key in keys}, timeout=None)
+
+    stats.incr('invalidations')
+    bump()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(bump, using=using)
+
+
+def _url_digest(url: str) -> str:
+    return hashlib.md5(url.encode()).hexdigest()
+
+
+def question_list_key(url: str) -> str:
+    [version] = _versions(LIST_VERSION_KEY)
+    return VersionedKey.build(f'qa:questions:{version}:{_url_digest(url)}', [version])
+
+
+def question_key(pk: int, url: str) -> str:
+    version, epoch = _versions(_question_version_key(pk), EPOCH_KEY)
+    return VersionedKey.build(f'qa:question:{pk}:{version}:{epoch}:{_url_digest(url)}', [version, epoch])
+
+
+async def aquestion_list_key(url: str) -> str:
+    [version] = await _aversions(LIST_VERSION_KEY)
+    return VersionedKey.build(f'qa:questions:{version}:{_url_digest(url)}', [version])
+
+
+async def aquestion_key(pk: int, url: str) -> str:
+    version, epoch = await _aversions(_question_version_key(pk), EPOCH_KEY)
+    return VersionedKey.build(f'qa:question:{pk}:{version}:{epoch}:{_url_digest(url)}', [version, epoch])
+
+
+# Возвращает значение из кэша или строит его; None не кэшируется
+def get_or_build(key: str, build: Callable[[], Any]) -> Any:
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        stats.incr('hits')
+        return value
+    stats.incr('misses')
+    value = build()
+    if value is not None and _may_store(key):
+        cache.set(key, value)
+    return value
+
+
+async def aget_or_build(key: str, build: Callable[[], Awaitable[Any]]) -> Any:
+    cache = get_cache()
+    value = await cache.aget(key)
+    if value is not None:
+        stats.incr('hits')
+        return value
+    stats.incr('misses')
+    value = await build()
+    if value is not None and _may_store(key):
+        await cache.aset(key, value)
+    return value
+
+
+def invalidate_question_list(using: str | None = None) -> None:
+    _bump(LIST_VERSION_KEY, using=using)
+
+
+def invalidate_questions(pks: Iterable[int], using: str | None = None) -> None:
+    _bump(LIST_VERSION_KEY, *(_question_version_key(pk) for pk in set(pks)), using=using)
+
+
+# Для массовых операций, когда id затронутых вопросов заранее неизвестны
+def invalidate_all_questions(using: str | None = None) -> None:
+    _bump(LIST_VERSION_KEY, EPOCH_KEY, using=using)
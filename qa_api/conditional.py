@@ -0,0 +1,52 @@
+import hashlib
+from datetime import datetime
+
+from django.http import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Question
+from .shards import on_shard, shard_for_id
+
+
+# Условные GET: версия вопроса — его last_activity_at, который меняется в том же
+# UPDATE, что и answers_count. Проверка If-None-Match / If-Modified-Since стоит
+# одного запроса по первичному ключу в шарде вопроса, без чтения ответов и сериализации
+
+def _stamp_queryset(pk: int):
+    queryset = on_shard(Question.objects.filter(pk=pk), shard_for_id(pk))
+    return queryset.order_by().values_list('last_activity_at', flat=True)
+
+
+def get_question_stamp(pk: int) -> datetime | None:
+    return _stamp_queryset(pk).first()
+
+
+async def aget_question_stamp(pk: int) -> datetime | None:
+    return await _stamp_queryset(pk).afirst()
+
+
+def question_etag(pk: int, stamp: datetime) -> str:
+    return quote_etag(f"q{pk}-{int(stamp.timestamp() * 1_000_000)}")
+
+
+# ETag страницы списка — хэш id и версий вопросов на ней
+def page_etag(rows: list[tuple[int, datetime]], *extra) -> str:
+    digest = hashlib.md5()
+    for pk, stamp in rows:
+        digest.update(f"{pk}:{stamp.timestamp()};".encode())
+    for value in extra:
+        digest.update(f"{value};".encode())
+    return quote_etag(f"p-{digest.hexdigest()}")
+
+
+def not_modified(request, etag: str, last_modified: datetime | None = None) -> HttpResponseBase | None:
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response: HttpResponseBase, etag: str, last_modified: datetime | None = None):
+    response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
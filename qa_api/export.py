@@ -0,0 +1,82 @@
+from datetime import datetime, time
+from typing import Any, Iterator
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Answer, Question
+from .shards import read_querysets
+
+EXPORT_TYPES = ('questions', 'answers')
+EXPORT_CHUNK_SIZE = 2000
+
+QUESTION_FIELDS = ('id', 'text', 'created_at', 'answers_count', 'archived_answers_count')
+ANSWER_FIELDS = ('id', 'question_id', 'user_id', 'text', 'created_at')
+
+
+# Граница периода: ISO 8601 дата-время или просто дата (начало суток)
+def parse_bound(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Некорректная дата: {value}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed
+
+
+def filter_period(queryset, since: datetime | None, until: datetime | None):
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+# Строки выгрузки: сначала вопросы, затем ответы. values_list().iterator() читает
+# таблицы порциями (в PostgreSQL — через серверный курсор), поэтому потребление
+# памяти не зависит от размера таблиц. Шарды выгружаются по очереди
+def export_rows(since: datetime | None = None, until: datetime | None = None,
+                types: tuple[str, ...] = EXPORT_TYPES,
+                chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    if 'questions' in types:
+        for questions in read_querysets(filter_period(Question.objects.all(), since, until)):
+            for question_id, text, created_at, answers_count, archived_answers_count in (
+                questions.order_by('pk').values_list(*QUESTION_FIELDS).iterator(chunk_size=chunk_size)
+            ):
+                yield {
+                    'type': 'question',
+                    'id': question_id,
+                    'text': text,
+                    'created_at': created_at,
+                    'answers_count': answers_count,
+                    'archived_answers_count': archived_answers_count,
+                }
+
+    if 'answers' in types:
+        for answers in read_querysets(filter_period(Answer.objects.all(), since, until)):
+            for answer_id, question_id, user_id, text, created_at in (
+                answers.order_by('pk').values_list(*ANSWER_FIELDS).iterator(chunk_size=chunk_size)
+            ):
+                yield {
+                    'type': 'answer',
+                    'id': answer_id,
+                    'question': question_id,
+                    'user_id': user_id,
+                    'text': text,
+                    'created_at': created_at,
+                }
+
+
+def parse_types(value: str | None) -> tuple[str, ...]:
+    if not value:
+        return EXPORT_TYPES
+    types = tuple(item.strip() for item in value.split(',') if item.strip())
+    unknown = [item for item in types if item not in EXPORT_TYPES]
+    if unknown or not types:
+        raise ValueError(f"Неизвестный тип записей: {', '.join(unknown) or value}")
+    return types
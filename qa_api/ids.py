@@ -0,0 +1,120 @@
+import fcntl
+import os
+import random
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Глобально уникальные id вопросов и ответов:
+#   | 43 бита: номер из общей последовательности | 10 бит: виртуальный шард |
+# Id не превышают 2^53 и точно представимы в JavaScript (Number.MAX_SAFE_INTEGER).
+# Виртуальный шард (0..1023) определяет физическую БД (shards.py). Ответ получает
+# виртуальный шард своего вопроса, поэтому по id ответа тоже известно, где он лежит.
+# Номера выдаются процессам блоками по ID_BLOCK_SIZE из одной последовательности,
+# поэтому id разных процессов и воркеров не совпадают; в пределах процесса id
+# возрастают. Источник последовательности:
+#   PostgreSQL — SEQUENCE qa_api_id_seq в БД default (миграция 0009): nextval не
+#                откатывается вместе с транзакцией, в которой вызван;
+#   SQLite     — файл-счетчик <имя БД>.ids под блокировкой flock, для БД в памяти —
+#                счетчик процесса.
+# Номера от SEED_COUNTER_BASE и выше зарезервированы за manage.py seed
+VSHARD_BITS = 10
+COUNTER_BITS = 43
+VIRTUAL_SHARDS = 1 << VSHARD_BITS
+MAX_SAFE_ID = (1 << (COUNTER_BITS + VSHARD_BITS)) - 1
+SEED_COUNTER_BASE = 1 << (COUNTER_BITS - 1)
+
+ID_BLOCK_SIZE = 1024
+ID_SEQUENCE = 'qa_api_id_seq'
+
+_lock = threading.Lock()
+_next = 0
+_end = 0
+_memory_counter = None
+
+
+def virtual_shard(pk: int) -> int:
+    return pk & (VIRTUAL_SHARDS - 1)
+
+
+def compose_id(counter: int, vshard: int) -> int:
+    return (counter << VSHARD_BITS) | vshard
+
+
+# Первый свободный номер: больше номеров всех строк ниже диапазона seed (строки,
+# созданные до перехода на этот формат, могут иметь id и выше 2^53 — с новыми они
+# не пересекаются)
+def first_free_counter(cursor) -> int:
+    limit = compose_id(SEED_COUNTER_BASE, 0)
+    cursor.execute(
+        "SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM qa_api_question WHERE id < %s "
+        "UNION ALL SELECT MAX(id) FROM qa_api_answer WHERE id < %s) AS ids",
+        [limit, limit],
+    )
+    (last,) = cursor.fetchone()
+    return 1 if last is None else (last >> VSHARD_BITS) + 1
+
+
+def _allocate_from_file(path: str, size: int) -> int:
+    with open(path, 'a+') as counter_file:
+        fcntl.flock(counter_file, fcntl.LOCK_EX)
+        counter_file.seek(0)
+        content = counter_file.read().strip()
+        if content:
+            start = int(content)
+        else:
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                start = first_free_counter(cursor)
+        counter_file.seek(0)
+        counter_file.truncate()
+        counter_file.write(str(start + size))
+        counter_file.flush()
+        os.fsync(counter_file.fileno())
+    return start
+
+
+def _allocate_block(size: int) -> int:
+    global _memory_counter
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s)", [ID_SEQUENCE])
+            (start,) = cursor.fetchone()
+        return start
+    if connection.vendor == 'sqlite' and not connection.is_in_memory_db():
+        return _allocate_from_file(f"{connection.settings_dict['NAME']}.ids", size)
+    if _memory_counter is None:
+        with connection.cursor() as cursor:
+            _memory_counter = first_free_counter(cursor)
+    start, _memory_counter = _memory_counter, _memory_counter + size
+    return start
+
+
+def _next_counter() -> int:
+    global _next, _end
+    with _lock:
+        if _next >= _end:
+            _next = _allocate_block(ID_BLOCK_SIZE)
+            _end = _next + ID_BLOCK_SIZE
+            if _end > SEED_COUNTER_BASE:
+                raise OverflowError("Исчерпан диапазон номеров id")
+        counter = _next
+        _next += 1
+        return counter
+
+
+def new_id(vshard: int | None = None) -> int:
+    if vshard is None:
+        vshard = random.randrange(VIRTUAL_SHARDS)
+    return compose_id(_next_counter(), vshard)
+
+
+# Дочерний процесс (воркер gunicorn после preload) не должен выдавать номера из
+# блока, полученного родителем, — он получит свой
+def _after_fork() -> None:
+    global _next, _end, _lock
+    _next = _end = 0
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,181 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler
+
+# Неблокирующий конвейер логирования: поток запроса только кладет запись в
+# ограниченную очередь, а форматирование и запись на диск/в консоль выполняет
+# фоновый поток пачками. При переполнении очереди записи отбрасываются
+# (drop_newest — новые, drop_oldest — самые старые), счетчик потерь доступен в dropped
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+
+_STOP = object()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, targets: list[str], maxsize: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.5, drop_policy: str = DROP_NEWEST):
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError(f"Неизвестная политика переполнения: {drop_policy}")
+        super().__init__(queue.Queue(maxsize))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._targets = self._resolve_targets(targets)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    # Приемники ищутся по имени среди уже созданных обработчиков. dictConfig создает
+    # обработчики в алфавитном порядке, поэтому имя очереди должно идти после них.
+    # Ссылки держим сами: реестр имен в logging слабый, а к логгерам приемники не привязаны
+    @staticmethod
+    def _resolve_targets(names: list[str]) -> list[logging.Handler]:
+        get_handler = getattr(logging, 'getHandlerByName', None) or logging._handlers.get
+        targets = []
+        for name in names:
+            handler = get_handler(name)
+            if handler is None:
+                raise ValueError(f"Обработчик логов '{name}' не найден")
+            targets.append(handler)
+        return targets
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='qa-log-writer', daemon=True)
+                self._thread.start()
+
+    # В дочернем процессе (воркеры gunicorn после preload) поток записи мастера
+    # не существует, а очередь могла остаться заблокированной — начинаем с чистой
+    def _after_fork(self) -> None:
+        self.queue = queue.Queue(self.queue.maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    # Сообщение не форматируется в потоке запроса — это делает фоновый поток
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.drop_policy == DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        self.dropped += 1
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._ensure_started()
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(record is _STOP for record in batch)
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                for handler in self._targets:
+                    self._write_batch(handler, records)
+            if stop:
+                return
+
+    # Для потоковых обработчиков пачка пишется одним write и одним flush
+    @staticmethod
+    def _write_batch(handler: logging.Handler, records: list[logging.LogRecord]) -> None:
+        records = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+        if not records:
+            return
+        if not isinstance(handler, logging.StreamHandler) or getattr(handler, 'stream', None) is None:
+            for record in records:
+                handler.handle(record)
+            return
+
+        lines = []
+        for record in records:
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        with handler.lock:
+            try:
+                handler.stream.write(''.join(lines))
+                handler.flush()
+            except Exception:
+                handler.handleError(records[-1])
+
+    # Дописывает накопленное и останавливает поток; вызывается при выходе процесса
+    def stop(self, timeout: float = 5.0) -> None:
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def close(self) -> None:
+        self.stop()
+        super().close()
+
+
+# Состояние очередей логирования процесса — для /api/stats/
+def queue_stats() -> dict[str, int]:
+    handlers = {
+        handler
+        for logger in (logging.getLogger(), logging.getLogger('qa_api'))
+        for handler in logger.handlers
+        if isinstance(handler, NonBlockingQueueHandler)
+    }
+    return {
+        'queued': sum(handler.queue.qsize() for handler in handlers),
+        'dropped': sum(handler.dropped for handler in handlers),
+    }
+
+
+class _EventFields:
+    def __init__(self, event: str, fields: dict):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return ' '.join([f'event={self.event}', *(f'{key}={value}' for key, value in self.fields.items())])
+
+
+# Одна структурированная запись на событие: "<сообщение> event=<имя> ключ=значение ...".
+# Строка собирается лениво (при форматировании в фоновом потоке), поля также
+# доступны форматтерам как record.event и record.fields
+def log_event(logger: logging.Logger, event: str, message: str,
+              level: int = logging.INFO, **fields) -> None:
+    if logger.isEnabledFor(level):
+        logger.log(level, '%s %s', message, _EventFields(event, fields),
+                   extra={'event': event, 'fields': fields}, stacklevel=2)
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+
+from qa_api.archive import SEGMENT_SIZE, archive_answers, archive_questions, archive_dir, cold_questions
+from qa_api.models import Answer, ArchiveSegment
+from qa_api.shards import shard_aliases
+
+
+# python manage.py archive_cold --older-than-days 365 [--segment-size N] [--skip-questions] [--dry-run]
+# Переносит ответы старше окна хранения и полностью холодные вопросы в сжатые
+# сегменты архива; ответы из архива по-прежнему доступны через GET /api/answers/{id}/
+class Command(BaseCommand):
+    help = "Архивирует старые ответы и холодные вопросы в сжатые сегменты"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, required=True,
+                            help="Окно хранения в горячих таблицах, дней")
+        parser.add_argument('--segment-size', type=int, default=SEGMENT_SIZE,
+                            help="Строк в одном сегменте")
+        parser.add_argument('--skip-questions', action='store_true',
+                            help="Не архивировать вопросы")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Только посчитать, что будет перенесено")
+
+    def handle(self, *args, **options):
+        if options['older_than_days'] <= 0:
+            raise CommandError("--older-than-days должен быть положительным")
+        if options['segment_size'] <= 0:
+            raise CommandError("--segment-size должен быть положительным")
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+
+        if options['dry_run']:
+            answers = sum(
+                Answer.objects.using(alias).filter(created_at__lt=cutoff).count() for alias in shard_aliases()
+            )
+            self.stdout.write(f"Ответов старше {cutoff:%Y-%m-%d}: {answers}")
+            if not options['skip_questions']:
+                # Вопросы, которые станут холодными после переноса их ответов, здесь не учитываются
+                questions = sum(cold_questions(cutoff).using(alias).count() for alias in shard_aliases())
+                self.stdout.write(f"Холодных вопросов без ответов: {questions}")
+            return
+
+        self.stdout.write(f"Каталог архива: {archive_dir()}")
+        totals = {}
+        steps = [('answers', archive_answers)]
+        if not options['skip_questions']:
+            steps.append(('questions', archive_questions))
+        for kind, archive in steps:
+            rows = 0
+            for alias in shard_aliases():
+                for segment in archive(cutoff, options['segment_size'], using=alias):
+                    rows += segment.rows
+                    self.stdout.write(
+                        f"{segment.filename}: {segment.rows} строк, {segment.size_bytes} байт"
+                    )
+            totals[kind] = rows
+
+        archived = ArchiveSegment.objects.aggregate(rows=Sum('rows'), size=Sum('size_bytes'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Перенесено ответов: {totals.get('answers', 0)}, вопросов: {totals.get('questions', 0)}. "
+            f"Всего в архиве: {archived['rows'] or 0} строк, {archived['size'] or 0} байт"
+        ))
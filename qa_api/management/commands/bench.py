@@ -0,0 +1,113 @@
+import json
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from qa_api.bench import BENCH_CASES, bench_meta, compare_reports, over_budget, run_bench, seed_bench_data
+from qa_api.shards import shard_aliases
+
+
+# python manage.py bench [--questions N] [--answers M] [--iterations K] [--route label ...]
+#                        [--warm] [--output report.json] [--compare old.json] [--keep]
+# Заполняет БД N вопросами по M ответов, прогоняет все маршруты qa_api и печатает
+# p50/p99, число запросов к БД против бюджета и пик памяти. Данные создаются в
+# транзакции, которая в конце откатывается (--keep оставляет их). Команда завершается
+# ошибкой, если маршрут превысил бюджет запросов. Локально — на SQLite:
+#   DB_ENGINE=django.db.backends.sqlite3 DB_NAME=bench.sqlite3 python manage.py migrate
+#   DB_ENGINE=django.db.backends.sqlite3 DB_NAME=bench.sqlite3 python manage.py bench
+# Без --warm кэш очищается перед каждым запросом — запускать на отдельном кэше
+class Command(BaseCommand):
+    help = "Бенчмарк эндпоинтов: задержка, запросы к БД против бюджета и память"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=1000, help="Сколько вопросов создать")
+        parser.add_argument('--answers', type=int, default=10, help="Ответов на каждый вопрос")
+        parser.add_argument('--iterations', type=int, default=20, help="Запросов на каждый маршрут")
+        parser.add_argument('--route', action='append', dest='routes', metavar='LABEL',
+                            help="Прогнать только эти маршруты (можно повторять)")
+        parser.add_argument('--warm', action='store_true', help="Не очищать кэш перед запросами")
+        parser.add_argument('--output', help="Записать отчет в JSON-файл")
+        parser.add_argument('--compare', help="Сравнить с прошлым отчетом")
+        parser.add_argument('--keep', action='store_true', help="Не откатывать созданные данные")
+
+    def handle(self, *args, **options):
+        for name in ('questions', 'iterations'):
+            if options[name] <= 0:
+                raise CommandError(f"--{name} должен быть положительным")
+        if options['answers'] < 0:
+            raise CommandError("--answers не может быть отрицательным")
+
+        cases = BENCH_CASES
+        if options['routes']:
+            known = {case.label for case in BENCH_CASES}
+            unknown = set(options['routes']) - known
+            if unknown:
+                raise CommandError(f"Неизвестные маршруты: {', '.join(sorted(unknown))}. "
+                                   f"Доступны: {', '.join(sorted(known))}")
+            cases = [case for case in BENCH_CASES if case.label in options['routes']]
+
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as report_file:
+                    previous = json.load(report_file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Не удалось прочитать отчет {options['compare']}: {exc}")
+
+        with ExitStack() as stack:
+            for alias in shard_aliases():
+                stack.enter_context(transaction.atomic(using=alias))
+            started = time.perf_counter()
+            data = seed_bench_data(options['questions'], options['answers'])
+            seeded = time.perf_counter() - started
+            self.stdout.write(f"Создано вопросов: {options['questions']}, "
+                              f"ответов: {options['questions'] * options['answers']} за {seeded:.1f} с")
+            routes = run_bench(data, cases, options['iterations'], options['warm'])
+            if not options['keep']:
+                for alias in shard_aliases():
+                    transaction.set_rollback(True, using=alias)
+
+        report = {
+            'meta': bench_meta(questions=options['questions'], answers_per_question=options['answers'],
+                               iterations=options['iterations'], warm_cache=options['warm']),
+            'routes': routes,
+        }
+        self.print_table(routes)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, ensure_ascii=False, indent=2, sort_keys=True)
+            self.stdout.write(f"Отчет записан в {options['output']}")
+        if previous is not None:
+            self.print_diff(compare_reports(previous, report))
+
+        failed = [label for label, result in routes.items() if over_budget(result)]
+        if failed:
+            raise CommandError(f"Превышен бюджет запросов к БД: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("Все маршруты уложились в бюджет запросов"))
+
+    def print_table(self, routes: dict) -> None:
+        self.stdout.write(
+            f"{'route':<22} {'method':<6} {'status':>6} {'p50 ms':>9} {'p99 ms':>9} "
+            f"{'queries':>7} {'budget':>6} {'peak KB':>9} {'bytes':>9}"
+        )
+        for label, row in routes.items():
+            budget = '-' if row['query_budget'] is None else row['query_budget']
+            self.stdout.write(
+                f"{label:<22} {row['method']:<6} {row['status']:>6} {row['p50_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+                f"{row['queries']:>7} {budget:>6} {row['peak_kb']:>9.1f} {row['bytes']:>9}"
+            )
+
+    def print_diff(self, diff: dict) -> None:
+        self.stdout.write(f"{'route':<22} {'p50 %':>8} {'p99 %':>8} {'queries':>8} {'peak %':>8}")
+
+        def fmt(value):
+            return '-' if value is None else f"{value:+.1f}"
+
+        for label, row in diff.items():
+            self.stdout.write(
+                f"{label:<22} {fmt(row['p50_ms']):>8} {fmt(row['p99_ms']):>8} "
+                f"{row['queries']:>+8} {fmt(row['peak_kb']):>8}"
+            )
@@ -0,0 +1,96 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from qa_api.bench import percentile
+
+
+def fetch(url: str, timeout: float) -> tuple[float, bool]:
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+# python manage.py compare_async --base-url http://127.0.0.1:8000 --concurrency 100 --requests 2000
+# Сервер запускается отдельно (например, uvicorn qa_project.asgi:application), команда
+# нагружает синхронные и асинхронные варианты одних и тех же эндпоинтов и печатает
+# пропускную способность и задержки
+class Command(BaseCommand):
+    help = "Сравнивает задержку и конкурентность синхронных и асинхронных read-эндпоинтов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help="Адрес запущенного сервера")
+        parser.add_argument('--concurrency', type=int, default=50, help="Число одновременных клиентов")
+        parser.add_argument('--requests', type=int, default=500, help="Запросов на каждый эндпоинт")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Таймаут одного запроса, с")
+        parser.add_argument('--question-id', type=int, help="Вопрос для карточки (по умолчанию — первый из списка)")
+        parser.add_argument('--answer-id', type=int, help="Ответ для карточки ответа")
+        parser.add_argument('--json', action='store_true', help="Вывести результат в JSON")
+
+    def handle(self, *args, **options):
+        base = options['base_url'].rstrip('/')
+        question_id = options['question_id'] or self.discover_question(base, options['timeout'])
+
+        pairs = [('question-list', '/api/questions/', '/api/async/questions/')]
+        if question_id:
+            pairs.append(('question-detail', f'/api/questions/{question_id}/',
+                          f'/api/async/questions/{question_id}/'))
+        if options['answer_id']:
+            pairs.append(('answer-detail', f'/api/answers/{options["answer_id"]}/',
+                          f'/api/async/answers/{options["answer_id"]}/'))
+
+        results = []
+        for name, sync_path, async_path in pairs:
+            for mode, path in (('sync', sync_path), ('async', async_path)):
+                results.append({'endpoint': name, 'mode': mode, **self.run(base + path, options)})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'endpoint':<16} {'mode':<6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'max ms':>9} {'errors':>7}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['endpoint']:<16} {row['mode']:<6} {row['rps']:>9.1f} {row['p50_ms']:>9.1f} "
+                f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f} {row['errors']:>7}"
+            )
+
+    def discover_question(self, base: str, timeout: float) -> int | None:
+        try:
+            with urllib.request.urlopen(f'{base}/api/questions/?page_size=1', timeout=timeout) as response:
+                results = json.load(response)['data']['results']
+        except (urllib.error.URLError, ValueError, KeyError) as exc:
+            raise CommandError(f"Сервер {base} недоступен: {exc}")
+        return results[0]['id'] if results else None
+
+    def run(self, url: str, options) -> dict:
+        total = options['requests']
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            started = time.perf_counter()
+            samples = list(pool.map(lambda _: fetch(url, options['timeout']), range(total)))
+            elapsed = time.perf_counter() - started
+
+        latencies = [latency * 1000 for latency, ok in samples if ok]
+        return {
+            'requests': total,
+            'errors': sum(1 for _, ok in samples if not ok),
+            'rps': total / elapsed if elapsed else 0.0,
+            'mean_ms': statistics.fmean(latencies) if latencies else 0.0,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': max(latencies, default=0.0),
+        }
@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from qa_api.export import EXPORT_CHUNK_SIZE, export_rows, parse_bound, parse_types
+from qa_api.streaming import gzip_chunks, ndjson_chunks
+
+
+# python manage.py export_qa [--since ...] [--until ...] [--type questions,answers] [--gzip] [-o file]
+class Command(BaseCommand):
+    help = "Выгружает вопросы и ответы в формате NDJSON, не загружая таблицы в память"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Начало периода по created_at (ISO 8601), включительно")
+        parser.add_argument('--until', help="Конец периода по created_at (ISO 8601), не включительно")
+        parser.add_argument('--type', dest='types', help="questions, answers или оба через запятую")
+        parser.add_argument('--gzip', action='store_true', help="Сжать выгрузку gzip")
+        parser.add_argument('-o', '--output', help="Файл для записи (по умолчанию stdout)")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Размер порции чтения из базы")
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options['since'])
+            until = parse_bound(options['until'])
+            types = parse_types(options['types'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for row in export_rows(since, until, types, chunk_size=options['chunk_size']):
+                rows += 1
+                yield row
+
+        chunks = ndjson_chunks(counted())
+        if options['gzip']:
+            chunks = gzip_chunks(chunks)
+
+        output = options['output']
+        stream = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+        finally:
+            if output:
+                stream.close()
+            else:
+                stream.flush()
+
+        self.stderr.write(f"Выгружено записей: {rows}")
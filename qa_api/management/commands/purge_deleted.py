@@ -0,0 +1,104 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from qa_api.models import Answer, Question
+from qa_api.shards import shard_aliases
+
+
+# python manage.py purge_deleted [--batch-size N] [--sleep S] [--grace S] [--loop]
+# Физически удаляет строки, помеченные удаленными: сначала ответы (свои пометки —
+# по частичному индексу purge_idx, затем ответы удаленных вопросов — по индексу
+# (question, created_at) для пачки id вопросов), затем вопросы без ответов.
+# Каждая пачка — отдельная короткая транзакция DELETE ... WHERE id IN (...) AND <условия
+# выборки>: условия проверяются заново в самом DELETE, поэтому вопрос, получивший ответ
+# после выборки id, не удаляется (NOT EXISTS внутри того же оператора). Если ответ
+# вставляется параллельно с DELETE (PostgreSQL, незакоммиченная строка), отложенная
+# проверка внешнего ключа откатывает пачку — она повторится при следующем запуске.
+# Между пачками пауза, чтобы не держать блокировки и не забивать диск. Шарды — по очереди
+class Command(BaseCommand):
+    help = "Удаляет помеченные удаленными вопросы и ответы небольшими пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Строк в одной пачке")
+        parser.add_argument('--sleep', type=float, default=0.5, help="Пауза между пачками, с")
+        parser.add_argument('--grace', type=float, default=0.0,
+                            help="Удалять только строки, помеченные раньше чем столько секунд назад")
+        parser.add_argument('--loop', action='store_true',
+                            help="Работать постоянно, проверяя новые пометки")
+        parser.add_argument('--idle-sleep', type=float, default=30.0,
+                            help="Пауза в режиме --loop, когда удалять нечего, с")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть положительным")
+        if options['sleep'] < 0 or options['grace'] < 0:
+            raise CommandError("--sleep и --grace не могут быть отрицательными")
+
+        answers_total = questions_total = 0
+        while True:
+            answers, questions = self.purge(batch_size, options['sleep'], options['grace'])
+            answers_total += answers
+            questions_total += questions
+            if not options['loop']:
+                break
+            time.sleep(options['idle_sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено ответов: {answers_total}, вопросов: {questions_total}"
+        ))
+
+    def purge(self, batch_size: int, sleep: float, grace: float) -> tuple[int, int]:
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        answers = questions = 0
+        for alias in shard_aliases():
+            answers += self.purge_batches(
+                Answer.all_objects.using(alias).filter(is_deleted=True, deleted_at__lte=cutoff),
+                batch_size, sleep,
+            )
+            deleted_questions = Question.all_objects.using(alias).filter(is_deleted=True, deleted_at__lte=cutoff)
+            answers += self.purge_question_answers(deleted_questions, batch_size, sleep)
+            questions += self.purge_batches(
+                deleted_questions.filter(~Exists(Answer.all_objects.filter(question=OuterRef('pk')))),
+                batch_size, sleep,
+            )
+        return answers, questions
+
+    # Ответы удаленных вопросов: вопросы перебираются пачками по возрастанию id
+    def purge_question_answers(self, questions, batch_size: int, sleep: float) -> int:
+        deleted = last_pk = 0
+        while True:
+            question_ids = list(
+                questions.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not question_ids:
+                return deleted
+            deleted += self.purge_batches(
+                Answer.all_objects.using(questions.db).filter(question_id__in=question_ids), batch_size, sleep,
+            )
+            if len(question_ids) < batch_size:
+                return deleted
+            last_pk = question_ids[-1]
+
+    def purge_batches(self, queryset, batch_size: int, sleep: float) -> int:
+        model = queryset.model
+        deleted = 0
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            try:
+                with transaction.atomic(using=queryset.db):
+                    deleted += queryset.filter(pk__in=ids)._raw_delete(queryset.db)
+            except IntegrityError:
+                self.stderr.write(f"{model._meta.verbose_name_plural}: пачка отложена — на строки появились ссылки")
+                return deleted
+            self.stdout.write(f"{model._meta.verbose_name_plural}: удалено {deleted}")
+            if len(ids) < batch_size:
+                return deleted
+            time.sleep(sleep)
@@ -0,0 +1,90 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from qa_api import cache
+from qa_api.ids import VIRTUAL_SHARDS
+from qa_api.models import Answer, Question
+from qa_api.shards import group_by_shard, shard_aliases, shard_map
+
+
+# python manage.py rebalance_shards [--batch-size N] [--sleep S] [--dry-run]
+# Переносит вопросы вместе с ответами в шарды, назначенные картой QA_SHARD_MAP:
+# после добавления шарда, изменения карты или при переходе с одной БД на несколько.
+# Пачка переносится так: строки блокируются в исходном шарде, в целевом удаляются
+# остатки прерванного переноса и вставляются копии с теми же id, затем строки
+# удаляются из исходного. Во время переноса чтение по id находит строку в любом
+# шарде (shards.candidate_shards), поэтому команду можно запускать на живой системе
+class Command(BaseCommand):
+    help = "Переносит вопросы и ответы в шарды согласно карте QA_SHARD_MAP"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Вопросов в одной пачке")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Пауза между пачками, с")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Только посчитать, сколько строк лежит не в своем шарде")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть положительным")
+        if options['sleep'] < 0:
+            raise CommandError("--sleep не может быть отрицательным")
+
+        mapping = shard_map()
+        questions_total = answers_total = 0
+        for source in shard_aliases():
+            foreign = [vshard for vshard in range(VIRTUAL_SHARDS) if mapping[vshard] != source]
+            if not foreign:
+                continue
+            misplaced = (
+                Question.all_objects.using(source)
+                .alias(vshard=F('pk').bitand(VIRTUAL_SHARDS - 1))
+                .filter(vshard__in=foreign)
+                .order_by('pk')
+            )
+            if options['dry_run']:
+                questions = misplaced.count()
+                answers = Answer.all_objects.using(source).filter(
+                    question_id__in=misplaced.values('pk')
+                ).count()
+                self.stdout.write(f"{source}: не в своем шарде вопросов {questions}, ответов {answers}")
+                questions_total += questions
+                answers_total += answers
+                continue
+
+            last_pk = None
+            while True:
+                batch = misplaced if last_pk is None else misplaced.filter(pk__gt=last_pk)
+                ids = list(batch.values_list('pk', flat=True)[:batch_size])
+                if not ids:
+                    break
+                last_pk = ids[-1]
+                for target, target_ids in group_by_shard(ids, key=lambda pk: pk).items():
+                    questions, answers = self.move(source, target, target_ids)
+                    questions_total += questions
+                    answers_total += answers
+                    self.stdout.write(f"{source} -> {target}: вопросов {questions}, ответов {answers}")
+                time.sleep(options['sleep'])
+
+        action = "Не в своем шарде" if options['dry_run'] else "Перенесено"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} вопросов: {questions_total}, ответов: {answers_total}"
+        ))
+
+    def move(self, source: str, target: str, ids: list[int]) -> tuple[int, int]:
+        with transaction.atomic(using=source):
+            questions = list(Question.all_objects.using(source).filter(pk__in=ids).select_for_update())
+            ids = [question.pk for question in questions]
+            answers = list(Answer.all_objects.using(source).filter(question_id__in=ids))
+            with transaction.atomic(using=target):
+                Answer.all_objects.using(target).filter(question_id__in=ids)._raw_delete(target)
+                Question.all_objects.using(target).filter(pk__in=ids)._raw_delete(target)
+                Question.all_objects.using(target).bulk_create(questions)
+                Answer.all_objects.using(target).bulk_create(answers, batch_size=1000)
+            Answer.all_objects.using(source).filter(question_id__in=ids)._raw_delete(source)
+            Question.all_objects.using(source).filter(pk__in=ids)._raw_delete(source)
+        cache.invalidate_questions(ids)
+        return len(questions), len(answers)
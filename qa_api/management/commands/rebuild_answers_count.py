@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from qa_api.models import Answer, Question
+from qa_api.shards import shard_aliases
+
+
+def actual_answers_count():
+    counts = (
+        Answer.objects.filter(question=OuterRef('pk'))
+        .order_by()
+        .values('question')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    # Ответы, перенесенные в архив (archive_cold), тоже учитываются в answers_count
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0) + F('archived_answers_count')
+
+
+# python manage.py rebuild_answers_count [--check] [--batch-size N]
+class Command(BaseCommand):
+    help = "Проверяет и пересчитывает денормализованный счетчик Question.answers_count"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Только проверить счетчики, ничего не изменяя (код выхода 1 при расхождениях)",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Количество вопросов, обрабатываемых за один проход",
+        )
+
+    def handle(self, *args, **options):
+        check_only = options['check']
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть положительным")
+
+        checked = 0
+        mismatched = 0
+        for alias in shard_aliases():
+            last_pk = 0
+            while True:
+                rows = list(
+                    Question.objects.using(alias).filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .annotate(actual=actual_answers_count())
+                    .values_list('pk', 'answers_count', 'actual')[:batch_size]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                checked += len(rows)
+
+                broken = [pk for pk, stored, actual in rows if stored != actual]
+                for pk, stored, actual in rows:
+                    if stored != actual:
+                        self.stdout.write(f"Вопрос id={pk}: answers_count={stored}, фактически {actual}")
+                mismatched += len(broken)
+
+                if broken and not check_only:
+                    # Значение пересчитывается внутри самого UPDATE, чтобы не затереть
+                    # ответы, вставленные между чтением и записью
+                    with transaction.atomic(using=alias):
+                        Question.objects.using(alias).filter(pk__in=broken).update(
+                            answers_count=actual_answers_count()
+                        )
+
+        if check_only and mismatched:
+            raise CommandError(f"Проверено вопросов: {checked}, расхождений: {mismatched}")
+
+        action = "найдено" if check_only else "исправлено"
+        self.stdout.write(self.style.SUCCESS(
+            f"Проверено вопросов: {checked}, {action} расхождений: {mismatched}"
+        ))
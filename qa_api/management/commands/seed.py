@@ -0,0 +1,233 @@
+import itertools
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DateTimeField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.dateparse import parse_datetime
+
+from qa_api import cache
+from qa_api.ids import COUNTER_BITS, SEED_COUNTER_BASE, VIRTUAL_SHARDS, compose_id, virtual_shard
+from qa_api.management.commands.rebuild_answers_count import actual_answers_count
+from qa_api.models import Answer, Question
+from qa_api.shards import group_by_shard, shard_aliases
+
+# Номера id синтетических строк лежат в зарезервированной половине диапазона
+# (ids.SEED_COUNTER_BASE), по окну на каждый --seed: с id живых строк и других
+# наборов они не пересекаются
+SEED_WINDOWS = 1024
+SEED_WINDOW = (1 << (COUNTER_BITS - 1)) // SEED_WINDOWS
+
+TOPICS = ["Django", "PostgreSQL", "Python", "Docker", "индексы", "кэш", "миграции", "REST API",
+          "асинхронность", "тесты", "очереди", "логирование", "шардирование", "реплики"]
+VERBS = ["настроить", "ускорить", "отладить", "масштабировать", "проверить", "обновить"]
+OPENERS = ["Попробуйте", "Проверьте", "Я бы", "У нас помогло", "Стоит", "Документация советует"]
+
+
+def zipf_cum_weights(size: int, exponent: float) -> list[float]:
+    return list(itertools.accumulate(1.0 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def _window(seed: int) -> int:
+    return SEED_COUNTER_BASE + (seed % SEED_WINDOWS) * SEED_WINDOW
+
+
+def seed_id_range(seed: int) -> tuple[int, int]:
+    return compose_id(_window(seed), 0), compose_id(_window(seed) + SEED_WINDOW, 0)
+
+
+def question_id(seed: int, index: int, vshard: int) -> int:
+    return compose_id(_window(seed) + index, vshard)
+
+
+# Ответ получает виртуальный шард своего вопроса, как new_answer_id
+def answer_id(seed: int, index: int, question_pk: int) -> int:
+    return question_id(seed, index, virtual_shard(question_pk))
+
+
+class Progress:
+    def __init__(self, stdout, label: str, total: int):
+        self.stdout = stdout
+        self.label = label
+        self.total = total
+        self.done = self.inserted = 0
+        self.started = self.reported = time.perf_counter()
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.inserted / elapsed if elapsed else 0.0
+
+    def advance(self, done: int, inserted: int) -> None:
+        self.done += done
+        self.inserted += inserted
+        now = time.perf_counter()
+        if now - self.reported >= 2 or self.done == self.total:
+            self.reported = now
+            self.stdout.write(f"{self.label}: {self.done}/{self.total}, вставлено {self.inserted} "
+                              f"({self.rate():.0f} строк/с)")
+
+
+# python manage.py seed [--questions N] [--answers M] [--users U] [--seed S] [--end ISO]
+# Синтетический набор данных для воспроизведения нагрузки: ответы распределены по
+# вопросам и пользователям по закону Ципфа (немногие популярные вопросы и активные
+# пользователи получают большую часть ответов), вопросы появляются все чаще к --end,
+# ответы приходят через экспоненциально распределенную задержку после вопроса.
+# Строки вставляются bulk_create пачками в свои шарды, без Model.save и сигналов;
+# счетчики ответов и last_activity_at вопросов набора пересчитываются в конце одним
+# UPDATE на шард — это быстрее, чем обновлять их с каждой пачкой, и не ломается при
+# продолжении прерванного запуска.
+# Набор детерминирован: id и содержимое строки зависят только от --seed, номера
+# строки и параметров, поэтому прерванный запуск продолжается повторным запуском
+# с теми же параметрами — уже вставленные пачки пропускаются
+class Command(BaseCommand):
+    help = "Заполняет БД синтетическими вопросами и ответами с распределением Ципфа"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=10000, help="Число вопросов")
+        parser.add_argument('--answers', type=int, default=100000, help="Число ответов")
+        parser.add_argument('--users', type=int, default=5000, help="Число пользователей")
+        parser.add_argument('--question-skew', type=float, default=1.1,
+                            help="Показатель Ципфа для распределения ответов по вопросам")
+        parser.add_argument('--user-skew', type=float, default=1.05,
+                            help="Показатель Ципфа для распределения ответов по пользователям")
+        parser.add_argument('--days', type=int, default=365, help="За сколько дней до --end появляются вопросы")
+        parser.add_argument('--end', help="Момент окончания набора, ISO 8601 (по умолчанию — начало текущих суток UTC)")
+        parser.add_argument('--answer-delay-hours', type=float, default=6.0,
+                            help="Средняя задержка ответа после вопроса, ч")
+        parser.add_argument('--seed', type=int, default=42, help="Зерно генератора")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Строк в одной пачке")
+
+    def handle(self, *args, **options):
+        for name in ('questions', 'users', 'days', 'batch_size'):
+            if options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} должен быть положительным")
+        if options['answers'] < 0:
+            raise CommandError("--answers не может быть отрицательным")
+        if options['question_skew'] <= 0 or options['user_skew'] <= 0 or options['answer_delay_hours'] <= 0:
+            raise CommandError("Показатели распределений и задержка должны быть положительными")
+        if options['seed'] < 0:
+            raise CommandError("--seed не может быть отрицательным")
+        if max(options['questions'], options['answers']) > SEED_WINDOW:
+            raise CommandError("Слишком большой набор для одного --seed")
+
+        end = self.parse_end(options['end'])
+        self.stdout.write(f"Набор seed={options['seed']}, end={end.isoformat()} "
+                          f"(для продолжения запускайте с теми же параметрами)")
+
+        seed = options['seed']
+        rng = random.Random(seed)
+        total_questions = options['questions']
+        span = timedelta(days=options['days'])
+        # Интенсивность появления вопросов растет линейно к концу периода
+        question_times = [end - span * (1 - rng.random() ** 0.5) for _ in range(total_questions)]
+        question_ids = [question_id(seed, index, rng.randrange(VIRTUAL_SHARDS)) for index in range(total_questions)]
+        # Популярность не связана с номером вопроса: ранги Ципфа перемешаны
+        popularity = list(range(total_questions))
+        rng.shuffle(popularity)
+        users = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(options['users'])]
+
+        started = time.perf_counter()
+        questions = self.seed_questions(options, question_ids, question_times)
+        answers = self.seed_answers(options, end, question_ids, question_times, popularity, users)
+        self.recount(seed)
+        cache.invalidate_all_questions()
+
+        elapsed = time.perf_counter() - started
+        inserted = questions.inserted + answers.inserted
+        self.stdout.write(self.style.SUCCESS(
+            f"Вставлено вопросов: {questions.inserted}, ответов: {answers.inserted} за {elapsed:.1f} с "
+            f"({inserted / elapsed if elapsed else 0:.0f} строк/с)"
+        ))
+
+    @staticmethod
+    def parse_end(value: str | None) -> datetime:
+        if not value:
+            return datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Некорректная дата --end: {value}")
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+    def seed_questions(self, options, question_ids, question_times) -> Progress:
+        batch_size = options['batch_size']
+        progress = Progress(self.stdout, "Вопросы", len(question_ids))
+        for first in range(0, len(question_ids), batch_size):
+            rng = random.Random(f"{options['seed']}:questions:{first}")
+            rows = []
+            for index in range(first, min(first + batch_size, len(question_ids))):
+                rows.append(Question(
+                    id=question_ids[index],
+                    text=f"Как {rng.choice(VERBS)} {rng.choice(TOPICS)} под нагрузкой? "
+                         f"Вопрос №{index}, контекст: {rng.choice(TOPICS)}",
+                    created_at=question_times[index],
+                    last_activity_at=question_times[index],
+                ))
+            inserted = 0
+            for alias, shard_rows in group_by_shard(rows, key=lambda row: row.pk).items():
+                if Question.all_objects.using(alias).filter(pk=shard_rows[0].pk).exists():
+                    continue
+                Question.all_objects.using(alias).bulk_create(shard_rows)
+                inserted += len(shard_rows)
+            progress.advance(len(rows), inserted)
+        return progress
+
+    def seed_answers(self, options, end, question_ids, question_times, popularity, users) -> Progress:
+        batch_size = options['batch_size']
+        total = options['answers']
+        question_weights = zipf_cum_weights(len(question_ids), options['question_skew'])
+        user_weights = zipf_cum_weights(len(users), options['user_skew'])
+        delay_rate = 1 / timedelta(hours=options['answer_delay_hours']).total_seconds()
+
+        progress = Progress(self.stdout, "Ответы", total)
+        for first in range(0, total, batch_size):
+            size = min(batch_size, total - first)
+            rng = random.Random(f"{options['seed']}:answers:{first}")
+            ranks = rng.choices(range(len(question_ids)), cum_weights=question_weights, k=size)
+            authors = rng.choices(users, cum_weights=user_weights, k=size)
+            rows = []
+            for offset, (rank, user) in enumerate(zip(ranks, authors)):
+                index = popularity[rank]
+                created_at = min(end, question_times[index] + timedelta(seconds=rng.expovariate(delay_rate)))
+                rows.append(Answer(
+                    id=answer_id(options['seed'], first + offset, question_ids[index]),
+                    question_id=question_ids[index],
+                    user_id=user,
+                    text=f"{rng.choice(OPENERS)} {rng.choice(VERBS)} {rng.choice(TOPICS)} "
+                         f"(ответ №{first + offset})",
+                    created_at=created_at,
+                ))
+
+            inserted = 0
+            for alias, shard_rows in group_by_shard(rows, key=lambda row: row.question_id).items():
+                if Answer.all_objects.using(alias).filter(pk=shard_rows[0].pk).exists():
+                    continue
+                Answer.all_objects.using(alias).bulk_create(shard_rows)
+                inserted += len(shard_rows)
+            progress.advance(size, inserted)
+        return progress
+
+    # answers_count и last_activity_at (время последнего ответа) вопросов набора
+    def recount(self, seed: int) -> None:
+        first, last = seed_id_range(seed)
+        last_answer = (
+            Answer.objects.filter(question=OuterRef('pk'))
+            .order_by()
+            .values('question')
+            .annotate(latest=Max('created_at'))
+            .values('latest')
+        )
+        started = time.perf_counter()
+        for alias in shard_aliases():
+            with transaction.atomic(using=alias):
+                Question.all_objects.using(alias).filter(pk__gte=first, pk__lt=last).update(
+                    answers_count=actual_answers_count(),
+                    last_activity_at=Greatest(
+                        'created_at',
+                        Coalesce(Subquery(last_answer, output_field=DateTimeField()), 'created_at'),
+                    ),
+                )
+        self.stdout.write(f"Счетчики ответов пересчитаны за {time.perf_counter() - started:.1f} с")
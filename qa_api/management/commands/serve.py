@@ -0,0 +1,97 @@
+import os
+import shlex
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def available_cpus() -> int:
+    if hasattr(os, 'process_cpu_count'):
+        return os.process_cpu_count() or 1
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+# Синхронному воркеру нужен запас на ожидание БД (2 * CPU + 1), асинхронному
+# хватает одного процесса на ядро — ожидание БД покрывает цикл событий
+def default_workers(asgi: bool) -> int:
+    cpus = available_cpus()
+    return cpus if asgi else 2 * cpus + 1
+
+
+# python manage.py serve [--asgi] [--bind 0.0.0.0:8000] [--workers N] [--threads N]
+# Рабочий запуск: мастер gunicorn загружает приложение один раз (preload) и форкает
+# воркеры — WSGI (qa_project.wsgi) или ASGI на воркерах uvicorn (qa_project.asgi).
+# Миграции здесь не выполняются: это отдельный шаг (python manage.py migrate, сервис
+# migrate в Docker Compose), поэтому старт контейнера — только импорт приложения.
+# Сигналы — как у gunicorn: HUP плавно перезапускает воркеры, TERM завершает
+# текущие запросы за --graceful-timeout, TTIN/TTOU добавляют и убирают воркер.
+# Каждый воркер держит собственный пул соединений (DB_POOL_MAX_SIZE) и метрики,
+# которые /metrics собирает через каталог METRICS_DIR
+class Command(BaseCommand):
+    help = "Запускает многопроцессный WSGI/ASGI сервер gunicorn"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--asgi', action='store_true', help="ASGI на воркерах uvicorn вместо WSGI")
+        parser.add_argument('--bind', default=os.environ.get('SERVE_BIND') or '0.0.0.0:8000',
+                            help="Адрес и порт")
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY') or 0),
+                            help="Число процессов (по умолчанию — по числу CPU)")
+        parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS') or 1),
+                            help="Потоков в WSGI-воркере")
+        parser.add_argument('--timeout', type=int, default=30,
+                            help="Воркер, не отвечающий дольше, перезапускается, с")
+        parser.add_argument('--graceful-timeout', type=int, default=30,
+                            help="Сколько ждать завершения запросов при остановке, с")
+        parser.add_argument('--keep-alive', type=int, default=5, help="Keep-alive соединения, с")
+        parser.add_argument('--max-requests', type=int, default=10000,
+                            help="Перезапуск воркера после N запросов (0 — без перезапуска)")
+        parser.add_argument('--no-preload', action='store_true',
+                            help="Загружать приложение в каждом воркере: HUP подхватывает новый код")
+        parser.add_argument('--print', action='store_true', help="Только вывести команду запуска")
+
+    def handle(self, *args, **options):
+        for name in ('workers', 'threads', 'timeout', 'graceful_timeout', 'keep_alive', 'max_requests'):
+            if options[name] < 0:
+                raise CommandError(f"--{name.replace('_', '-')} не может быть отрицательным")
+        if options['asgi'] and options['threads'] > 1:
+            raise CommandError("--threads применим только к WSGI")
+
+        argv = self.build_argv(options)
+        if options['print']:
+            self.stdout.write(shlex.join(argv))
+            return
+        # Воркеры складывают снимки метрик в общий каталог, /metrics суммирует их
+        os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'qa_metrics'))
+        self.stdout.write(f"Запуск: {shlex.join(argv)}")
+        self.stdout.flush()
+        os.execv(sys.executable, argv)
+
+    @staticmethod
+    def build_argv(options) -> list[str]:
+        asgi = options['asgi']
+        workers = options['workers'] or default_workers(asgi)
+        argv = [
+            sys.executable, '-m', 'gunicorn',
+            '--config', 'python:qa_project.gunicorn_conf',
+            '--bind', options['bind'],
+            '--workers', str(workers),
+            '--timeout', str(options['timeout']),
+            '--graceful-timeout', str(options['graceful_timeout']),
+            '--keep-alive', str(options['keep_alive']),
+        ]
+        if options['max_requests']:
+            # Разброс, чтобы воркеры не перезапускались одновременно
+            argv += ['--max-requests', str(options['max_requests']),
+                     '--max-requests-jitter', str(max(1, options['max_requests'] // 10))]
+        if not options['no_preload']:
+            argv.append('--preload')
+        if asgi:
+            argv += ['--worker-class', 'uvicorn_worker.UvicornWorker', 'qa_project.asgi:application']
+        else:
+            if options['threads'] > 1:
+                argv += ['--threads', str(options['threads'])]
+            argv.append('qa_project.wsgi:application')
+        return argv
@@ -0,0 +1,440 @@
+import atexit
+import contextlib
+import contextvars
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+from . import cache as qa_cache
+from .logqueue import queue_stats
+from .pool import pool_stats
+from .writebehind import writer_stats
+
+# Метрики в формате Prometheus: GET /metrics.
+# Middleware на каждый запрос записывает задержку, число и время запросов к БД,
+# размер ответа и статус по имени маршрута (qa_api:question-detail и т.д.).
+# Запросы к БД считает обертка execute_wrapper, которая ставится на соединение один
+# раз при его открытии и пишет в счетчики текущего запроса (contextvar) — поэтому
+# запросы параллельных запросов в ASGI не смешиваются.
+# Каждый процесс копит метрики в памяти. Если задан QA_METRICS_DIR, фоновый поток
+# процесса раз в секунду сбрасывает его снимок в файл <pid>.json (файловый ввод-вывод
+# не попадает в обработку запроса и цикл событий ASGI), а /metrics суммирует
+# снимки всех процессов: счетчики и гистограммы — включая завершившиеся воркеры,
+# мгновенные значения (gauge) — только живых процессов. Снимок завершившегося
+# воркера мастер gunicorn (child_exit) добавляет в общий снимок exited.json и
+# удаляет (fold_worker), поэтому файлы не копятся при перезапуске воркеров
+# (--max-requests), а воркер с тем же pid не затирает счетчики прежнего
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    'qa_http_request_duration_seconds': ("Время обработки запроса", LATENCY_BUCKETS),
+    'qa_http_response_size_bytes': ("Размер тела ответа (без потоковых)", SIZE_BUCKETS),
+    'qa_db_queries_per_request': ("Запросов к БД на один HTTP-запрос", QUERY_BUCKETS),
+    'qa_db_query_duration_seconds_per_request': ("Время запросов к БД на один HTTP-запрос", LATENCY_BUCKETS),
+}
+COUNTERS = {
+    'qa_http_requests_total': "HTTP-запросы по маршруту, методу и статусу",
+    'qa_db_queries_total': "Запросы к БД по маршруту",
+    'qa_admission_shed_total': "Запросы, отклоненные контролем допуска (429/503), по причине",
+    'qa_cache_hits_total': "Попадания в кэш ответов",
+    'qa_cache_misses_total': "Промахи кэша ответов",
+    'qa_cache_invalidations_total': "Инвалидации кэша ответов",
+    'qa_log_records_dropped_total': "Записи логов, отброшенные при переполнении очереди",
+    'qa_db_pool_requests_total': "Запросы соединения из пула",
+    'qa_db_pool_queued_total': "Запросы соединения, которым пришлось ждать",
+    'qa_db_pool_wait_seconds_total': "Суммарное ожидание соединения из пула",
+    'qa_db_pool_timeouts_total': "Запросы соединения, не дождавшиеся его",
+    'qa_write_behind_accepted_total': "Ответы, принятые в отложенную запись (202)",
+    'qa_write_behind_written_total': "Отложенные ответы, записанные в БД",
+    'qa_write_behind_dropped_total': "Отложенные ответы, отброшенные из-за удаленного вопроса",
+    'qa_write_behind_fallbacks_total': "Ответы, записанные сразу из-за заполненного буфера",
+    'qa_write_behind_batches_total': "Пачки отложенной записи",
+    'qa_write_behind_errors_total': "Неудачные попытки записать пачку",
+    'qa_write_behind_dead_letters_total': "Отложенные ответы с ошибкой в данных, отложенные в dead letters",
+    'qa_write_behind_flush_seconds_total': "Суммарное время записи пачек",
+}
+GAUGES = {
+    'qa_log_queue_size': "Записи в очереди логов",
+    'qa_db_pool_size': "Открытые соединения пула",
+    'qa_db_pool_available': "Свободные соединения пула",
+    'qa_db_pool_waiting': "Запросы, ждущие соединения прямо сейчас",
+    'qa_write_behind_pending': "Ответы в буфере отложенной записи",
+}
+
+UNMATCHED_ROUTE = 'unmatched'
+FLUSH_INTERVAL = 1.0
+EXITED_FILE = 'exited.json'
+LOCK_FILE = 'metrics.lock'
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters: dict[tuple[str, Labels], float] = {}
+            # [счетчики по корзинам (последняя — +Inf), сумма, количество]
+            self.histograms: dict[tuple[str, Labels], list] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _labels(**labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        buckets = HISTOGRAMS[name][1]
+        key = (name, _labels(**labels))
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self._lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), [list(state[0]), state[1], state[2]]]
+                          for (name, labels), state in self.histograms.items()]
+        counters.extend(_collected_counters())
+        return {
+            'pid': os.getpid(),
+            'counters': counters,
+            'histograms': histograms,
+            'gauges': _collected_gauges(),
+        }
+
+
+registry = Registry()
+
+
+# Счетчики и состояние других подсистем процесса — берутся в момент снимка
+def _collected_counters() -> list[list]:
+    cache = qa_cache.stats.snapshot()
+    rows = [
+        ['qa_cache_hits_total', [], cache['hits']],
+        ['qa_cache_misses_total', [], cache['misses']],
+        ['qa_cache_invalidations_total', [], cache['invalidations']],
+        ['qa_log_records_dropped_total', [], queue_stats()['dropped']],
+    ]
+    for alias, pool in pool_stats().items():
+        labels = [['alias', alias]]
+        rows += [
+            ['qa_db_pool_requests_total', labels, pool['requests']],
+            ['qa_db_pool_queued_total', labels, pool['queued']],
+            ['qa_db_pool_wait_seconds_total', labels, pool['wait_ms_total'] / 1000],
+            ['qa_db_pool_timeouts_total', labels, pool['timeouts']],
+        ]
+    writer = writer_stats()
+    if writer['enabled']:
+        rows += [[f'qa_write_behind_{key}_total', [], writer[key]]
+                 for key in ('accepted', 'written', 'dropped', 'fallbacks', 'batches', 'errors',
+                             'dead_letters', 'flush_seconds')]
+    return rows
+
+
+def _collected_gauges() -> list[list]:
+    rows = [['qa_log_queue_size', [], queue_stats()['queued']]]
+    for alias, pool in pool_stats().items():
+        labels = [['alias', alias]]
+        rows += [
+            ['qa_db_pool_size', labels, pool['size']],
+            ['qa_db_pool_available', labels, pool['available']],
+            ['qa_db_pool_waiting', labels, pool['waiting']],
+        ]
+    writer = writer_stats()
+    if writer['enabled']:
+        rows.append(['qa_write_behind_pending', [], writer['pending']])
+    return rows
+
+
+def metrics_dir() -> str:
+    return getattr(settings, 'QA_METRICS_DIR', '') or ''
+
+
+def _read_snapshot(path: str) -> dict[str, Any] | None:
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+# Запись атомарна (os.replace): читатель видит старый или новый снимок целиком
+def _write_snapshot(path: str, snapshot: dict[str, Any]) -> None:
+    with open(path + '.tmp', 'w', encoding='utf-8') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(path + '.tmp', path)
+
+
+# Перенос снимка в exited.json и чтение всех снимков исключают друг друга, иначе
+# /metrics мог бы увидеть снимок воркера и в exited.json, и в его файле
+@contextlib.contextmanager
+def _locked(directory: str, exclusive: bool):
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+# Сбрасывает снимок процесса в QA_METRICS_DIR
+def flush() -> None:
+    directory = metrics_dir()
+    if not directory:
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        _write_snapshot(os.path.join(directory, f'{os.getpid()}.json'), registry.snapshot())
+    except OSError:
+        pass
+
+
+_flusher: threading.Thread | None = None
+_flusher_lock = threading.Lock()
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+# Поток сброса запускается при первом запросе процесса, если задан QA_METRICS_DIR
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None or not metrics_dir():
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='qa-metrics-flusher', daemon=True)
+            _flusher.start()
+
+
+# Добавляет счетчики и гистограммы завершившегося процесса pid в exited.json
+# и удаляет его снимок; вызывается мастером gunicorn (child_exit)
+def fold_worker(pid: int) -> None:
+    directory = metrics_dir()
+    path = os.path.join(directory, f'{pid}.json')
+    if not directory or not os.path.exists(path):
+        return
+    exited_path = os.path.join(directory, EXITED_FILE)
+    with _locked(directory, exclusive=True):
+        worker = _read_snapshot(path)
+        if worker is not None:
+            counters, _, histograms = _merge([_read_snapshot(exited_path) or {}, worker])
+            _write_snapshot(exited_path, {
+                'pid': None,
+                'counters': [[name, [list(pair) for pair in labels], value]
+                             for (name, labels), value in counters.items()],
+                'histograms': [[name, [list(pair) for pair in labels], state]
+                               for (name, labels), state in histograms.items()],
+                'gauges': [],
+            })
+        os.remove(path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshots() -> list[dict[str, Any]]:
+    own = registry.snapshot()
+    directory = metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return [own]
+    snapshots = [own]
+    with _locked(directory, exclusive=False):
+        paths = glob.glob(os.path.join(directory, '*.json'))
+        loaded = [_read_snapshot(path) for path in paths]
+    for snapshot in filter(None, loaded):
+        pid = snapshot.get('pid')
+        if pid == own['pid']:
+            continue
+        if not pid or not _alive(pid):
+            snapshot['gauges'] = []
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def _merge(snapshots: list[dict[str, Any]]) -> tuple[dict, dict, dict]:
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        for kind, target in (('counters', counters), ('gauges', gauges)):
+            for name, labels, value in snapshot.get(kind, []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                target[key] = target.get(key, 0) + value
+        for name, labels, (buckets, total, count) in snapshot.get('histograms', []):
+            key = (name, tuple(tuple(pair) for pair in labels))
+            state = histograms.get(key)
+            if state is None or len(state[0]) != len(buckets):
+                histograms[key] = [list(buckets), total, count]
+                continue
+            state[0] = [a + b for a, b in zip(state[0], buckets)]
+            state[1] += total
+            state[2] += count
+    return counters, gauges, histograms
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _series(name: str, labels, value, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    rendered = ','.join(f'{key}="{_escape(str(val))}"' for key, val in pairs)
+    return f'{name}{{{rendered}}} {_number(value)}' if rendered else f'{name} {_number(value)}'
+
+
+def render() -> str:
+    counters, gauges, histograms = _merge(_snapshots())
+    lines = []
+
+    def header(name: str, help_text: str, kind: str):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for name, help_text in COUNTERS.items():
+        series = sorted((key, value) for key, value in counters.items() if key[0] == name)
+        if series:
+            header(name, help_text, 'counter')
+            lines += [_series(name, labels, value) for (_, labels), value in series]
+    for name, help_text in GAUGES.items():
+        series = sorted((key, value) for key, value in gauges.items() if key[0] == name)
+        if series:
+            header(name, help_text, 'gauge')
+            lines += [_series(name, labels, value) for (_, labels), value in series]
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        series = sorted((key, state) for key, state in histograms.items() if key[0] == name)
+        if not series:
+            continue
+        header(name, help_text, 'histogram')
+        for (_, labels), (buckets, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(list(bounds) + ['+Inf'], buckets):
+                cumulative += bucket
+                lines.append(_series(f'{name}_bucket', labels, cumulative, (('le', bound),)))
+            lines.append(_series(f'{name}_sum', labels, total))
+            lines.append(_series(f'{name}_count', labels, count))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class RequestStats:
+    __slots__ = ('queries', 'query_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+_current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar('qa_request_stats', default=None)
+
+
+def _count_queries(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+connection_created.connect(_install_wrapper, dispatch_uid='qa_api.metrics')
+
+
+def _record(request, response, stats: RequestStats, started: float) -> None:
+    match = getattr(request, 'resolver_match', None)
+    route = (match.view_name if match else None) or UNMATCHED_ROUTE
+    method = request.method
+    registry.inc('qa_http_requests_total', route=route, method=method, status=response.status_code)
+    registry.observe('qa_http_request_duration_seconds', time.perf_counter() - started, route=route, method=method)
+    registry.observe('qa_db_queries_per_request', stats.queries, route=route, method=method)
+    registry.observe('qa_db_query_duration_seconds_per_request', stats.query_seconds, route=route, method=method)
+    if stats.queries:
+        registry.inc('qa_db_queries_total', stats.queries, route=route)
+    if not response.streaming:
+        registry.observe('qa_http_response_size_bytes', len(response.content), route=route, method=method)
+    _ensure_flusher()
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response: Callable):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _record(request, response, stats, started)
+            return response
+    else:
+        def middleware(request):
+            stats = RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            _record(request, response, stats, started)
+            return response
+    return middleware
+
+
+# Воркеры gunicorn с preload наследуют память мастера — начинают с нуля;
+# поток сброса мастера в дочернем процессе не существует
+def _after_fork() -> None:
+    global _flusher, _flusher_lock
+    registry.reset()
+    _flusher = None
+    _flusher_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(flush)
@@ -0,0 +1,42 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .routers import pin_primary, replica_aliases, sticky_seconds, unpin_primary
+
+# Read-your-writes: запросы на запись и все запросы клиента в течение
+# QA_PRIMARY_STICKY_SECONDS после успешной записи читают из основной БД.
+# Срок хранится в cookie, поэтому работает при любом числе процессов
+STICKY_COOKIE = 'qa_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _enter(request):
+    pinned = request.method not in SAFE_METHODS or STICKY_COOKIE in request.COOKIES
+    return pin_primary(pinned)
+
+
+def _leave(request, response):
+    if request.method not in SAFE_METHODS and response.status_code < 400 and replica_aliases():
+        response.set_cookie(STICKY_COOKIE, '1', max_age=sticky_seconds(), httponly=True, samesite='Lax')
+    return response
+
+
+@sync_and_async_middleware
+def primary_stickiness_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _enter(request)
+            try:
+                response = await get_response(request)
+            finally:
+                unpin_primary(token)
+            return _leave(request, response)
+    else:
+        def middleware(request):
+            token = _enter(request)
+            try:
+                response = get_response(request)
+            finally:
+                unpin_primary(token)
+            return _leave(request, response)
+    return middleware
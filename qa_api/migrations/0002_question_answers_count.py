@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:32
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_answers_count(apps, schema_editor):
+    Question = apps.get_model('qa_api', 'Question')
+    Answer = apps.get_model('qa_api', 'Answer')
+    counts = (
+        Answer.objects.filter(question=OuterRef('pk'))
+        .order_by()
+        .values('question')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Question.objects.using(schema_editor.connection.alias).update(
+        answers_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Денормализованный счетчик, обновляется при создании и удалении ответов', verbose_name='Количество ответов'),
+        ),
+        migrations.RunPython(fill_answers_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:37
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import DateTimeField, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_last_activity_at(apps, schema_editor):
+    Question = apps.get_model('qa_api', 'Question')
+    Answer = apps.get_model('qa_api', 'Answer')
+    latest_answer = (
+        Answer.objects.filter(question=OuterRef('pk'))
+        .order_by()
+        .values('question')
+        .annotate(latest=Max('created_at'))
+        .values('latest')
+    )
+    Question.objects.using(schema_editor.connection.alias).update(
+        last_activity_at=Coalesce(Subquery(latest_answer, output_field=DateTimeField()), F('created_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0002_question_answers_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='Обновляется при добавлении и удалении ответов; используется для ETag/Last-Modified', verbose_name='Последняя активность'),
+        ),
+        migrations.RunPython(fill_last_activity_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0003_question_last_activity_at'),
+    ]
+
+    operations = [
+        # Сначала новый индекс, затем старый — чтобы не остаться без индекса по user_id
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['user_id', 'created_at'], name='qa_api_answ_user_id_502829_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='answer',
+            name='qa_api_answ_user_id_fd6e10_idx',
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+from qa_api.migrations._search_ddl import TABLES, sqlite_trigger_sql
+
+# Полнотекстовый индекс по text вопросов и ответов: tsvector + GIN в PostgreSQL,
+# FTS5 с триггерами в SQLite (см. qa_api/search.py). DDL заморожен в _search_ddl,
+# чтобы изменения search.py не меняли историю миграций
+
+
+def install(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        if vendor == 'postgresql':
+            statements = [
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('russian', coalesce(text, ''))) STORED",
+                f"CREATE INDEX {table}_search_idx ON {table} USING GIN (search_vector)",
+            ]
+        elif vendor == 'sqlite':
+            fts = f'{table}_fts'
+            statements = [
+                f"CREATE VIRTUAL TABLE {fts} USING fts5(text, content='{table}', "
+                f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+                *sqlite_trigger_sql(table),
+                f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+            ]
+        else:
+            continue
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+def remove(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TABLES:
+        fts = f'{table}_fts'
+        if vendor == 'postgresql':
+            statements = [
+                f"DROP INDEX IF EXISTS {table}_search_idx",
+                f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector",
+            ]
+        elif vendor == 'sqlite':
+            statements = [f"DROP TRIGGER IF EXISTS {fts}_{suffix}" for suffix in ('ai', 'ad', 'au')]
+            statements.append(f"DROP TABLE IF EXISTS {fts}")
+        else:
+            continue
+        for statement in statements:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0004_answer_user_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, remove),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:47
+
+from django.db import migrations, models
+
+from qa_api.migrations._search_ddl import reinstall_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='answer',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата удаления'),
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, help_text='Пометка удаления; строка скрыта от чтения до физического удаления', verbose_name='Удален'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата удаления'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, help_text='Пометка удаления; строка скрыта от чтения до физического удаления', verbose_name='Удален'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='qa_api_answer_purge_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at'], name='qa_api_question_purge_idx'),
+        ),
+        # SQLite добавляет поле с default пересозданием таблицы, и триггеры FTS5 теряются
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:49
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0006_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('answers', 'Ответы'), ('questions', 'Вопросы')], max_length=16, verbose_name='Тип записей')),
+                ('filename', models.CharField(help_text='Путь относительно QA_ARCHIVE_DIR', max_length=255, unique=True, verbose_name='Файл сегмента')),
+                ('first_id', models.BigIntegerField(verbose_name='Минимальный id')),
+                ('last_id', models.BigIntegerField(verbose_name='Максимальный id')),
+                ('first_created_at', models.DateTimeField(verbose_name='Самая ранняя запись')),
+                ('last_created_at', models.DateTimeField(verbose_name='Самая поздняя запись')),
+                ('rows', models.PositiveIntegerField(verbose_name='Количество записей')),
+                ('size_bytes', models.PositiveBigIntegerField(verbose_name='Размер файла, байт')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Контрольная сумма')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+            ],
+            options={
+                'verbose_name': 'Сегмент архива',
+                'verbose_name_plural': 'Сегменты архива',
+                'ordering': ['kind', 'first_id'],
+                'indexes': [models.Index(fields=['kind', 'first_id', 'last_id'], name='qa_api_arch_kind_41b4bc_idx')],
+            },
+        ),
+    ]
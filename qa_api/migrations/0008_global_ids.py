@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:57
+
+import qa_api.ids
+from django.db import migrations, models
+
+from qa_api.migrations._search_ddl import reinstall_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0007_archivesegment'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='id',
+            field=models.BigIntegerField(default=qa_api.ids.new_id, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='id',
+            field=models.BigIntegerField(default=qa_api.ids.new_id, editable=False, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        # Существующие строки сохраняют свои id; SQLite пересоздает таблицы, триггеры FTS5 теряются
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Общая последовательность номеров id (qa_api/ids.py) для PostgreSQL: номер
+# выдается блоками по 1024, первый — больше номеров всех строк с id ниже 2^52
+# (выше — диапазон manage.py seed и id прежнего формата). Значения продублированы
+# здесь, чтобы изменения ids.py не меняли историю миграций
+SEED_ID_BASE = 1 << 52
+VSHARD_BITS = 10
+ID_BLOCK_SIZE = 1024
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT MAX(id) FROM (SELECT MAX(id) AS id FROM qa_api_question WHERE id < %s "
+            "UNION ALL SELECT MAX(id) FROM qa_api_answer WHERE id < %s) AS ids",
+            [SEED_ID_BASE, SEED_ID_BASE],
+        )
+        (last,) = cursor.fetchone()
+        start = 1 if last is None else (last >> VSHARD_BITS) + 1
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS qa_api_id_seq START WITH {start} INCREMENT BY {ID_BLOCK_SIZE}")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP SEQUENCE IF EXISTS qa_api_id_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0008_global_ids'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
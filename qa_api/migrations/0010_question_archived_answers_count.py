@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:40
+
+from django.db import migrations, models
+
+from qa_api.migrations._search_ddl import reinstall_search_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa_api', '0009_id_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='archived_answers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Сколько ответов из answers_count перенесено в архив (archive_cold)', verbose_name='Ответов в архиве'),
+        ),
+        migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Замороженный DDL полнотекстового индекса для миграций (0005_search_index и
+# пересоздающих таблицы). Не импортирует qa_api/search.py, чтобы его изменения не
+# меняли историю миграций; загрузчик миграций пропускает модули, начинающиеся с '_'
+TABLES = ('qa_api_question', 'qa_api_answer')
+
+
+def sqlite_trigger_sql(table: str) -> list[str]:
+    fts = f'{table}_fts'
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF text ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); "
+        f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+    ]
+
+
+# SQLite пересоздает таблицу при изменении схемы, и триггеры FTS5 теряются.
+# Миграции, меняющие qa_api_question или qa_api_answer, добавляют в конце
+# migrations.RunPython(reinstall_search_triggers, migrations.RunPython.noop)
+def reinstall_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in TABLES:
+        fts = f'{table}_fts'
+        for statement in sqlite_trigger_sql(table):
+            schema_editor.execute(statement)
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
@@ -1,12 +1,56 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, router, transaction
+from django.db.models import Case, F, When
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
-import logging
 
-logger = logging.getLogger(__name__)
+from .ids import new_id, virtual_shard
+
+
+# Вопросы и ответы шардированы (shards.py): create() без .using() сохраняет
+# экземпляр в его шард, а не в БД по умолчанию
+class ShardedQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
+ShardedManager = models.Manager.from_queryset(ShardedQuerySet)
+
+
+# Удаление вопросов и ответов — пометка is_deleted (tombstone) одним UPDATE.
+# Менеджер objects скрывает помеченные строки во всех путях чтения, all_objects
+# видит все; физически строки удаляет команда purge_deleted
+class LiveManager(ShardedManager):
+    live_filter = {'is_deleted': False}
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**self.live_filter)
+
+
+class LiveAnswerManager(LiveManager):
+    # Ответы удаленного вопроса не помечаются по одному — скрываются через вопрос,
+    # ценой JOIN с вопросом в каждом чтении (и по id ответа)
+    live_filter = {'is_deleted': False, 'question__is_deleted': False}
+
+    # Ответы вопроса, который вызывающий только что прочитал живым, — без JOIN
+    def of_live_question(self, question_id: int):
+        return ShardedManager.get_queryset(self).filter(is_deleted=False, question_id=question_id)
+
 
 # Модель вопроса
 class Question(models.Model):
+    # Глобально уникальный id с номером виртуального шарда (ids.py, shards.py)
+    id = models.BigIntegerField(
+        primary_key=True,
+        default=new_id,
+        editable=False,
+        verbose_name="ID"
+    )
     text = models.TextField(
         verbose_name="Текст вопроса",
         validators=[MinLengthValidator(5, "Вопрос должен содержать минимум 5 символов")],
@@ -17,6 +61,39 @@ class Question(models.Model):
         default=timezone.now,
         help_text="Автоматически устанавливается при создании"
     )
+    answers_count = models.PositiveIntegerField(
+        verbose_name="Количество ответов",
+        default=0,
+        editable=False,
+        help_text="Денормализованный счетчик, обновляется при создании и удалении ответов"
+    )
+    archived_answers_count = models.PositiveIntegerField(
+        verbose_name="Ответов в архиве",
+        default=0,
+        editable=False,
+        help_text="Сколько ответов из answers_count перенесено в архив (archive_cold)"
+    )
+    last_activity_at = models.DateTimeField(
+        verbose_name="Последняя активность",
+        default=timezone.now,
+        editable=False,
+        help_text="Обновляется при добавлении и удалении ответов; используется для ETag/Last-Modified"
+    )
+    is_deleted = models.BooleanField(
+        verbose_name="Удален",
+        default=False,
+        editable=False,
+        help_text="Пометка удаления; строка скрыта от чтения до физического удаления"
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name="Дата удаления",
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = LiveManager()
+    all_objects = ShardedManager()
 
     class Meta:
         verbose_name = "Вопрос"
@@ -24,25 +101,54 @@ class Question(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
+            # Очередь на физическое удаление для purge_deleted
+            models.Index(fields=['deleted_at'], condition=models.Q(is_deleted=True),
+                         name='qa_api_question_purge_idx'),
         ]
 
     def __str__(self) -> str:
         return f"Вопрос #{self.id}"
 
-    def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        if is_new:
-            logger.info(f"Создан новый вопрос id={self.id}")
 
-    def delete(self, *args, **kwargs):
-        answers_count = self.answers.count()
-        super().delete(*args, **kwargs)
-        logger.info(f"Вопрос id={self.id} и {answers_count} ответов удалены")
+# Атомарно изменяет answers_count (или другой счетчик field) одним UPDATE:
+# {question_id: delta}, заодно сдвигая last_activity_at. С touch=False (архивация)
+# last_activity_at сдвигается на 1 мкс: ETag меняется, но вопрос не становится "активным"
+def adjust_answers_count(deltas: dict[int, int], using: str | None = None, touch: bool = True,
+                         field: str = 'answers_count') -> None:
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    queryset = Question.objects.using(using) if using else Question.objects
+    if touch:
+        extra = {'last_activity_at': timezone.now()}
+    else:
+        extra = {'last_activity_at': F('last_activity_at') + timedelta(microseconds=1)}
+    if len(deltas) == 1:
+        [(pk, delta)] = deltas.items()
+        queryset.filter(pk=pk).update(**{field: F(field) + delta}, **extra)
+        return
+    queryset.filter(pk__in=deltas).update(**{
+        field: F(field) + Case(
+            *[When(pk=pk, then=delta) for pk, delta in deltas.items()],
+            default=0,
+            output_field=models.IntegerField(),
+        ),
+    }, **extra)
+
+
+# id ответа — с виртуальным шардом его вопроса: ответ лежит в том же шарде
+def new_answer_id(question_id: int) -> int:
+    return new_id(virtual_shard(question_id))
 
 
 # Модель ответа на вопрос
 class Answer(models.Model):
+    id = models.BigIntegerField(
+        primary_key=True,
+        default=new_id,
+        editable=False,
+        verbose_name="ID"
+    )
     question = models.ForeignKey(
         Question,
         on_delete=models.CASCADE,
@@ -65,6 +171,21 @@ class Answer(models.Model):
         default=timezone.now,
         help_text="Автоматически устанавливается при создании"
     )
+    is_deleted = models.BooleanField(
+        verbose_name="Удален",
+        default=False,
+        editable=False,
+        help_text="Пометка удаления; строка скрыта от чтения до физического удаления"
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name="Дата удаления",
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = LiveAnswerManager()
+    all_objects = ShardedManager()
 
     class Meta:
         verbose_name = "Ответ"
@@ -72,18 +193,69 @@ class Answer(models.Model):
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['question', 'created_at']),
-            models.Index(fields=['user_id']),
+            # История ответов пользователя (GET /api/users/{user_id}/answers/);
+            # покрывает и поиск по одному user_id
+            models.Index(fields=['user_id', 'created_at']),
+            models.Index(fields=['deleted_at'], condition=models.Q(is_deleted=True),
+                         name='qa_api_answer_purge_idx'),
         ]
 
     def __str__(self) -> str:
         return f"Ответ #{self.id}"
 
+    # Вставка ответа и обновление счетчика вопроса (signals.py) — в одной транзакции.
+    # Событие в лог пишет представление, модель не логирует
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
-        if is_new:
-            logger.info(f"Создан новый ответ id={self.id} на вопрос id={self.question_id}")
+        if self._state.adding and self.question_id and virtual_shard(self.pk) != virtual_shard(self.question_id):
+            self.pk = new_answer_id(self.question_id)
+        using = kwargs.get('using') or router.db_for_write(Answer, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        logger.info(f"Ответ id={self.id} удален")
+        using = kwargs.get('using') or router.db_for_write(Answer, instance=self)
+        with transaction.atomic(using=using):
+            super().delete(*args, **kwargs)
+
+
+# Манифест архива: какой файл-сегмент содержит какой диапазон id.
+# Сегменты только дописываются и никогда не изменяются (см. archive.py)
+class ArchiveSegment(models.Model):
+    KIND_CHOICES = [
+        ('answers', "Ответы"),
+        ('questions', "Вопросы"),
+    ]
+
+    kind = models.CharField(
+        verbose_name="Тип записей",
+        max_length=16,
+        choices=KIND_CHOICES
+    )
+    filename = models.CharField(
+        verbose_name="Файл сегмента",
+        max_length=255,
+        unique=True,
+        help_text="Путь относительно QA_ARCHIVE_DIR"
+    )
+    first_id = models.BigIntegerField(verbose_name="Минимальный id")
+    last_id = models.BigIntegerField(verbose_name="Максимальный id")
+    first_created_at = models.DateTimeField(verbose_name="Самая ранняя запись")
+    last_created_at = models.DateTimeField(verbose_name="Самая поздняя запись")
+    rows = models.PositiveIntegerField(verbose_name="Количество записей")
+    size_bytes = models.PositiveBigIntegerField(verbose_name="Размер файла, байт")
+    sha256 = models.CharField(verbose_name="Контрольная сумма", max_length=64)
+    created_at = models.DateTimeField(
+        verbose_name="Дата архивации",
+        default=timezone.now
+    )
+
+    class Meta:
+        verbose_name = "Сегмент архива"
+        verbose_name_plural = "Сегменты архива"
+        ordering = ['kind', 'first_id']
+        indexes = [
+            models.Index(fields=['kind', 'first_id', 'last_id']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.first_id}..{self.last_id}"
@@ -0,0 +1,306 @@
+import base64
+import heapq
+import itertools
+import json
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Q, QuerySet
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    # Для нефильтрованной таблицы в PostgreSQL берем оценку планировщика из pg_class,
+    # иначе — обычный COUNT(*)
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    return queryset.count()
+
+
+class PageSizeMixin:
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    # DRF Request или обычный HttpRequest (асинхронные представления)
+    @staticmethod
+    def get_query_params(request):
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request) -> int:
+        value = self.get_query_params(request).get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+
+# Keyset-пагинация: курсор хранит значения полей сортировки последней строки страницы,
+# следующая страница выбирается условием (created_at, id) < (c, i) по индексу
+# без OFFSET, поэтому задержка не растет с глубиной прокрутки
+class KeysetPagination(PageSizeMixin, BasePagination):
+    ordering = ('-created_at', '-id')
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.prepare(queryset, request)
+        self.count = self.get_count(queryset, request)
+        return self.finalize(list(self.seek(queryset)[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.prepare(queryset, request)
+        self.count = await self.aget_count(queryset, request)
+        return self.finalize([row async for row in self.seek(queryset)[:self.page_size + 1]])
+
+    # Одна страница по нескольким БД (шардам): из каждой берется страница по тому же
+    # курсору, страницы сливаются по полям сортировки. Курсор — позиция в общем порядке,
+    # поэтому следующая страница снова выбирается из каждого шарда по индексу
+    def paginate_querysets(self, querysets: list[QuerySet], request) -> list:
+        self.prepare(querysets[0], request)
+        counts = [self.get_count(queryset, request) for queryset in querysets]
+        self.count = None if counts[0] is None else sum(counts)
+        return self.finalize(self.merge([
+            list(self.seek(queryset)[:self.page_size + 1]) for queryset in querysets
+        ]))
+
+    async def apaginate_querysets(self, querysets: list[QuerySet], request) -> list:
+        self.prepare(querysets[0], request)
+        counts = [await self.aget_count(queryset, request) for queryset in querysets]
+        self.count = None if counts[0] is None else sum(counts)
+        return self.finalize(self.merge([
+            [row async for row in self.seek(queryset)[:self.page_size + 1]] for queryset in querysets
+        ]))
+
+    def merge(self, pages: list[list]) -> list:
+        if len(pages) == 1:
+            return pages[0]
+        # Все поля ordering сортируются в одном направлении
+        descending = self.ordering[0].startswith('-') != (self.cursor[1] if self.cursor else False)
+        merged = heapq.merge(*pages, key=self.get_position, reverse=descending)
+        return list(itertools.islice(merged, self.page_size + 1))
+
+    # Первая страница без учета параметров запроса — для встраивания в другой ответ,
+    # ссылки next/previous строятся от base_url
+    def paginate_first_page(self, queryset: QuerySet, base_url: str) -> list:
+        self.prepare_first_page(base_url)
+        return self.finalize(list(self.seek(queryset)[:self.page_size + 1]))
+
+    async def apaginate_first_page(self, queryset: QuerySet, base_url: str) -> list:
+        self.prepare_first_page(base_url)
+        return self.finalize([row async for row in self.seek(queryset)[:self.page_size + 1]])
+
+    def prepare_first_page(self, base_url: str) -> None:
+        self.base_url = base_url
+        self.cursor = None
+        self.count = None
+
+    def prepare(self, queryset: QuerySet, request) -> None:
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request, queryset)
+
+    # Сортировка и условие поиска по курсору
+    def seek(self, queryset: QuerySet) -> QuerySet:
+        reverse = self.cursor[1] if self.cursor else False
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+        if self.cursor:
+            queryset = queryset.filter(self.seek_filter(self.cursor[0], reverse))
+        return queryset
+
+    def finalize(self, rows: list) -> list:
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.cursor and self.cursor[1]:
+            # Назад выбирали в обратном порядке — разворачиваем
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.page = rows
+        return rows
+
+    def get_ordering(self, reverse: bool = False) -> list[str]:
+        if not reverse:
+            return list(self.ordering)
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def seek_filter(self, position: list, reverse: bool) -> Q:
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, position):
+            descending = name.startswith('-') != reverse
+            field = name.lstrip('-')
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_count(self, queryset: QuerySet, request) -> int | None:
+        mode = self.get_query_params(request).get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    async def aget_count(self, queryset: QuerySet, request) -> int | None:
+        mode = self.get_query_params(request).get(self.count_query_param)
+        if mode == 'exact':
+            return await queryset.acount()
+        if mode == 'estimate':
+            return await sync_to_async(estimate_count)(queryset)
+        return None
+
+    def get_position(self, row) -> list:
+        fields = [name.lstrip('-') for name in self.ordering]
+        if isinstance(row, dict):
+            return [row[name] for name in fields]
+        return [getattr(row, name) for name in fields]
+
+    def encode_cursor(self, row, reverse: bool) -> str:
+        position = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self.get_position(row)
+        ]
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, queryset: QuerySet) -> tuple[list, bool] | None:
+        encoded = self.get_query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            position = payload['p']
+            reverse = bool(payload.get('r', False))
+            if len(position) != len(self.ordering):
+                raise ValueError
+            meta = queryset.model._meta
+            position = [
+                meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, position)
+            ]
+        except Exception:
+            raise InvalidCursor("Некорректный курсор")
+        return position, reverse
+
+    def get_next_link(self, base_url: str | None = None) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(base_url or self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(self.page[-1], reverse=False))
+
+    def get_previous_link(self, base_url: str | None = None) -> str | None:
+        if not self.has_previous:
+            return None
+        url = base_url or self.base_url
+        if not self.page:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.page[0], reverse=True))
+
+    def get_paginated_data(self, data: Any) -> dict:
+        result = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            result['count'] = self.count
+        return result
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+
+# GET /api/questions/ — сначала новые
+class QuestionKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+# GET /api/questions/{id}/answers/ — в порядке добавления, по индексу (question, created_at)
+class AnswerKeysetPagination(KeysetPagination):
+    ordering = ('created_at', 'id')
+
+
+# Пагинация ранжированной выдачи (поиск). Строки сортируются по вычисляемой
+# релевантности, и все совпадения в любом случае ранжируются целиком, поэтому
+# курсор хранит смещение; глубина ограничена max_offset
+class RankedPagination(PageSizeMixin):
+    max_offset = 1000
+
+    # fetch(limit, offset) возвращает строки текущей страницы
+    def paginate(self, fetch, request) -> list:
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.offset = self.decode_cursor(request)
+        rows = list(fetch(self.page_size + 1, self.offset))
+        self.has_next = len(rows) > self.page_size and self.offset + self.page_size < self.max_offset
+        self.page = rows[:self.page_size]
+        return self.page
+
+    @staticmethod
+    def encode_cursor(offset: int) -> str:
+        payload = json.dumps({'o': offset}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request) -> int:
+        encoded = self.get_query_params(request).get(self.cursor_query_param)
+        if not encoded:
+            return 0
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            offset = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())['o']
+            if not isinstance(offset, int) or not 0 <= offset <= self.max_offset:
+                raise ValueError
+        except Exception:
+            raise InvalidCursor("Некорректный курсор")
+        return offset
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(self.offset + self.page_size))
+
+    def get_previous_link(self) -> str | None:
+        if not self.offset:
+            return None
+        previous = max(0, self.offset - self.page_size)
+        if not previous:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(previous))
+
+    def get_paginated_data(self, data: Any) -> dict:
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
@@ -0,0 +1,49 @@
+from typing import Any
+
+from django.db import connections
+
+# Состояние пулов соединений psycopg (DATABASES[...]['OPTIONS']['pool']) — для /api/stats/.
+# Пул создается при первом соединении с алиасом; здесь он только читается, поэтому
+# статистика не открывает соединений. Время ожидания соединения — главный признак
+# того, что пул мал для нагрузки: запросы стоят в очереди, хотя БД свободна
+
+
+def _pool_for(alias: str):
+    wrapper = connections[alias]
+    return getattr(type(wrapper), '_connection_pools', {}).get(alias)
+
+
+def pool_stats() -> dict[str, dict[str, Any]]:
+    stats = {}
+    for alias in connections:
+        pool = _pool_for(alias)
+        if pool is None:
+            continue
+        raw = pool.get_stats()
+        requests = raw.get('requests_num', 0)
+        wait_ms = raw.get('requests_wait_ms', 0)
+        stats[alias] = {
+            'size': raw.get('pool_size', 0),
+            'available': raw.get('pool_available', 0),
+            'min_size': raw.get('pool_min', 0),
+            'max_size': raw.get('pool_max', 0),
+            # Сейчас ждут свободное соединение
+            'waiting': raw.get('requests_waiting', 0),
+            'requests': requests,
+            # Запросы, которым пришлось ждать, и суммарное/среднее ожидание, мс
+            'queued': raw.get('requests_queued', 0),
+            'wait_ms_total': wait_ms,
+            'wait_ms_avg': round(wait_ms / requests, 3) if requests else 0.0,
+            'timeouts': raw.get('requests_errors', 0),
+            'connections_opened': raw.get('connections_num', 0),
+            'connect_ms_total': raw.get('connections_ms', 0),
+        }
+    return stats
+
+
+# Закрывает созданные пулы процесса (например, в мастере gunicorn перед fork)
+def close_pools() -> None:
+    for alias in connections:
+        pool = _pool_for(alias)
+        if pool is not None:
+            connections[alias].close_pool()
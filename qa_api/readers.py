@@ -0,0 +1,74 @@
+from typing import Any
+
+from django.utils import timezone
+
+# Быстрый путь чтения: строки берутся через values() и сразу превращаются в словари
+# той же формы, что дают QuestionSerializer / AnswerSerializer / QuestionDetailSerializer,
+# без интроспекции полей ModelSerializer на каждый объект. UUID и datetime остаются
+# объектами — их кодирует FastJSONRenderer (renderers.py)
+
+QUESTION_VALUES = ('id', 'text', 'created_at', 'answers_count', 'archived_answers_count', 'last_activity_at')
+ANSWER_VALUES = ('id', 'question_id', 'user_id', 'text', 'created_at')
+
+
+def _localize():
+    # DRF выводит datetime в текущей временной зоне; для UTC преобразование не нужно
+    if timezone.get_current_timezone_name() == 'UTC':
+        return lambda value: value
+    return timezone.localtime
+
+
+def question_dicts(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    localize = _localize()
+    return [
+        {
+            'id': row['id'],
+            'text': row['text'],
+            'created_at': localize(row['created_at']),
+            'answers_count': row['answers_count'],
+            # Вопросы из архивных сегментов, записанных до появления поля, — без него
+            'archived_answers_count': row.get('archived_answers_count', 0),
+        }
+        for row in rows
+    ]
+
+
+def answer_dicts(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    localize = _localize()
+    return [
+        {
+            'id': row['id'],
+            'question': row['question_id'],
+            'user_id': row['user_id'],
+            'text': row['text'],
+            'created_at': localize(row['created_at']),
+        }
+        for row in rows
+    ]
+
+
+# Ответ, только что созданный запросом, — без чтения из БД
+def answer_dict(answer) -> dict[str, Any]:
+    [row] = answer_dicts([{field: getattr(answer, field) for field in ANSWER_VALUES}])
+    return row
+
+
+# Для истории ответов пользователя: текст вопроса берется тем же запросом (JOIN через question__text)
+def with_question_text(answers: list[dict[str, Any]], rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    for answer, row in zip(answers, rows):
+        answer['question_text'] = row['question__text']
+    return answers
+
+
+def question_detail_dict(row: dict[str, Any], answers: list[dict[str, Any]],
+                         answers_next: str | None) -> dict[str, Any]:
+    [question] = question_dicts([row])
+    return {
+        'id': question['id'],
+        'text': question['text'],
+        'created_at': question['created_at'],
+        'answers': answer_dicts(answers),
+        'answers_count': question['answers_count'],
+        'archived_answers_count': question['archived_answers_count'],
+        'answers_next': answers_next,
+    }
@@ -0,0 +1,77 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Чтение с реплик, запись — только в основную БД (DEFAULT_DB_ALIAS).
+# Чтение идет в основную БД, если:
+#   - запрос закреплен за ней (use_primary, PrimaryStickinessMiddleware — после записи
+#     клиент какое-то время читает из основной БД и видит свои изменения);
+#   - открыта транзакция в основной БД (чтение внутри нее должно видеть ее же изменения);
+#   - реплики не настроены
+_primary_pinned: ContextVar[bool] = ContextVar('qa_primary_pinned', default=False)
+
+
+def replica_aliases() -> list[str]:
+    return list(getattr(settings, 'QA_DATABASE_REPLICAS', []))
+
+
+def sticky_seconds() -> int:
+    return getattr(settings, 'QA_PRIMARY_STICKY_SECONDS', 5)
+
+
+def pin_primary(pinned: bool = True):
+    return _primary_pinned.set(pinned)
+
+
+def unpin_primary(token) -> None:
+    _primary_pinned.reset(token)
+
+
+@contextmanager
+def use_primary():
+    token = pin_primary()
+    try:
+        yield
+    finally:
+        unpin_primary(token)
+
+
+def reads_from_primary() -> bool:
+    return (
+        _primary_pinned.get()
+        or not replica_aliases()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+# Алиас для чтения из БД alias: реплики есть только у основной БД
+def read_alias(alias: str = DEFAULT_DB_ALIAS) -> str:
+    if alias != DEFAULT_DB_ALIAS or reads_from_primary():
+        return alias
+    return random.choice(replica_aliases())
+
+
+# Алиас основной БД для записи: строки, прочитанные с реплики, пишутся в default
+def primary_alias(alias: str) -> str:
+    return DEFAULT_DB_ALIAS if alias in replica_aliases() else alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    # На репликах те же данные, что и в основной БД
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    # Схема реплик приходит из основной БД репликацией
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import re
+from datetime import timezone as dt_timezone
+from typing import Any, Iterable
+
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Answer, Question
+from .routers import read_alias
+from .shards import is_sharded, shard_aliases
+
+# Полнотекстовый поиск по вопросам и ответам.
+# PostgreSQL: генерируемая колонка search_vector (tsvector) с GIN-индексом.
+# SQLite: внешние таблицы FTS5 (content=<таблица модели>), синхронизируемые триггерами.
+# Индекс поддерживает сама БД при каждой вставке, изменении и удалении строки —
+# в том числе при bulk_create и _raw_delete, которые обходят save()/delete() и сигналы
+# Колонку, индексы, таблицы FTS5 и триггеры создает миграция 0005_search_index; миграции,
+# пересоздающие таблицы в SQLite (ALTER через копирование), ставят триггеры заново
+# (reinstall_search_triggers из qa_api/migrations/_search_ddl.py)
+
+SEARCH_TYPES = ('questions', 'answers')
+SEARCH_CONFIG = 'russian'
+MAX_QUERY_LENGTH = 200
+
+_MODELS = {'questions': Question, 'answers': Answer}
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts_table(model) -> str:
+    return f'{model._meta.db_table}_fts'
+
+
+# Запрос пользователя для FTS5: слова в кавычках с префиксным поиском ("язык"*),
+# операторы FTS5 из ввода не интерпретируются. Префикс частично заменяет стемминг
+def fts5_match_query(text: str) -> str:
+    return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(text))
+
+
+def _select_sql(vendor: str, kind: str) -> str:
+    model = _MODELS[kind]
+    table = model._meta.db_table
+    row_type = model._meta.model_name
+    # Помеченные удаленными строки (и ответы удаленных вопросов) в выдачу не попадают
+    if model is Answer:
+        question_id = 't.question_id'
+        live_join = f"JOIN {Question._meta.db_table} parent ON parent.id = t.question_id "
+        live_filter = "NOT t.is_deleted AND NOT parent.is_deleted"
+    else:
+        question_id = 'NULL'
+        live_join = ''
+        live_filter = "NOT t.is_deleted"
+    if vendor == 'postgresql':
+        return (
+            f"SELECT '{row_type}' AS type, t.id, {question_id} AS question_id, t.text, t.created_at, "
+            f"ts_rank(t.search_vector, q.query) AS rank "
+            f"FROM {table} t {live_join}"
+            f"CROSS JOIN websearch_to_tsquery('{SEARCH_CONFIG}', %s) AS q(query) "
+            f"WHERE t.search_vector @@ q.query AND {live_filter}"
+        )
+    fts = _fts_table(model)
+    # bm25 тем меньше, чем релевантнее — меняем знак, чтобы сортировка совпадала с ts_rank
+    return (
+        f"SELECT '{row_type}' AS type, t.id, {question_id} AS question_id, t.text, t.created_at, "
+        f"-bm25({fts}) AS rank "
+        f"FROM {fts} JOIN {table} t ON t.id = {fts}.rowid {live_join}"
+        f"WHERE {fts} MATCH %s AND {live_filter}"
+    )
+
+
+def _rank_key(row: dict[str, Any]) -> tuple:
+    return row['rank'], row['created_at'], row['id']
+
+
+# Запасной поиск для БД без полнотекстового индекса (не PostgreSQL и не SQLite):
+# все слова запроса через icontains, без ранжирования (rank = 0, новые выше).
+# Это полный просмотр таблиц — годится для разработки, не для больших объемов
+def scan_search(text: str, types: Iterable[str], limit: int, offset: int,
+                using: str) -> list[dict[str, Any]]:
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return []
+    pages = []
+    for kind in types:
+        model = _MODELS[kind]
+        queryset = model.objects.using(using)
+        for token in tokens:
+            queryset = queryset.filter(text__icontains=token)
+        fields = ('id', 'question_id', 'text', 'created_at') if model is Answer else ('id', 'text', 'created_at')
+        rows = queryset.order_by('-created_at', '-id').values(*fields)[:offset + limit]
+        page = []
+        for row in rows:
+            item = {'type': model._meta.model_name, 'id': row['id']}
+            if model is Answer:
+                item['question'] = row['question_id']
+            item.update(text=row['text'], created_at=row['created_at'], rank=0.0)
+            page.append(item)
+        pages.append(page)
+    merged = heapq.merge(*pages, key=_rank_key, reverse=True)
+    return list(itertools.islice(merged, offset, offset + limit))
+
+
+# Возвращает строки вида {'type', 'id', 'question'?, 'text', 'created_at', 'rank'}
+# по убыванию релевантности (при равенстве — новые выше). Без using ищет во всех
+# шардах: из каждого берутся первые offset + limit строк, выдачи сливаются по rank.
+# Ранг считается по статистике своего шарда, поэтому порядок между шардами приближенный
+def search(text: str, types: Iterable[str] = SEARCH_TYPES, limit: int = 20,
+           offset: int = 0, using: str | None = None) -> list[dict[str, Any]]:
+    if using is None and is_sharded():
+        types = list(types)
+        pages = [search(text, types, limit + offset, 0, using=read_alias(alias)) for alias in shard_aliases()]
+        merged = heapq.merge(*pages, key=_rank_key, reverse=True)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    using = using or router.db_for_read(Question)
+    connection = connections[using]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        return scan_search(text, types, limit, offset, using)
+
+    query = text if connection.vendor == 'postgresql' else fts5_match_query(text)
+    types = list(types)
+    if not query.strip() or not types:
+        return []
+
+    sql = ' UNION ALL '.join(_select_sql(connection.vendor, kind) for kind in types)
+    sql += ' ORDER BY rank DESC, created_at DESC, id DESC LIMIT %s OFFSET %s'
+    params = [query] * len(types) + [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    results = []
+    for row in rows:
+        created_at = row['created_at']
+        if isinstance(created_at, str):
+            # SQLite без ORM отдает дату строкой в UTC
+            created_at = parse_datetime(created_at)
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, dt_timezone.utc)
+        item = {'type': row['type'], 'id': row['id']}
+        if row['type'] == 'answer':
+            item['question'] = row['question_id']
+        item.update(text=row['text'], created_at=created_at, rank=float(row['rank']))
+        results.append(item)
+    return results
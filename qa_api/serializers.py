@@ -2,10 +2,6 @@ from rest_framework import serializers
 from rest_framework.validators import ValidationError
 from .models import Question, Answer
 import uuid
-from typing import Dict, Any
-import logging
-
-logger = logging.getLogger(__name__)
 
 # Сериализатор для модели Answer - GET /answers/{id}/
 class AnswerSerializer(serializers.ModelSerializer):
@@ -72,19 +68,14 @@ class AnswerCreateSerializer(serializers.ModelSerializer):
         
         return cleaned_text
 
-    def create(self, validated_data: Dict[str, Any]) -> Answer:
-        logger.info(f"Создается ответ на вопрос id={validated_data.get('id')}")
-        return super().create(validated_data)
-
 
 # Сериализатор для модели Question - GET, POST /questions/
 class QuestionSerializer(serializers.ModelSerializer):
-    answers_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Question
-        fields = ['id', 'text', 'created_at', 'answers_count']
-        read_only_fields = ['id', 'created_at', 'answers_count']
+        fields = ['id', 'text', 'created_at', 'answers_count', 'archived_answers_count']
+        read_only_fields = ['id', 'created_at', 'answers_count', 'archived_answers_count']
 
     def validate_text(self, value: str) -> str:
         if not value or not value.strip():
@@ -96,23 +87,15 @@ class QuestionSerializer(serializers.ModelSerializer):
         
         return cleaned_text
 
-    def get_answers_count(self, obj: Question) -> int:
-        return obj.answers.count()
-
-    def create(self, validated_data: Dict[str, Any]) -> Question:
-        logger.info("Создается новый вопрос")
-        return super().create(validated_data)
-
 
 # Сериализатор для модели Question с ответами - GET /questions/{id}/
+# answers — только первая страница ответов (answers_page), остальные
+# доступны по ссылке answers_next
 class QuestionDetailSerializer(serializers.ModelSerializer):
-    answers = AnswerSerializer(many=True, read_only=True)
-    answers_count = serializers.SerializerMethodField()
+    answers = AnswerSerializer(many=True, read_only=True, source='answers_page')
+    answers_next = serializers.URLField(read_only=True, allow_null=True, default=None)
 
     class Meta:
         model = Question
-        fields = ['id', 'text', 'created_at', 'answers', 'answers_count']
-        read_only_fields = ['id', 'created_at', 'answers', 'answers_count']
-
-    def get_answers_count(self, obj: Question) -> int:
-        return obj.answers.count()
\ No newline at end of file
+        fields = ['id', 'text', 'created_at', 'answers', 'answers_count', 'archived_answers_count', 'answers_next']
+        read_only_fields = ['id', 'created_at', 'answers', 'answers_count', 'archived_answers_count', 'answers_next']
\ No newline at end of file
@@ -0,0 +1,172 @@
+from collections import Counter, defaultdict
+from typing import Any
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import cache
+from .models import Answer, Question, adjust_answers_count, new_answer_id
+from .serializers import AnswerCreateSerializer, QuestionSerializer
+from .shards import candidate_shards, group_by_shard, shard_aliases
+
+# Ограничения пакетных операций, переопределяются в settings
+BULK_MAX_ITEMS = getattr(settings, 'QA_BULK_MAX_ITEMS', 5000)
+BULK_BATCH_SIZE = getattr(settings, 'QA_BULK_BATCH_SIZE', 1000)
+
+
+class BulkLimitExceeded(ValueError):
+    pass
+
+
+def check_bulk_size(items: list) -> None:
+    if len(items) > BULK_MAX_ITEMS:
+        raise BulkLimitExceeded(f"За один запрос можно передать не более {BULK_MAX_ITEMS} записей")
+
+
+def _parse_question_id(value: Any) -> int | None:
+    if isinstance(value, bool):
+        return None
+    try:
+        question_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return question_id if question_id > 0 else None
+
+
+# Пакетное создание ответов: существование вопросов проверяется одним запросом IN
+# на шард, каждый элемент — правилами AnswerCreateSerializer, вставка — bulk_create
+# в транзакции шарда вместе с обновлением счетчиков answers_count.
+# Возвращает созданные ответы и ошибки вида {"index": i, "errors": {...}}.
+# Если partial=False, при любой ошибке валидации ничего не сохраняется.
+def bulk_create_answers(items: list[dict], partial: bool = False) -> tuple[list[Answer], list[dict]]:
+    check_bulk_size(items)
+
+    question_ids = {}
+    for index, item in enumerate(items):
+        if isinstance(item, dict):
+            question_ids[index] = _parse_question_id(item.get('question'))
+    # Ответ пишется в тот шард, где лежит его вопрос
+    wanted = {pk for pk in question_ids.values() if pk}
+    located = {}
+    for alias in shard_aliases() if wanted else []:
+        found = Question.objects.using(alias).filter(pk__in=wanted).values_list('pk', flat=True)
+        located.update(dict.fromkeys(found, alias))
+
+    # Один экземпляр сериализатора на весь пакет, как это делает ListSerializer
+    validator = AnswerCreateSerializer()
+    answers = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "errors": {"non_field_errors": ["Ожидается объект"]}})
+            continue
+
+        item_errors = {}
+        question_id = question_ids[index]
+        if question_id is None:
+            item_errors['question'] = ["Необходимо указать корректный id вопроса"]
+        elif question_id not in located:
+            item_errors['question'] = [f"Вопрос с id={question_id} не найден"]
+
+        try:
+            validated = validator.run_validation(item)
+        except ValidationError as exc:
+            item_errors.update(exc.detail)
+            validated = None
+
+        if item_errors:
+            errors.append({"index": index, "errors": item_errors})
+        else:
+            answers.append(Answer(id=new_answer_id(question_id), question_id=question_id, **validated))
+
+    if errors and not partial:
+        return [], errors
+    if not answers:
+        return [], errors
+
+    by_shard = defaultdict(list)
+    for answer in answers:
+        by_shard[located[answer.question_id]].append(answer)
+    for alias, shard_answers in by_shard.items():
+        with transaction.atomic(using=alias):
+            Answer.objects.using(alias).bulk_create(shard_answers, batch_size=BULK_BATCH_SIZE)
+            question_ids = Counter(answer.question_id for answer in shard_answers)
+            adjust_answers_count(question_ids, using=alias)
+            cache.invalidate_questions(question_ids, using=alias)
+    return answers, errors
+
+
+# Пакетное создание вопросов: валидация правилами QuestionSerializer, вставка bulk_create
+# по шардам. Контракт такой же, как у bulk_create_answers
+def bulk_create_questions(items: list[dict], partial: bool = False) -> tuple[list[Question], list[dict]]:
+    check_bulk_size(items)
+
+    validator = QuestionSerializer()
+    questions = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "errors": {"non_field_errors": ["Ожидается объект"]}})
+            continue
+        try:
+            validated = validator.run_validation(item)
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.detail})
+            continue
+        questions.append(Question(**validated))
+
+    if (errors and not partial) or not questions:
+        return [], errors
+
+    for alias, shard_questions in group_by_shard(questions, key=lambda question: question.pk).items():
+        with transaction.atomic(using=alias):
+            Question.objects.using(alias).bulk_create(shard_questions, batch_size=BULK_BATCH_SIZE)
+            cache.invalidate_question_list(using=alias)
+    return questions, errors
+
+
+# Удаление вопросов: пометка is_deleted одним UPDATE по вопросам в каждом шарде,
+# ответы не затрагиваются (скрываются через вопрос). Возвращает (вопросов, ответов в них)
+def tombstone_questions(queryset: QuerySet) -> tuple[int, int]:
+    questions = answers = 0
+    for alias in shard_aliases():
+        shard_queryset = queryset.using(alias)
+        with transaction.atomic(using=alias):
+            answers += shard_queryset.aggregate(total=Sum('answers_count'))['total'] or 0
+            updated = shard_queryset.update(is_deleted=True, deleted_at=timezone.now())
+            if updated:
+                cache.invalidate_all_questions(using=alias)
+        questions += updated
+    return questions, answers
+
+
+def tombstone_question(pk: int) -> tuple[int, int]:
+    for alias in candidate_shards(pk):
+        queryset = Question.objects.using(alias).filter(pk=pk)
+        with transaction.atomic(using=alias):
+            answers = queryset.select_for_update().values_list('answers_count', flat=True).first()
+            if answers is None:
+                continue
+            queryset.update(is_deleted=True, deleted_at=timezone.now())
+            cache.invalidate_questions([pk], using=alias)
+        return 1, answers
+    return 0, 0
+
+
+# Пометка ответа удаленным; счетчик вопроса уменьшается в той же транзакции.
+# Возвращает id вопроса или None, если ответа нет
+def tombstone_answer(pk: int) -> int | None:
+    for alias in candidate_shards(pk):
+        queryset = Answer.objects.using(alias).filter(pk=pk)
+        with transaction.atomic(using=alias):
+            question_id = queryset.select_for_update(of=('self',)).values_list('question_id', flat=True).first()
+            if question_id is None:
+                continue
+            queryset.update(is_deleted=True, deleted_at=timezone.now())
+            adjust_answers_count({question_id: -1}, using=alias)
+            cache.invalidate_questions([question_id], using=alias)
+        return question_id
+    return None
@@ -0,0 +1,152 @@
+import functools
+from collections import defaultdict
+from typing import Any, Callable, Iterable, TypeVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+
+from .ids import VIRTUAL_SHARDS, virtual_shard
+from .models import Answer, Question
+from .routers import primary_alias
+
+# Шардирование вопросов и ответов по хэшу id. Каждый id (ids.py) несет виртуальный
+# шард 0..1023, карта QA_SHARD_MAP отображает диапазоны виртуальных шардов на БД
+# из QA_SHARDS. Ответ лежит в шарде своего вопроса и получает его виртуальный шард,
+# поэтому вопрос, его ответы и ответ по id читаются из одной БД. Список вопросов
+# и другие выборки без id опрашивают все шарды (read_querysets) и сливают результат.
+# Остальные модели (манифест архива, auth, сессии) живут только в default.
+# Строки, созданные до включения шардирования или после смены карты, лежат не в
+# своем шарде, пока их не перенесет rebalance_shards, — поэтому поиск по id после
+# своего шарда проверяет остальные (candidate_shards)
+SHARDED_MODELS = frozenset({'qa_api.question', 'qa_api.answer'})
+
+T = TypeVar('T')
+
+
+def shard_aliases() -> list[str]:
+    return list(getattr(settings, 'QA_SHARDS', None) or [DEFAULT_DB_ALIAS])
+
+
+def is_sharded() -> bool:
+    return len(shard_aliases()) > 1
+
+
+# Карта "0-511:default,512-1023:shard1"; без нее диапазоны делятся поровну
+# в порядке QA_SHARDS, так что новый шард в конце забирает часть каждого диапазона
+@functools.lru_cache(maxsize=8)
+def _build_map(aliases: tuple[str, ...], spec: str) -> tuple[str, ...]:
+    if not spec:
+        return tuple(aliases[vshard * len(aliases) // VIRTUAL_SHARDS] for vshard in range(VIRTUAL_SHARDS))
+
+    mapping: list[str | None] = [None] * VIRTUAL_SHARDS
+    for item in filter(None, (item.strip() for item in spec.split(','))):
+        bounds, _, alias = item.partition(':')
+        first, _, last = bounds.partition('-')
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ImproperlyConfigured(f"Некорректный диапазон в QA_SHARD_MAP: {item!r}")
+        alias = alias.strip()
+        if alias not in aliases or not 0 <= first <= last < VIRTUAL_SHARDS:
+            raise ImproperlyConfigured(f"Некорректный диапазон в QA_SHARD_MAP: {item!r}")
+        mapping[first:last + 1] = [alias] * (last - first + 1)
+    if None in mapping:
+        raise ImproperlyConfigured(f"QA_SHARD_MAP должна покрывать виртуальные шарды 0..{VIRTUAL_SHARDS - 1}")
+    return tuple(mapping)
+
+
+def shard_map() -> tuple[str, ...]:
+    return _build_map(tuple(shard_aliases()), getattr(settings, 'QA_SHARD_MAP', ''))
+
+
+def shard_for_id(pk: int) -> str:
+    return shard_map()[virtual_shard(pk)]
+
+
+# Свой шард первым, затем остальные
+def candidate_shards(pk: int) -> list[str]:
+    home = shard_for_id(pk)
+    return [home] + [alias for alias in shard_aliases() if alias != home]
+
+
+def group_by_shard(items: Iterable[T], key: Callable[[T], int]) -> dict[str, list[T]]:
+    groups = defaultdict(list)
+    for item in items:
+        groups[shard_for_id(key(item))].append(item)
+    return dict(groups)
+
+
+# Запрос к шарду alias. Для default БД не фиксируется: основную БД или реплику
+# выберет ReplicaRouter при выполнении запроса
+def on_shard(queryset: QuerySet, alias: str) -> QuerySet:
+    return queryset if alias == DEFAULT_DB_ALIAS else queryset.using(alias)
+
+
+# Один и тот же запрос к каждому шарду
+def read_querysets(queryset: QuerySet) -> list[QuerySet]:
+    return [on_shard(queryset, alias) for alias in shard_aliases()]
+
+
+# Строка с первичным ключом pk: (шард, строка) или (None, None). Промах стоит
+# по запросу на шард — цена поиска строк, еще не перенесенных rebalance_shards
+def get_on_shards(queryset: QuerySet, pk: int) -> tuple[str | None, Any]:
+    for alias in candidate_shards(pk):
+        row = on_shard(queryset, alias).filter(pk=pk).first()
+        if row is not None:
+            return alias, row
+    return None, None
+
+
+async def aget_on_shards(queryset: QuerySet, pk: int) -> tuple[str | None, Any]:
+    for alias in candidate_shards(pk):
+        row = await on_shard(queryset, alias).filter(pk=pk).afirst()
+        if row is not None:
+            return alias, row
+    return None, None
+
+
+def _instance_shard(instance) -> str | None:
+    if instance._state.db:
+        return primary_alias(instance._state.db)
+    if isinstance(instance, Answer):
+        question_field = Answer._meta.get_field('question')
+        if question_field.is_cached(instance) and instance.question._state.db:
+            return primary_alias(instance.question._state.db)
+        return shard_for_id(instance.question_id) if instance.question_id else None
+    return shard_for_id(instance.pk) if instance.pk else None
+
+
+# Направляет операции с экземплярами вопросов и ответов в их шард; запросы без
+# экземпляра (Question.objects.filter(...)) должны явно указывать .using() —
+# иначе решение принимает следующий роутер (ReplicaRouter, т.е. default)
+class ShardRouter:
+    def _route(self, model, hints) -> str | None:
+        instance = hints.get('instance')
+        if model._meta.label_lower not in SHARDED_MODELS or not isinstance(instance, (Question, Answer)):
+            return None
+        return _instance_shard(instance)
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if isinstance(instance, (Question, Answer)) and instance._state.db:
+            return instance._state.db
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if isinstance(obj1, (Question, Answer)) and isinstance(obj2, (Question, Answer)):
+            if obj1._state.db and obj2._state.db:
+                return primary_alias(obj1._state.db) == primary_alias(obj2._state.db)
+        return None
+
+    # В дополнительных шардах — только таблицы вопросов и ответов
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shard_aliases():
+            return None
+        if app_label != 'qa_api':
+            return False
+        return model_name is None or f'qa_api.{model_name}' in SHARDED_MODELS
@@ -0,0 +1,30 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Answer, Question, adjust_answers_count
+
+
+@receiver(post_save, sender=Answer)
+def answer_created(sender, instance: Answer, created: bool, using: str, **kwargs):
+    if created:
+        adjust_answers_count({instance.question_id: 1}, using=using)
+    cache.invalidate_questions([instance.question_id], using=using)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance: Answer, using: str, origin=None, **kwargs):
+    # При каскадном удалении вопроса счетчик и кэш обновит удаление самого вопроса,
+    # а помеченный удаленным ответ уже вычтен из счетчика при пометке
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is Question or instance.is_deleted:
+        return
+    adjust_answers_count({instance.question_id: -1}, using=using)
+    cache.invalidate_questions([instance.question_id], using=using)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance: Question, using: str, **kwargs):
+    cache.invalidate_questions([instance.pk], using=using)
@@ -0,0 +1,72 @@
+import zlib
+from typing import Any, AsyncIterator, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+# Сколько строк склеивать в один чанк ответа
+LINES_PER_CHUNK = 500
+
+
+def ndjson_chunks(rows: Iterable[dict[str, Any]], lines_per_chunk: int = LINES_PER_CHUNK) -> Iterator[bytes]:
+    # Тот же энкодер, что и у JSONRenderer: UUID -> str, datetime -> ISO 8601 с 'Z'
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(row))
+        if len(lines) >= lines_per_chunk:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def ndjson_response(rows: Iterable[dict[str, Any]], filename: str | None = None,
+                    compress: bool = False, asynchronous: bool = False) -> StreamingHttpResponse:
+    chunks = ndjson_chunks(rows)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    if asynchronous:
+        # Под ASGI Django целиком вычитывает синхронный итератор в память до отправки
+        chunks = async_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=NDJSON_CONTENT_TYPE)
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def is_asgi(request) -> bool:
+    # DRF Request оборачивает HttpRequest
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def async_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    # Каждый чанк генерируется в общем синхронном потоке (thread_sensitive): там же
+    # соединение с БД и открытый курсор ORM, а цикл событий не блокируется
+    next_chunk = sync_to_async(next)
+    done = object()
+    try:
+        while (chunk := await next_chunk(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # Клиент отключился — закрываем генератор и курсор в том же потоке
+        await sync_to_async(chunks.close)()
+
+
+def is_truthy(value: str | None) -> bool:
+    return (value or '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    # wbits=31 — формат gzip; сжимаем по мере генерации, не накапливая весь ответ
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,13 +1,68 @@
+import gzip
+import io
+import json
+import logging
+import os
+import time
 import uuid
+from datetime import timedelta
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings as django_settings
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import OperationalError, connections
+from django.db.models import F
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
+from . import cache as qa_cache
+from .archive import find_archived
+from .bench import BENCH_CASES, over_budget, run_case, seed_bench_data
+from . import ids as qa_ids
+from .ids import VIRTUAL_SHARDS, new_id, virtual_shard
+from . import admission, metrics, writebehind
+from .logqueue import DROP_OLDEST, NonBlockingQueueHandler, log_event
+from .models import Answer, ArchiveSegment, Question, new_answer_id
+from .readers import ANSWER_VALUES, QUESTION_VALUES, answer_dicts, question_detail_dict, question_dicts
+from .renderers import FastJSONRenderer
+from .routers import ReplicaRouter, use_primary
+from .search import search
+from .serializers import AnswerSerializer, QuestionDetailSerializer, QuestionSerializer
+from .shards import shard_for_id, shard_map
+
 @pytest.fixture
 def api_client():
     return APIClient()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    qa_cache.get_cache().clear()
+    qa_cache.stats.reset()
+
+
+# Тесты работают с одной БД, даже если настроены шарды (DB_SHARDS), — кроме
+# запросивших фикстуру sharded
+@pytest.fixture(autouse=True)
+def single_shard(request, settings):
+    if "sharded" not in request.fixturenames:
+        settings.QA_SHARDS = ["default"]
+
+
+@pytest.fixture
+def sharded():
+    if len(django_settings.QA_SHARDS) < 2:
+        pytest.skip("шарды не настроены (DB_SHARDS)")
+    return django_settings.QA_SHARDS
+
+
 @pytest.mark.django_db
 def test_create_question(api_client):
     data = {"text": "Какой ваш любимый язык программирования?"}
@@ -131,3 +186,1081 @@ def test_delete_answer(api_client):
 
     get_resp = api_client.get(url)
     assert get_resp.status_code == 404
+
+
+@pytest.mark.django_db
+def test_question_list_cursor_pagination(api_client):
+    url = reverse("qa_api:question-list-create")
+    for i in range(5):
+        api_client.post(url, {"text": f"Вопрос номер {i}"}, format="json")
+
+    first = api_client.get(url, {"page_size": 2, "count": "exact"})
+    assert first.status_code == 200
+    page = first.data["data"]
+    assert [q["text"] for q in page["results"]] == ["Вопрос номер 4", "Вопрос номер 3"]
+    assert page["count"] == 5
+    assert page["previous"] is None
+
+    second = api_client.get(page["next"]).data["data"]
+    assert [q["text"] for q in second["results"]] == ["Вопрос номер 2", "Вопрос номер 1"]
+
+    last = api_client.get(second["next"]).data["data"]
+    assert [q["text"] for q in last["results"]] == ["Вопрос номер 0"]
+    assert last["next"] is None
+
+    back = api_client.get(second["previous"]).data["data"]
+    assert [q["text"] for q in back["results"]] == ["Вопрос номер 4", "Вопрос номер 3"]
+    assert back["previous"] is None
+
+
+@pytest.mark.django_db
+def test_question_list_invalid_cursor(api_client):
+    response = api_client.get(reverse("qa_api:question-list-create"), {"cursor": "garbage"})
+    assert response.status_code == 400
+    assert response.data["success"] is False
+
+
+@pytest.mark.django_db
+def test_answers_count_is_maintained(api_client):
+    question = Question.objects.create(text="Вопрос со счетчиком")
+    answers = [
+        Answer.objects.create(question=question, user_id=uuid.uuid4(), text=f"Ответ {i}")
+        for i in range(3)
+    ]
+    question.refresh_from_db()
+    assert question.answers_count == 3
+
+    answers[0].delete()
+    question.refresh_from_db()
+    assert question.answers_count == 2
+
+    Answer.objects.filter(pk=answers[1].pk).delete()
+    question.refresh_from_db()
+    assert question.answers_count == 1
+
+    response = api_client.get(reverse("qa_api:question-list-create"))
+    assert response.data["data"]["results"][0]["answers_count"] == 1
+
+
+@pytest.mark.django_db
+def test_rebuild_answers_count_command():
+    question = Question.objects.create(text="Вопрос со сбитым счетчиком")
+    Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Ответ")
+    Question.objects.filter(pk=question.pk).update(answers_count=42)
+
+    with pytest.raises(CommandError):
+        call_command("rebuild_answers_count", "--check", stdout=io.StringIO())
+
+    call_command("rebuild_answers_count", stdout=io.StringIO())
+    question.refresh_from_db()
+    assert question.answers_count == 1
+    call_command("rebuild_answers_count", "--check", stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_question_detail_embeds_first_answers_page(api_client):
+    question = Question.objects.create(text="Популярный вопрос")
+    for i in range(25):
+        Answer.objects.create(question=question, user_id=uuid.uuid4(), text=f"Ответ {i}")
+
+    data = api_client.get(reverse("qa_api:question-detail", args=[question.id])).data["data"]
+    assert data["answers_count"] == 25
+    assert len(data["answers"]) == 20
+    assert data["answers"][0]["text"] == "Ответ 0"
+
+    rest = api_client.get(data["answers_next"]).data["data"]
+    assert [a["text"] for a in rest["results"]] == [f"Ответ {i}" for i in range(20, 25)]
+    assert rest["next"] is None
+
+
+@pytest.mark.django_db
+def test_answer_list_stream(api_client):
+    question = Question.objects.create(text="Вопрос для выгрузки")
+    user_id = uuid.uuid4()
+    for i in range(3):
+        Answer.objects.create(question=question, user_id=user_id, text=f"Ответ {i}")
+
+    url = reverse("qa_api:answer-create", args=[question.id])
+    response = api_client.get(url, {"stream": "true"})
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [row["text"] for row in rows] == ["Ответ 0", "Ответ 1", "Ответ 2"]
+    assert rows[0]["user_id"] == str(user_id)
+    assert rows[0]["question"] == question.id
+
+    assert api_client.get(reverse("qa_api:answer-create", args=[question.id + 1])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_streams_ndjson(api_client):
+    old = Question.objects.create(text="Старый вопрос", created_at=timezone.now() - timedelta(days=10))
+    new = Question.objects.create(text="Новый вопрос")
+    Answer.objects.create(question=new, user_id=uuid.uuid4(), text="Свежий ответ")
+
+    since = (timezone.now() - timedelta(days=1)).isoformat()
+    response = api_client.get(reverse("qa_api:export"), {"since": since, "gzip": "true"})
+    assert response.status_code == 200
+    assert response["Content-Encoding"] == "gzip"
+    body = gzip.decompress(b"".join(response.streaming_content)).decode()
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [(row["type"], row["text"]) for row in rows] == [
+        ("question", "Новый вопрос"),
+        ("answer", "Свежий ответ"),
+    ]
+    assert old.id not in [row["id"] for row in rows if row["type"] == "question"]
+
+    assert api_client.get(reverse("qa_api:export"), {"until": "вчера"}).status_code == 400
+
+    # Под ASGI тело отдается асинхронным итератором, а не вычитывается целиком
+    @async_to_sync
+    async def asgi_export():
+        response = await AsyncClient().get(reverse("qa_api:export"), {"since": since})
+        return response.is_async, b"".join([chunk async for chunk in response.streaming_content])
+
+    is_async, body = asgi_export()
+    assert is_async
+    assert [json.loads(line)["text"] for line in body.decode().splitlines()] == ["Новый вопрос", "Свежий ответ"]
+
+
+@pytest.mark.django_db
+def test_export_command(tmp_path):
+    question = Question.objects.create(text="Вопрос для выгрузки")
+    Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Ответ")
+
+    output = tmp_path / "export.ndjson"
+    call_command("export_qa", "--type", "answers", "-o", str(output), stderr=io.StringIO())
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [row["type"] for row in rows] == ["answer"]
+    assert rows[0]["question"] == question.id
+
+
+@pytest.mark.django_db
+def test_bulk_create_answers(api_client):
+    first = Question.objects.create(text="Первый вопрос")
+    second = Question.objects.create(text="Второй вопрос")
+    items = [
+        {"question": first.id, "user_id": str(uuid.uuid4()), "text": "Ответ на первый"},
+        {"question": second.id, "user_id": str(uuid.uuid4()), "text": "Ответ на второй"},
+        {"question": second.id, "user_id": str(uuid.uuid4()), "text": "Еще ответ на второй"},
+    ]
+    url = reverse("qa_api:answer-bulk-create")
+    response = api_client.post(url, items, format="json")
+    assert response.status_code == 201
+    assert response.data["data"]["created"] == 3
+    assert len(response.data["data"]["ids"]) == 3
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.answers_count, second.answers_count) == (1, 2)
+
+
+@pytest.mark.django_db
+def test_bulk_create_answers_reports_item_errors(api_client):
+    question = Question.objects.create(text="Вопрос для пачки")
+    items = [
+        {"question": question.id, "user_id": str(uuid.uuid4()), "text": "Корректный ответ"},
+        {"question": question.id + 100, "user_id": str(uuid.uuid4()), "text": "Нет вопроса"},
+        {"question": question.id, "user_id": "not-a-uuid", "text": "ok"},
+    ]
+    url = reverse("qa_api:answer-bulk-create")
+
+    response = api_client.post(url, items, format="json")
+    assert response.status_code == 400
+    assert [error["index"] for error in response.data["error"]["items"]] == [1, 2]
+    assert Answer.objects.count() == 0
+
+    response = api_client.post(url + "?partial=true", {"answers": items}, format="json")
+    assert response.status_code == 201
+    assert response.data["data"]["created"] == 1
+    assert len(response.data["data"]["errors"]) == 2
+    question.refresh_from_db()
+    assert question.answers_count == 1
+
+
+@pytest.mark.django_db
+def test_bulk_create_questions(api_client):
+    url = reverse("qa_api:question-bulk-create")
+    response = api_client.post(url, [{"text": "Первый вопрос"}, {"text": "   "}], format="json")
+    assert response.status_code == 400
+    assert response.data["error"]["items"][0]["index"] == 1
+    assert Question.objects.count() == 0
+
+    response = api_client.post(url, {"questions": [{"text": "  Первый вопрос  "}, {"text": "Второй вопрос"}]},
+                               format="json")
+    assert response.status_code == 201
+    assert response.data["data"]["created"] == 2
+    assert sorted(Question.objects.values_list("text", flat=True)) == ["Второй вопрос", "Первый вопрос"]
+
+
+@pytest.mark.django_db
+def test_bulk_delete_questions(api_client):
+    old = Question.objects.create(text="Старый вопрос", created_at=timezone.now() - timedelta(days=30))
+    recent = Question.objects.create(text="Свежий вопрос")
+    kept = Question.objects.create(text="Оставшийся вопрос")
+    for question in (old, old, recent):
+        Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Ответ")
+
+    url = reverse("qa_api:question-bulk-delete")
+    assert api_client.post(url, {}, format="json").status_code == 400
+
+    until = (timezone.now() - timedelta(days=1)).isoformat()
+    response = api_client.post(url, {"until": until}, format="json")
+    assert response.status_code == 200
+    assert response.data["data"] == {"deleted_questions": 1, "deleted_answers": 2}
+
+    response = api_client.post(url, {"ids": [recent.id]}, format="json")
+    assert response.data["data"] == {"deleted_questions": 1, "deleted_answers": 1}
+    assert list(Question.objects.values_list("id", flat=True)) == [kept.id]
+    assert Answer.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_question_detail_is_cached_and_invalidated(api_client):
+    question = Question.objects.create(text="Горячий вопрос")
+    url = reverse("qa_api:question-detail", args=[question.id])
+
+    api_client.get(url)
+    assert api_client.get(url).data["data"]["answers_count"] == 0
+    assert qa_cache.stats.snapshot()["hits"] == 1
+
+    api_client.post(reverse("qa_api:answer-create", args=[question.id]),
+                    {"text": "Новый ответ", "user_id": str(uuid.uuid4())}, format="json")
+    data = api_client.get(url).data["data"]
+    assert data["answers_count"] == 1
+    assert [a["text"] for a in data["answers"]] == ["Новый ответ"]
+
+    list_url = reverse("qa_api:question-list-create")
+    api_client.get(list_url)
+    api_client.post(reverse("qa_api:question-bulk-delete"), {"ids": [question.id]}, format="json")
+    assert api_client.get(url).status_code == 404
+    assert api_client.get(list_url).data["data"]["results"] == []
+
+    stats = api_client.get(reverse("qa_api:stats")).data["data"]["cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] >= 4
+
+
+@pytest.mark.django_db
+def test_question_detail_conditional_get(api_client, django_assert_num_queries):
+    question = Question.objects.create(text="Вопрос для опроса")
+    url = reverse("qa_api:question-detail", args=[question.id])
+
+    first = api_client.get(url)
+    etag = first["ETag"]
+    assert first["Last-Modified"]
+
+    with django_assert_num_queries(1):
+        cached = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert cached.status_code == 304
+
+    Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Новый ответ")
+    fresh = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert fresh.status_code == 200
+    assert fresh["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_question_list_conditional_get(api_client):
+    question = Question.objects.create(text="Вопрос в списке")
+    url = reverse("qa_api:question-list-create")
+
+    etag = api_client.get(url)["ETag"]
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Ответ")
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_async_read_views_match_sync(api_client):
+    question = Question.objects.create(text="Вопрос для async")
+    answer = Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Ответ для async")
+
+    pairs = [
+        (reverse("qa_api:question-list-create"), reverse("qa_api:async-question-list")),
+        (reverse("qa_api:question-detail", args=[question.id]),
+         reverse("qa_api:async-question-detail", args=[question.id])),
+        (reverse("qa_api:answer-detail", args=[answer.id]),
+         reverse("qa_api:async-answer-detail", args=[answer.id])),
+    ]
+    for sync_url, async_url in pairs:
+        qa_cache.get_cache().clear()
+        expected = api_client.get(sync_url).json()
+        qa_cache.get_cache().clear()
+        actual = api_client.get(async_url).json()
+        assert actual == expected
+
+    missing = api_client.get(reverse("qa_api:async-question-detail", args=[question.id + 1]))
+    assert missing.status_code == 404
+
+
+@pytest.mark.django_db
+def test_lean_readers_match_serializers_byte_for_byte():
+    question = Question.objects.create(text="Вопрос с \u2028разделителем и \"кавычками\"")
+    for i in range(3):
+        Answer.objects.create(question=question, user_id=uuid.uuid4(), text=f"Ответ {i} — ünïcødé")
+    question.refresh_from_db()
+    answers = list(Answer.objects.filter(question=question).order_by("created_at", "id"))
+
+    reference = JSONRenderer()
+    fast = FastJSONRenderer()
+
+    expected = reference.render(QuestionSerializer([question], many=True).data)
+    rows = list(Question.objects.filter(pk=question.pk).values(*QUESTION_VALUES))
+    assert fast.render(question_dicts(rows)) == expected
+
+    expected = reference.render(AnswerSerializer(answers, many=True).data)
+    rows = list(Answer.objects.filter(question=question).order_by("created_at", "id").values(*ANSWER_VALUES))
+    assert fast.render(answer_dicts(rows)) == expected
+
+    question.answers_page = answers
+    question.answers_next = None
+    expected = reference.render(QuestionDetailSerializer(question).data)
+    row = Question.objects.filter(pk=question.pk).values(*QUESTION_VALUES).first()
+    assert fast.render(question_detail_dict(row, rows, None)) == expected
+
+
+def make_queue_handler(stream, **kwargs):
+    target = logging.StreamHandler(stream)
+    target.set_name(f"test-target-{uuid.uuid4()}")
+    target.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    return NonBlockingQueueHandler([target.name], **kwargs), target
+
+
+def test_log_queue_writes_structured_events_in_background():
+    stream = io.StringIO()
+    handler, _target = make_queue_handler(stream, flush_interval=0.05)
+    logger = logging.getLogger(f"qa_api.test.{uuid.uuid4()}")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        log_event(logger, "answer_created", "Создан ответ", answer_id=7, question_id=3)
+        logger.warning("Второе %s", "сообщение")
+    finally:
+        handler.close()
+        logger.removeHandler(handler)
+
+    assert stream.getvalue().splitlines() == [
+        "INFO Создан ответ event=answer_created answer_id=7 question_id=3",
+        "WARNING Второе сообщение",
+    ]
+
+
+def test_log_queue_drop_policy():
+    stream = io.StringIO()
+    handler, _target = make_queue_handler(stream, maxsize=2, drop_policy=DROP_OLDEST)
+    # Фоновый поток не запускается, чтобы очередь гарантированно переполнилась
+    for index in range(5):
+        handler.enqueue(logging.makeLogRecord({"msg": f"запись {index}"}))
+
+    assert handler.dropped == 3
+    assert [handler.queue.get_nowait().msg for _ in range(2)] == ["запись 3", "запись 4"]
+
+
+@pytest.mark.django_db
+def test_stats_reports_log_queue(api_client):
+    response = api_client.get(reverse("qa_api:stats"))
+    assert set(response.data["data"]["logging"]) == {"queued", "dropped"}
+
+
+def test_serve_builds_gunicorn_command():
+    out = io.StringIO()
+    call_command("serve", "--print", "--workers", "3", "--threads", "4", stdout=out)
+    argv = out.getvalue().split()
+    assert argv[1:3] == ["-m", "gunicorn"]
+    assert argv[argv.index("--workers") + 1] == "3"
+    assert "--preload" in argv and argv[-1] == "qa_project.wsgi:application"
+
+    out = io.StringIO()
+    call_command("serve", "--print", "--asgi", "--no-preload", stdout=out)
+    argv = out.getvalue().split()
+    assert argv[-2:] == ["uvicorn_worker.UvicornWorker", "qa_project.asgi:application"]
+    assert "--preload" not in argv and int(argv[argv.index("--workers") + 1]) >= 1
+
+    with pytest.raises(CommandError):
+        call_command("serve", "--print", "--asgi", "--threads", "2")
+
+
+def test_log_queue_restarts_after_fork():
+    handler = NonBlockingQueueHandler(targets=[], maxsize=10)
+    handler.emit(logging.LogRecord("qa_api", logging.INFO, __file__, 1, "до fork", None, None))
+    handler._after_fork()
+    assert handler._thread is None and handler.queue.empty() and handler.queue.maxsize == 10
+    handler.stop()
+
+
+
+class _StubPool:
+    def get_stats(self):
+        return {"pool_min": 2, "pool_max": 10, "pool_size": 4, "pool_available": 1,
+                "requests_num": 8, "requests_queued": 2, "requests_wait_ms": 30, "connections_num": 4}
+
+
+@pytest.mark.django_db
+def test_stats_reports_connection_pools(api_client, monkeypatch):
+    assert api_client.get(reverse("qa_api:stats")).data["data"]["database"] == {}
+
+    wrapper = type(connections["default"])
+    monkeypatch.setattr(wrapper, "_connection_pools", {"default": _StubPool()}, raising=False)
+    pools = api_client.get(reverse("qa_api:stats")).data["data"]["database"]
+    assert pools["default"]["size"] == 4
+    assert pools["default"]["queued"] == 2
+    assert pools["default"]["wait_ms_avg"] == 3.75
+
+
+@pytest.mark.django_db
+def test_user_answer_history(api_client, django_assert_num_queries):
+    user_id, other_user = uuid.uuid4(), uuid.uuid4()
+    first = Question.objects.create(text="Первый вопрос")
+    second = Question.objects.create(text="Второй вопрос")
+    for i, question in enumerate([first, second, first]):
+        Answer.objects.create(question=question, user_id=user_id, text=f"Ответ {i}")
+    Answer.objects.create(question=first, user_id=other_user, text="Чужой ответ")
+
+    url = reverse("qa_api:user-answers", args=[user_id])
+    page = api_client.get(url, {"page_size": 2, "count": "exact"}).data["data"]
+    assert [a["text"] for a in page["results"]] == ["Ответ 0", "Ответ 1"]
+    assert page["count"] == 3
+    assert "question_text" not in page["results"][0]
+
+    rest = api_client.get(page["next"] + "&include_question=true").data["data"]
+    assert rest["next"] is None
+    assert [(a["text"], a["question"]) for a in rest["results"]] == [("Ответ 2", first.id)]
+
+    # Текст вопроса приходит тем же запросом, без отдельного запроса на каждый ответ
+    with django_assert_num_queries(1):
+        response = api_client.get(url, {"include_question": "true"})
+    assert [a["question_text"] for a in response.data["data"]["results"]] == [
+        "Первый вопрос", "Второй вопрос", "Первый вопрос"
+    ]
+
+    empty = api_client.get(reverse("qa_api:user-answers", args=[uuid.uuid4()]))
+    assert empty.status_code == 200
+    assert empty.data["data"]["results"] == []
+
+
+@pytest.mark.django_db
+def test_search_ranks_and_paginates(api_client):
+    python = Question.objects.create(text="Как выучить Python быстро?")
+    Question.objects.create(text="Какой редактор выбрать?")
+    answer = Answer.objects.create(question=python, user_id=uuid.uuid4(), text="Python учите по документации Python")
+    # bulk_create обходит save() — индекс все равно обновляется
+    [bulk] = Answer.objects.bulk_create([Answer(question=python, user_id=uuid.uuid4(), text="Начните с python.org")])
+    url = reverse("qa_api:search")
+
+    page = api_client.get(url, {"q": "python", "page_size": 2}).data["data"]
+    assert (page["results"][0]["type"], page["results"][0]["id"]) == ("answer", answer.id)
+    assert page["results"][0]["question"] == python.id
+    assert page["results"][0]["rank"] >= page["results"][1]["rank"]
+    rest = api_client.get(page["next"]).data["data"]
+    assert rest["next"] is None
+    found = {(r["type"], r["id"]) for r in page["results"] + rest["results"]}
+    assert found == {("question", python.id), ("answer", bulk.id), ("answer", answer.id)}
+
+    questions = api_client.get(url, {"q": "редактор", "type": "questions"}).data["data"]["results"]
+    assert [r["text"] for r in questions] == ["Какой редактор выбрать?"]
+
+    Answer.objects.filter(pk=bulk.pk)._raw_delete("default")
+    python.delete()
+    assert api_client.get(url, {"q": "python"}).data["data"]["results"] == []
+
+
+@pytest.mark.django_db
+def test_search_validates_params(api_client):
+    url = reverse("qa_api:search")
+    assert api_client.get(url).status_code == 400
+    assert api_client.get(url, {"q": "python", "type": "users"}).status_code == 400
+    assert api_client.get(url, {"q": "python", "cursor": "garbage"}).status_code == 400
+    # Операторы FTS5 в запросе не интерпретируются
+    response = api_client.get(url, {"q": 'NEAR("a" "b") OR *'})
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_search_falls_back_to_scan_without_fts(monkeypatch):
+    python = Question.objects.create(text="Как выучить Python быстро?")
+    answer = Answer.objects.create(question=python, user_id=uuid.uuid4(), text="Лучше учите python по документации")
+    Answer.objects.create(question=python, user_id=uuid.uuid4(), text="Python, но не про учебу")
+    Question.objects.create(text="Удаленный вопрос про python", is_deleted=True)
+
+    # БД без FTS: вместо ошибки — просмотр по icontains всех слов запроса, новые выше
+    monkeypatch.setattr(connections["default"], "vendor", "mysql")
+    results = search("учите PYTHON", using="default")
+    assert [(r["type"], r["id"], r["rank"]) for r in results] == [("answer", answer.id, 0.0)]
+    assert results[0]["question"] == python.id
+    found = search("python", using="default", limit=2, offset=1)
+    assert [(r["type"], r["id"]) for r in found] == [("answer", answer.id), ("question", python.id)]
+
+
+@pytest.mark.django_db
+def test_soft_delete_hides_rows_from_reads(api_client, django_assert_max_num_queries):
+    question = Question.objects.create(text="Вопрос с длинной веткой")
+    other = Question.objects.create(text="Соседний вопрос")
+    answers_url = reverse("qa_api:answer-create", args=[question.id])
+    for i in range(3):
+        api_client.post(answers_url, {"user_id": str(uuid.uuid4()), "text": f"Ответ {i}"}, format="json")
+    kept = Answer.objects.create(question=other, user_id=uuid.uuid4(), text="Остается")
+    dropped = Answer.objects.create(question=other, user_id=uuid.uuid4(), text="Удаляется")
+
+    # Удаление вопроса — пометка одним UPDATE, независимо от числа ответов
+    url = reverse("qa_api:question-detail", args=[question.id])
+    with django_assert_max_num_queries(4):
+        response = api_client.delete(url)
+    assert response.status_code == 204
+    assert response.data["data"] == {"id": question.id, "deleted_answers": 3}
+    assert Answer.all_objects.filter(question=question).count() == 3
+
+    assert api_client.delete(reverse("qa_api:answer-detail", args=[dropped.id])).status_code == 204
+    other.refresh_from_db()
+    assert other.answers_count == 1
+
+    assert api_client.get(url).status_code == 404
+    assert api_client.delete(url).status_code == 404
+    assert api_client.get(answers_url).status_code == 404
+    listed = api_client.get(reverse("qa_api:question-list-create")).data["data"]["results"]
+    assert [q["id"] for q in listed] == [other.id]
+    hidden = Answer.all_objects.filter(question=question).first()
+    assert api_client.get(reverse("qa_api:answer-detail", args=[hidden.id])).status_code == 404
+    assert api_client.get(reverse("qa_api:answer-detail", args=[dropped.id])).status_code == 404
+    assert list(other.answers.values_list("id", flat=True)) == [kept.id]
+    with CaptureQueriesContext(connections["default"]) as queries:
+        assert list(Answer.objects.of_live_question(other.id).values_list("id", flat=True)) == [kept.id]
+    assert "JOIN" not in queries.captured_queries[0]["sql"]
+    results = api_client.get(reverse("qa_api:search"), {"q": "Ответ"}).data["data"]["results"]
+    assert results == []
+
+
+@pytest.mark.django_db
+def test_purge_deleted_command():
+    question = Question.objects.create(text="Удаляемый вопрос")
+    other = Question.objects.create(text="Живой вопрос")
+    Answer.objects.bulk_create(
+        [Answer(question=question, user_id=uuid.uuid4(), text=f"Ответ {i}") for i in range(5)]
+        + [Answer(question=other, user_id=uuid.uuid4(), text="Живой ответ"),
+           Answer(question=other, user_id=uuid.uuid4(), text="Удаленный ответ", is_deleted=True,
+                  deleted_at=timezone.now())]
+    )
+    Question.objects.filter(pk=question.pk).update(is_deleted=True, deleted_at=timezone.now())
+
+    call_command("purge_deleted", "--grace", "3600", stdout=io.StringIO())
+    assert Answer.all_objects.count() == 7
+
+    out = io.StringIO()
+    with CaptureQueriesContext(connections["default"]) as queries:
+        call_command("purge_deleted", "--batch-size", "2", "--sleep", "0", stdout=out)
+    assert "Удалено ответов: 6, вопросов: 1" in out.getvalue()
+    # Ответы выбираются по своим индексам, без OR с JOIN на вопрос
+    assert not [query["sql"] for query in queries.captured_queries
+                if 'FROM "qa_api_answer" INNER JOIN' in query["sql"]]
+    assert list(Question.all_objects.values_list("id", flat=True)) == [other.id]
+    assert list(Answer.all_objects.values_list("text", flat=True)) == ["Живой ответ"]
+
+
+@pytest.mark.django_db
+def test_purge_deleted_keeps_question_answered_after_selection():
+    question = Question.objects.create(text="Удаленный вопрос без ответов")
+    Question.objects.filter(pk=question.pk).update(is_deleted=True, deleted_at=timezone.now())
+    inserted = []
+
+    # Ответ вставляется сразу после выборки id вопросов и до их удаления
+    def insert_after_select(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if not inserted and sql.startswith('SELECT "qa_api_question"."id"') and "NOT EXISTS" in sql:
+            inserted.append(True)
+            Answer.all_objects.bulk_create([Answer(question=question, user_id=uuid.uuid4(), text="Поздний ответ")])
+        return result
+
+    out = io.StringIO()
+    with connections["default"].execute_wrapper(insert_after_select):
+        call_command("purge_deleted", "--sleep", "0", stdout=out)
+    assert inserted
+    assert "Удалено ответов: 0, вопросов: 0" in out.getvalue()
+    assert Question.all_objects.filter(pk=question.pk).exists()
+    assert Answer.all_objects.filter(question=question).count() == 1
+
+
+@pytest.mark.django_db
+def test_archive_cold_moves_old_rows_to_segments(api_client, settings, tmp_path):
+    settings.QA_ARCHIVE_DIR = tmp_path
+    long_ago = timezone.now() - timedelta(days=400)
+    cold = Question.objects.create(text="Старый вопрос", created_at=long_ago)
+    warm = Question.objects.create(text="Старый, но активный", created_at=long_ago)
+    old_answers = [
+        Answer.objects.create(question=question, user_id=uuid.uuid4(), text=f"Старый ответ {i}",
+                              created_at=long_ago + timedelta(minutes=i))
+        for i, question in enumerate([cold, cold, warm])
+    ]
+    fresh = Answer.objects.create(question=warm, user_id=uuid.uuid4(), text="Свежий ответ")
+    unanswered = Question.objects.create(text="Старый вопрос без ответов", created_at=long_ago)
+    Question.objects.filter(pk__in=[cold.pk, unanswered.pk]).update(last_activity_at=long_ago)
+    expected_question = api_client.get(reverse("qa_api:question-detail", args=[unanswered.id])).data["data"]
+    expected = api_client.get(reverse("qa_api:answer-detail", args=[old_answers[0].id])).data["data"]
+
+    out = io.StringIO()
+    call_command("archive_cold", "--older-than-days", "365", "--segment-size", "2", stdout=out)
+    assert "Перенесено ответов: 3, вопросов: 1" in out.getvalue()
+
+    assert list(Answer.all_objects.values_list("id", flat=True)) == [fresh.id]
+    # Вопрос с архивными ответами остается в горячей таблице, его счетчик не меняется
+    assert sorted(Question.all_objects.values_list("id", flat=True)) == sorted([cold.id, warm.id])
+    assert [(q.answers_count, q.archived_answers_count) for q in Question.objects.order_by("pk")] == [
+        (2, 2), (2, 1)]
+    # Сколько из answers_count только в архиве (читаются по id, но не в списках), видно в API
+    detail = api_client.get(reverse("qa_api:question-detail", args=[cold.id])).data["data"]
+    assert (detail["answers_count"], detail["archived_answers_count"], detail["answers"]) == (2, 2, [])
+    call_command("rebuild_answers_count", "--check", stdout=io.StringIO())
+    segments = ArchiveSegment.objects.filter(kind="answers")
+    ids = sorted(answer.id for answer in old_answers)
+    assert [(s.first_id, s.last_id, s.rows) for s in segments] == [(ids[0], ids[1], 2), (ids[2], ids[2], 1)]
+    assert all((tmp_path / s.filename).exists() for s in ArchiveSegment.objects.all())
+    assert find_archived("questions", unanswered.id)["text"] == "Старый вопрос без ответов"
+    # Архивный вопрос по-прежнему читается по id
+    for name in ("qa_api:question-detail", "qa_api:async-question-detail"):
+        response = api_client.get(reverse(name, args=[unanswered.id]))
+        assert response.status_code == 200
+        assert json.loads(response.content)["data"] == json.loads(FastJSONRenderer().render(expected_question))
+    answers = api_client.get(reverse("qa_api:answer-create", args=[unanswered.id]))
+    assert answers.status_code == 200 and answers.data["data"]["results"] == []
+
+    # Ответ из архива отдается тем же эндпоинтом и в том же виде
+    for name in ("qa_api:answer-detail", "qa_api:async-answer-detail"):
+        response = api_client.get(reverse(name, args=[old_answers[0].id]))
+        assert response.status_code == 200
+        assert json.loads(response.content)["data"] == json.loads(
+            FastJSONRenderer().render(expected)
+        )
+    assert api_client.get(reverse("qa_api:answer-detail", args=[10 ** 9])).status_code == 404
+
+    # Удаление вопроса скрывает и его архивные ответы — до и после purge_deleted
+    assert api_client.delete(reverse("qa_api:question-detail", args=[cold.id])).status_code == 204
+    for purge in (False, True):
+        if purge:
+            call_command("purge_deleted", "--sleep", "0", stdout=io.StringIO())
+            assert not Question.all_objects.filter(pk=cold.id).exists()
+        for name in ("qa_api:answer-detail", "qa_api:async-answer-detail"):
+            assert api_client.get(reverse(name, args=[old_answers[0].id])).status_code == 404
+
+
+def test_replica_router(settings):
+    settings.QA_DATABASE_REPLICAS = ["replica1", "replica2"]
+    router = ReplicaRouter()
+    assert router.db_for_read(Question) in ("replica1", "replica2")
+    assert router.db_for_write(Question) == "default"
+    with use_primary():
+        assert router.db_for_read(Question) == "default"
+    assert router.allow_migrate("replica1", "qa_api") is False
+    assert router.allow_migrate("default", "qa_api") is None
+
+
+@pytest.mark.skipif(not django_settings.QA_DATABASE_REPLICAS, reason="реплики не настроены (DB_REPLICAS)")
+@pytest.mark.django_db(transaction=True, databases="__all__")
+def test_reads_stick_to_primary_after_write():
+    [replica] = django_settings.QA_DATABASE_REPLICAS[:1]
+    writer, reader = APIClient(), APIClient()
+    url = reverse("qa_api:question-list-create")
+
+    response = writer.post(url, {"text": "Вопрос для реплики"}, format="json")
+    assert response.status_code == 201
+    assert "qa_primary" in response.cookies
+
+    with CaptureQueriesContext(connections[replica]) as replica_queries:
+        assert writer.get(url).status_code == 200
+    assert len(replica_queries) == 0
+
+    # Другой клиент (другая страница, чтобы не попасть в кэш) читает с реплики;
+    # сразу после записи прочитанное с реплики не кэшируется
+    with CaptureQueriesContext(connections[replica]) as replica_queries:
+        assert reader.get(url, {"page_size": 5}).status_code == 200
+    assert len(replica_queries) > 0
+    with CaptureQueriesContext(connections[replica]) as replica_queries:
+        assert reader.get(url, {"page_size": 5}).status_code == 200
+    assert len(replica_queries) > 0
+
+
+@pytest.mark.django_db
+def test_global_ids_carry_virtual_shard(settings, tmp_path):
+    ids = [new_id(7) for _ in range(5000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert {virtual_shard(pk) for pk in ids} == {7}
+    # Точно представимы в JavaScript
+    assert max(ids) <= qa_ids.MAX_SAFE_ID < 2 ** 53
+
+    # Процесс после fork берет новый блок номеров, а не продолжает блок родителя
+    parent_end = qa_ids._end
+    qa_ids._after_fork()
+    assert new_id(7) >> qa_ids.VSHARD_BITS >= parent_end
+    # Блоки из файла-счетчика SQLite не пересекаются
+    counter = str(tmp_path / "db.sqlite3.ids")
+    blocks = [qa_ids._allocate_from_file(counter, qa_ids.ID_BLOCK_SIZE) for _ in range(3)]
+    assert [block - blocks[0] for block in blocks] == [0, qa_ids.ID_BLOCK_SIZE, 2 * qa_ids.ID_BLOCK_SIZE]
+
+    settings.QA_SHARDS = ["default", "shard1"]
+    settings.QA_SHARD_MAP = ""
+    assert shard_for_id(new_id(0)) == "default"
+    assert shard_for_id(new_id(VIRTUAL_SHARDS - 1)) == "shard1"
+    settings.QA_SHARD_MAP = "0-99:shard1,100-1023:default"
+    assert shard_for_id(new_id(50)) == "shard1"
+    assert shard_for_id(new_id(100)) == "default"
+    settings.QA_SHARD_MAP = "0-99:shard1"
+    with pytest.raises(ImproperlyConfigured):
+        shard_map()
+
+
+@pytest.mark.django_db(databases=django_settings.QA_SHARDS)
+def test_sharded_routing_and_rebalance(api_client, settings, sharded):
+    settings.QA_SHARD_MAP = ""
+    list_url = reverse("qa_api:question-list-create")
+    ids = [api_client.post(list_url, {"text": f"Вопрос номер {i}"}, format="json").data["data"]["id"]
+           for i in range(6)]
+    # По вопросу на крайние виртуальные шарды — гарантированно первый и последний шард
+    for vshard in (0, VIRTUAL_SHARDS - 1):
+        ids.append(Question.objects.create(id=new_id(vshard), text=f"Вопрос в шарде {vshard}").id)
+    for pk in ids:
+        assert [alias for alias in sharded if Question.objects.using(alias).filter(pk=pk).exists()] == [
+            shard_for_id(pk)
+        ]
+
+    # Список опрашивает все шарды и сливает страницы в порядке created_at
+    expected = sorted(
+        (row for alias in sharded for row in Question.objects.using(alias).values_list("created_at", "id")),
+        reverse=True,
+    )
+    seen, url = [], list_url + "?page_size=3"
+    while url:
+        data = api_client.get(url).data["data"]
+        seen += [row["id"] for row in data["results"]]
+        url = data["next"]
+    assert seen == [pk for _, pk in expected]
+
+    # Ответ создается в шарде вопроса и находится по своему id
+    far = ids[-1]
+    response = api_client.post(reverse("qa_api:answer-create", args=[far]),
+                               {"user_id": str(uuid.uuid4()), "text": "Ответ в дальнем шарде"}, format="json")
+    assert response.status_code == 201
+    answer_id = response.data["data"]["id"]
+    assert virtual_shard(answer_id) == virtual_shard(far)
+    assert Answer.objects.using(sharded[-1]).filter(pk=answer_id, question_id=far).exists()
+    assert api_client.get(reverse("qa_api:answer-detail", args=[answer_id])).status_code == 200
+    detail = api_client.get(reverse("qa_api:question-detail", args=[far])).data["data"]
+    assert detail["answers_count"] == 1 and detail["answers"][0]["id"] == answer_id
+
+    bulk = api_client.post(reverse("qa_api:answer-bulk-create"), [
+        {"question": pk, "user_id": str(uuid.uuid4()), "text": "Пакетный ответ"} for pk in (ids[-2], far)
+    ], format="json")
+    assert bulk.status_code == 201
+    assert api_client.get(reverse("qa_api:question-detail", args=[far])).data["data"]["answers_count"] == 2
+
+    # Новая карта: все в последний шард. До переноса строки находятся в старых шардах
+    settings.QA_SHARD_MAP = f"0-{VIRTUAL_SHARDS - 1}:{sharded[-1]}"
+    near = ids[-2]
+    assert api_client.get(reverse("qa_api:question-detail", args=[near])).status_code == 200
+    out = io.StringIO()
+    call_command("rebalance_shards", "--batch-size", "2", stdout=out)
+    moved = sum(1 for pk in ids if virtual_shard(pk) * len(sharded) // VIRTUAL_SHARDS != len(sharded) - 1)
+    assert f"Перенесено вопросов: {moved}, ответов: 1" in out.getvalue()
+    assert Question.objects.using(sharded[-1]).count() == len(ids)
+    assert all(not Question.objects.using(alias).exists() for alias in sharded[:-1])
+    detail = api_client.get(reverse("qa_api:question-detail", args=[near])).data["data"]
+    assert detail["answers_count"] == 1
+    call_command("rebalance_shards", "--dry-run", stdout=out)
+    assert "Не в своем шарде вопросов: 0, ответов: 0" in out.getvalue()
+
+
+# Бюджеты запросов из bench.BENCH_CASES: данных больше страницы, поэтому N+1
+# или чтение всей таблицы выводит маршрут за бюджет
+@pytest.mark.django_db
+@pytest.mark.parametrize("case", BENCH_CASES, ids=lambda case: case.label)
+def test_query_budgets(case):
+    data = seed_bench_data(questions=40, answers_per_question=3)
+    result = run_case(case, data, iterations=2)
+    assert result["status"] < 400
+    assert not over_budget(result), f"{case.label}: {result['queries']} запросов при бюджете {result['query_budget']}"
+
+
+@pytest.mark.django_db
+def test_bench_command_writes_report(tmp_path):
+    report_path = tmp_path / "bench.json"
+    call_command("bench", "--questions", "25", "--answers", "2", "--iterations", "2",
+                 "--route", "question-list", "--route", "answer-detail",
+                 "--output", str(report_path), stdout=io.StringIO())
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert set(report["routes"]) == {"question-list", "answer-detail"}
+    assert report["routes"]["question-list"]["p99_ms"] >= report["routes"]["question-list"]["p50_ms"]
+    assert report["meta"]["questions"] == 25
+    # Данные бенчмарка откатываются
+    assert not Question.objects.exists()
+
+
+@pytest.mark.django_db
+def test_seed_is_skewed_and_resumable():
+    args = ["--questions", "50", "--answers", "600", "--users", "40", "--batch-size", "100",
+            "--seed", "7", "--end", "2026-01-01T00:00:00Z"]
+    call_command("seed", *args, stdout=io.StringIO())
+    assert Question.objects.count() == 50 and Answer.objects.count() == 600
+    counts = sorted(Question.objects.values_list("answers_count", flat=True), reverse=True)
+    assert sum(counts) == 600
+    # Ципф: самый популярный вопрос получает заметно больше медианного
+    assert counts[0] > 5 * counts[len(counts) // 2]
+    assert Answer.objects.filter(created_at__lt=F("question__created_at")).count() == 0
+    ids = set(Answer.objects.values_list("pk", flat=True))
+
+    # Последняя пачка (ответы 500..599) не успела вставиться: повторный запуск
+    # дописывает только ее
+    Answer.objects.filter(text__regex=r"№5[0-9][0-9]\)").delete()
+    assert Answer.objects.count() == 500
+    out = io.StringIO()
+    call_command("seed", *args, stdout=out)
+    assert set(Answer.objects.values_list("pk", flat=True)) == ids
+    assert sum(Question.objects.values_list("answers_count", flat=True)) == 600
+    assert "Вставлено вопросов: 0" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_metrics_per_route(api_client):
+    metrics.registry.reset()
+    question = Question.objects.create(text="Вопрос для метрик")
+    api_client.get(reverse("qa_api:question-list-create"))
+    api_client.get(reverse("qa_api:question-detail", args=[question.pk]))
+    api_client.get(reverse("qa_api:question-detail", args=[question.pk + 1]))
+
+    response = api_client.get("/metrics")
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = response.content.decode()
+    assert 'qa_http_requests_total{method="GET",route="qa_api:question-detail",status="200"} 1' in body
+    assert 'qa_http_requests_total{method="GET",route="qa_api:question-detail",status="404"} 1' in body
+    assert 'qa_http_request_duration_seconds_bucket{method="GET",route="qa_api:question-list-create",le="+Inf"} 1' in body
+    queries = [line for line in body.splitlines()
+               if line.startswith('qa_db_queries_per_request_sum{method="GET",route="qa_api:question-list-create"}')]
+    assert queries and float(queries[0].split()[-1]) >= 1
+    assert "# TYPE qa_cache_misses_total counter" in body
+
+
+def test_metrics_snapshot_written_by_background_thread(api_client, tmp_path, settings, monkeypatch):
+    settings.QA_METRICS_DIR = str(tmp_path)
+    monkeypatch.setattr(metrics, "FLUSH_INTERVAL", 0.01)
+    assert api_client.get("/metrics").status_code == 200
+    # Снимок пишет поток сброса, а не обработчик запроса
+    snapshot = tmp_path / f"{os.getpid()}.json"
+    deadline = time.monotonic() + 5
+    while not snapshot.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert snapshot.exists()
+    assert metrics._flusher is not None and metrics._flusher.is_alive()
+
+
+def test_metrics_merge_worker_snapshots(tmp_path, settings):
+    settings.QA_METRICS_DIR = str(tmp_path)
+    metrics.registry.reset()
+    metrics.registry.inc("qa_http_requests_total", route="qa_api:stats", method="GET", status=200)
+    # Снимок завершившегося воркера: счетчики суммируются, мгновенные значения — нет
+    (tmp_path / "999999999.json").write_text(json.dumps({
+        "pid": 999999999,
+        "counters": [["qa_http_requests_total", [["method", "GET"], ["route", "qa_api:stats"], ["status", "200"]], 4]],
+        "histograms": [],
+        "gauges": [["qa_log_queue_size", [], 50]],
+    }))
+    metrics.flush()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+    body = metrics.render()
+    assert 'qa_http_requests_total{method="GET",route="qa_api:stats",status="200"} 5' in body
+    assert "qa_log_queue_size 0" in body
+
+    # Мастер переносит снимок завершившегося воркера в exited.json; воркер с тем же
+    # pid начинает свой снимок с нуля, и счетчики не уменьшаются
+    metrics.fold_worker(999999999)
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == sorted([f"{os.getpid()}.json", "exited.json"])
+    (tmp_path / "999999999.json").write_text(json.dumps({
+        "pid": 999999999,
+        "counters": [["qa_http_requests_total", [["method", "GET"], ["route", "qa_api:stats"], ["status", "200"]], 1]],
+        "histograms": [],
+        "gauges": [],
+    }))
+    metrics.fold_worker(999999999)
+    assert 'qa_http_requests_total{method="GET",route="qa_api:stats",status="200"} 6' in metrics.render()
+    assert not (tmp_path / "999999999.json").exists()
+
+
+@pytest.mark.django_db
+def test_admission_rate_limits_by_client_and_user(api_client, settings):
+    settings.QA_ADMISSION = {"ROUTES": {
+        "qa_api:question-detail GET": {"rate": 0.5, "burst": 2},
+        "qa_api:answer-create POST": {"key": "user_id", "rate": 0.5, "burst": 1},
+    }}
+    metrics.registry.reset()
+    question = Question.objects.create(text="Вопрос под нагрузкой")
+    url = reverse("qa_api:question-detail", args=[question.pk])
+    assert [api_client.get(url).status_code for _ in range(3)] == [200, 200, 429]
+    response = api_client.get(url)
+    assert response["Retry-After"] == "2" and response.json()["error"] == {"admission": "rate"}
+    assert api_client.get(url, REMOTE_ADDR="10.0.0.2").status_code == 200
+
+    answers = reverse("qa_api:answer-create", args=[question.pk])
+    first, second = str(uuid.uuid4()), str(uuid.uuid4())
+    assert api_client.post(answers, {"user_id": first, "text": "Раз"}, format="json").status_code == 201
+    assert api_client.post(answers, {"user_id": first, "text": "Два"}, format="json").status_code == 429
+    assert api_client.post(answers, {"user_id": second, "text": "Три"}, format="json").status_code == 201
+    # Некорректный Content-Length: тело без user_id, а не 500
+    assert api_client.post(answers, {"user_id": second, "text": "Четыре"}, format="json",
+                           CONTENT_LENGTH="много").status_code == 400
+    assert 'qa_admission_shed_total{reason="rate",route="qa_api:question-detail"} 2' in metrics.render()
+
+
+@pytest.mark.django_db
+def test_admission_sheds_expensive_scans_first(api_client, settings):
+    settings.QA_ADMISSION = {"MAX_INFLIGHT": 4, "ROUTES": {
+        "qa_api:question-list-create GET": {"priority": "expensive"},
+        "qa_api:question-detail GET": {"priority": "cheap"},
+        "qa_api:export": {"concurrency": 1},
+    }}
+    question = Question.objects.create(text="Дешевое чтение")
+    controller = admission.get_controller()
+    busy = controller.rule_for("qa_api:stats", "GET")
+    for _ in range(2):
+        assert controller.admit(busy, "client:busy") is None
+
+    # Занята половина лимита: дорогой список отклоняется, чтение по id проходит
+    response = api_client.get(reverse("qa_api:question-list-create"))
+    assert response.status_code == 503 and response["Retry-After"] == "1"
+    assert api_client.get(reverse("qa_api:question-detail", args=[question.pk])).status_code == 200
+    for _ in range(2):
+        controller.release(busy)
+    assert api_client.get(reverse("qa_api:question-list-create")).status_code == 200
+
+    # Слот потокового ответа занят, пока поток не дочитан
+    export = api_client.get(reverse("qa_api:export"))
+    assert api_client.get(reverse("qa_api:export")).json()["error"] == {"admission": "concurrency"}
+    b"".join(export.streaming_content)
+    assert controller.inflight == 0
+    # Клиент отключился до первого фрагмента: сервер закрывает ответ, слот свободен
+    export = api_client.get(reverse("qa_api:export"))
+    assert export.status_code == 200
+    export.close()
+    assert controller.inflight == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_acknowledges_then_flushes_batch(api_client, settings, tmp_path):
+    settings.QA_WRITE_BEHIND = {"ENABLED": True, "FLUSH_INTERVAL_MS": 60000, "MAX_BATCH": 100,
+                                "MAX_PENDING": 2, "DURABILITY": "journal", "JOURNAL_DIR": tmp_path}
+    question = Question.objects.create(text="Вопрос прямого эфира")
+    url = reverse("qa_api:answer-create", args=[question.pk])
+    responses = [api_client.post(url, {"user_id": str(uuid.uuid4()), "text": f"Ответ {i}"}, format="json")
+                 for i in range(3)]
+    # Буфер на два ответа: третий записан сразу
+    assert [response.status_code for response in responses] == [202, 202, 201]
+    assert api_client.post(url, {"user_id": "x", "text": "Ответ"}, format="json").status_code == 400
+    assert api_client.post(reverse("qa_api:answer-create", args=[new_id()]),
+                           {"user_id": str(uuid.uuid4()), "text": "Ответ"}, format="json").status_code == 404
+
+    accepted = [response.json()["data"]["id"] for response in responses[:2]]
+    [segment] = tmp_path.glob("answers-*.wal")
+    assert [json.loads(line)["id"] for line in segment.read_text().splitlines()] == accepted
+    assert Answer.objects.filter(pk__in=accepted).count() == 0
+
+    writer = writebehind.get_writer()
+    assert writer.flush() == 2
+    assert sorted(Answer.objects.filter(question=question).values_list("pk", flat=True)) == sorted(
+        accepted + [responses[2].json()["data"]["id"]])
+    question.refresh_from_db()
+    assert question.answers_count == 3
+    assert not list(tmp_path.glob("answers-*.wal"))
+    assert writebehind.writer_stats() | {"flush_seconds": 0} == {
+        "enabled": True, "pending": 0, "accepted": 2, "written": 2, "dropped": 0, "fallbacks": 1,
+        "batches": 1, "errors": 0, "dead_letters": 0, "flush_seconds": 0,
+    }
+    assert "qa_write_behind_written_total 2" in metrics.render()
+
+    # Вопрос удален: следующий ответ получает 404, а не 202 с последующей потерей
+    assert api_client.delete(reverse("qa_api:question-detail", args=[question.pk])).status_code == 204
+    response = api_client.post(url, {"user_id": str(uuid.uuid4()), "text": "Опоздавший ответ"}, format="json")
+    assert response.status_code == 404
+    assert writebehind.writer_stats()["accepted"] == 2
+
+
+@pytest.mark.django_db
+def test_write_behind_retries_idempotently_and_dead_letters_bad_rows(settings, tmp_path, monkeypatch):
+    settings.QA_WRITE_BEHIND = {"ENABLED": True, "FLUSH_INTERVAL_MS": 60000, "MAX_BATCH": 100,
+                                "MAX_PENDING": 100, "DURABILITY": "journal", "JOURNAL_DIR": tmp_path}
+    question = Question.objects.create(text="Вопрос под нагрузкой")
+    writer = writebehind.get_writer()
+    answers = [Answer(id=new_answer_id(question.pk), question_id=question.pk, user_id=uuid.uuid4(),
+                      text=f"Ответ {i}", created_at=timezone.now()) for i in range(2)]
+    for answer in answers:
+        assert writer.submit(answer, "default")
+
+    # Пачка записана, но подтверждение потеряно: повтор не должен падать на дублях pk
+    write_answers = writebehind.write_answers
+
+    def commit_then_fail(batch, skip_existing=False):
+        write_answers(batch, skip_existing)
+        raise OperationalError("connection lost")
+
+    monkeypatch.setattr(writebehind, "write_answers", commit_then_fail)
+    assert writer.flush() == 0
+    monkeypatch.setattr(writebehind, "write_answers", write_answers)
+    assert writer.flush() == 0
+    assert writer.stats()["pending"] == 0
+    question.refresh_from_db()
+    assert question.answers_count == 2
+
+    # Ответ с ошибкой в данных не блокирует очередь, а уходит в dead letters
+    poison = Answer(id=new_answer_id(question.pk), question_id=question.pk, user_id=uuid.uuid4(),
+                    text=None, created_at=timezone.now())
+    good = Answer(id=new_answer_id(question.pk), question_id=question.pk, user_id=uuid.uuid4(),
+                  text="После ошибки", created_at=timezone.now())
+    assert writer.submit(poison, "default") and writer.submit(good, "default")
+    assert writer.flush() == 1
+    assert Answer.objects.filter(pk=good.pk).exists()
+    [dead] = tmp_path.glob("dead-answers-*.jsonl")
+    assert [json.loads(line)["id"] for line in dead.read_text().splitlines()] == [poison.pk]
+    stats = writer.stats()
+    assert (stats["pending"], stats["errors"], stats["dead_letters"]) == (0, 1, 1)
+
+
+@pytest.mark.django_db(databases=django_settings.QA_SHARDS)
+def test_write_behind_writes_to_located_shard(api_client, settings, sharded, tmp_path):
+    settings.QA_SHARD_MAP = ""
+    settings.QA_WRITE_BEHIND = {"ENABLED": True, "FLUSH_INTERVAL_MS": 60000, "MAX_BATCH": 100,
+                                "MAX_PENDING": 2, "DURABILITY": "journal", "JOURNAL_DIR": tmp_path}
+    home, stale = sharded[0], sharded[-1]
+    # Вопрос еще не перенесен rebalance_shards и лежит не в шарде своего id
+    question = Question(id=new_id(0), text="Вопрос до переноса")
+    question.save(using=stale)
+    url = reverse("qa_api:answer-create", args=[question.pk])
+    responses = [api_client.post(url, {"user_id": str(uuid.uuid4()), "text": f"Ответ {i}"}, format="json")
+                 for i in range(3)]
+    assert [response.status_code for response in responses] == [202, 202, 201]
+    assert Answer.objects.using(stale).filter(pk=responses[2].json()["data"]["id"]).exists()
+    [segment] = tmp_path.glob("answers-*.wal")
+    assert {json.loads(line)["shard"] for line in segment.read_text().splitlines()} == {stale}
+
+    # Вопрос перенесен между приемом и записью: ответы пишутся в его новый шард
+    call_command("rebalance_shards", stdout=io.StringIO())
+    assert writebehind.get_writer().flush() == 2
+    assert Answer.objects.using(home).filter(question_id=question.pk).count() == 3
+    assert Question.objects.using(home).get(pk=question.pk).answers_count == 3
+    assert writebehind.writer_stats()["dropped"] == 0
+
+
+@pytest.mark.django_db
+def test_write_behind_replays_orphaned_journal(tmp_path):
+    question = Question.objects.create(text="Вопрос до аварии")
+    written = Answer.objects.create(question=question, user_id=uuid.uuid4(), text="Уже в БД")
+    pending = Answer(question=question, user_id=uuid.uuid4(), text="Только в журнале")
+    pending.pk = new_answer_id(question.pk)
+    # Журнал процесса, упавшего после записи одной пачки и посреди строки следующей
+    (tmp_path / "answers-dead.lock").touch()
+    (tmp_path / "answers-dead-000001.wal").write_text("".join(
+        writebehind._answer_record(answer) + "\n" for answer in (written, pending)
+    ) + '{"id": 1, "quest', encoding="utf-8")
+
+    assert writebehind.replay_journals(tmp_path) == 1
+    assert Answer.objects.filter(question=question).count() == 2
+    question.refresh_from_db()
+    assert question.answers_count == 2
+    assert not list(tmp_path.iterdir())
+    assert writebehind.replay_journals(tmp_path) == 0
@@ -1,14 +1,32 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'qa_api'
 
 urlpatterns = [
     # Вопросы
     path('questions/', views.QuestionListCreateView.as_view(), name='question-list-create'),
+    path('questions/bulk/', views.QuestionBulkCreateView.as_view(), name='question-bulk-create'),
+    path('questions/bulk-delete/', views.QuestionBulkDeleteView.as_view(), name='question-bulk-delete'),
     path('questions/<int:pk>/', views.QuestionDetailView.as_view(), name='question-detail'),
 
     # Ответы
-    path('questions/<int:question_id>/answers/', views.AnswerCreateView.as_view(), name='answer-create'),
+    path('questions/<int:question_id>/answers/', views.AnswerListCreateView.as_view(), name='answer-create'),
+    path('answers/bulk/', views.AnswerBulkCreateView.as_view(), name='answer-bulk-create'),
     path('answers/<int:pk>/', views.AnswerDetailView.as_view(), name='answer-detail'),
+    path('users/<uuid:user_id>/answers/', views.UserAnswerListView.as_view(), name='user-answers'),
+
+    # Асинхронные варианты read-эндпоинтов (для ASGI)
+    path('async/questions/', async_views.AsyncQuestionListView.as_view(), name='async-question-list'),
+    path('async/questions/<int:pk>/', async_views.AsyncQuestionDetailView.as_view(), name='async-question-detail'),
+    path('async/answers/<int:pk>/', async_views.AsyncAnswerDetailView.as_view(), name='async-answer-detail'),
+
+    # Выгрузка
+    path('export/', views.ExportView.as_view(), name='export'),
+
+    # Поиск
+    path('search/', views.SearchView.as_view(), name='search'),
+
+    # Служебное
+    path('stats/', views.StatsView.as_view(), name='stats'),
 ]
\ No newline at end of file
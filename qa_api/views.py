@@ -1,17 +1,50 @@
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status, generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.urls import reverse
 import logging
+import time
 
-from .models import Question, Answer
+from . import cache as qa_cache
+from .archive import find_archived, find_archived_answer
+from .conditional import get_question_stamp, not_modified, page_etag, question_etag, set_validators
+from .export import export_rows, filter_period, parse_bound, parse_types
+from .logqueue import log_event, queue_stats
+from .models import Question, Answer, new_answer_id
+from .pagination import AnswerKeysetPagination, InvalidCursor, QuestionKeysetPagination, RankedPagination
+from .pool import pool_stats
+from .readers import (
+    ANSWER_VALUES,
+    QUESTION_VALUES,
+    answer_dict,
+    answer_dicts,
+    question_detail_dict,
+    question_dicts,
+    with_question_text,
+)
+from .renderers import FastJSONRenderer
+from .search import MAX_QUERY_LENGTH, search
 from .serializers import (
     QuestionSerializer, 
     QuestionDetailSerializer, 
     AnswerSerializer, 
     AnswerCreateSerializer
 )
+from .services import (
+    BulkLimitExceeded,
+    bulk_create_answers,
+    bulk_create_questions,
+    check_bulk_size,
+    tombstone_answer,
+    tombstone_question,
+    tombstone_questions,
+)
+from .shards import get_on_shards, on_shard, read_querysets
+from .streaming import is_asgi, is_truthy, ndjson_response
+from .writebehind import get_writer, writer_stats
 
 logger = logging.getLogger(__name__)
 
@@ -24,29 +57,86 @@ def api_response(success=True, data=None, message=None, error=None, status_code=
     }, status=status_code)
 
 
+def invalid_cursor_response(exc: InvalidCursor):
+    return api_response(
+        success=False,
+        error={"cursor": str(exc)},
+        message="Некорректные параметры пагинации",
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+
 # GET /api/questions/ — список всех вопросов
 # POST /api/questions/ — создать новый вопрос
 class QuestionListCreateView(generics.ListCreateAPIView):
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
+    pagination_class = QuestionKeysetPagination
+    renderer_classes = [FastJSONRenderer]
 
     def get_queryset(self):
-        return Question.objects.all().prefetch_related('answers')
+        return Question.objects.all()
 
     @swagger_auto_schema(
         tags=['Questions'],
         operation_summary="Получить список вопросов",
-        operation_description="Возвращает пагинированный список всех вопросов с количеством ответов.",
+        operation_description=(
+            "Возвращает страницу вопросов (сначала новые) с количеством ответов. "
+            "Для перехода используйте ссылки next/previous с непрозрачным курсором. "
+            "count=exact добавляет точное число вопросов, count=estimate — оценку."
+        ),
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Курсор страницы из ссылок next/previous"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Размер страницы (по умолчанию 20, максимум 100)"),
+            openapi.Parameter('count', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['exact', 'estimate'],
+                              description="Вернуть общее количество вопросов"),
+        ],
         responses={200: QuestionSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return api_response(
+        # Без count тело страницы определяется только ее строками — можно отдать 304,
+        # сверив ETag по (id, last_activity_at) страницы, без сериализации
+        conditional = 'count' not in request.query_params
+
+        def build():
+            # Все шарды, страницы сливаются по (created_at, id)
+            page = self.paginator.paginate_querysets(
+                read_querysets(self.get_queryset().values(*QUESTION_VALUES)), request
+            )
+            etag = self.get_page_etag([(row['id'], row['last_activity_at']) for row in page])
+            return self.paginator.get_paginated_data(question_dicts(page)), etag
+
+        try:
+            if conditional and request.headers.get('If-None-Match'):
+                paginator = self.pagination_class()
+                stamps = paginator.paginate_querysets(
+                    read_querysets(self.get_queryset().values('id', 'created_at', 'last_activity_at')), request
+                )
+                etag = self.get_page_etag([(row['id'], row['last_activity_at']) for row in stamps], paginator)
+                response = not_modified(request, etag)
+                if response is not None:
+                    return response
+
+            key = qa_cache.question_list_key(request.build_absolute_uri())
+            data, etag = qa_cache.get_or_build(key, build)
+        except InvalidCursor as exc:
+            return invalid_cursor_response(exc)
+
+        response = api_response(
             success=True,
-            data=serializer.data,
+            data=data,
             message="Список вопросов успешно получен"
         )
+        if conditional:
+            set_validators(response, etag)
+        return response
+
+    def get_page_etag(self, rows, paginator=None) -> str:
+        paginator = paginator or self.paginator
+        return page_etag(rows, paginator.has_next, paginator.has_previous, self.request.get_full_path())
 
     @swagger_auto_schema(
         tags=['Questions'],
@@ -62,7 +152,7 @@ class QuestionListCreateView(generics.ListCreateAPIView):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             question = serializer.save()
-            logger.info(f"Создан вопрос id={question.id}")
+            log_event(logger, 'question_created', "Создан вопрос", question_id=question.id)
             return api_response(
                 success=True,
                 data=serializer.data,
@@ -70,7 +160,8 @@ class QuestionListCreateView(generics.ListCreateAPIView):
                 status_code=status.HTTP_201_CREATED
             )
         else:
-            logger.warning(f"Ошибка валидации при создании вопроса: {serializer.errors}")
+            log_event(logger, 'question_invalid', "Ошибка валидации при создании вопроса",
+                      level=logging.WARNING, errors=serializer.errors)
             return api_response(
                 success=False,
                 error=serializer.errors,
@@ -79,28 +170,189 @@ class QuestionListCreateView(generics.ListCreateAPIView):
             )
 
 
-# GET /api/questions/{id}/ — получить вопрос и все ответы на него
+# POST /api/questions/bulk/ — создать пачку вопросов
+class QuestionBulkCreateView(APIView):
+    @swagger_auto_schema(
+        tags=['Questions'],
+        operation_summary="Пакетно создать вопросы",
+        operation_description=(
+            "Принимает массив вопросов вида {text} (или объект {questions: [...]}). "
+            "По умолчанию при любой ошибке ничего не сохраняется; с partial=true сохраняются "
+            "корректные элементы, ошибки возвращаются с индексами."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                required=['text'],
+                properties={'text': openapi.Schema(type=openapi.TYPE_STRING)},
+            ),
+        ),
+        manual_parameters=[
+            openapi.Parameter('partial', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Сохранить корректные элементы, даже если есть ошибки"),
+        ],
+        responses={
+            201: 'Вопросы созданы',
+            400: 'Ошибка валидации'
+        }
+    )
+    def post(self, request):
+        items = request.data.get('questions') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return api_response(
+                success=False,
+                error={"questions": "Ожидается непустой массив вопросов"},
+                message="Ошибка валидации данных",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        partial = is_truthy(request.query_params.get('partial'))
+        try:
+            created, errors = bulk_create_questions(items, partial=partial)
+        except BulkLimitExceeded as exc:
+            return api_response(
+                success=False,
+                error={"questions": str(exc)},
+                message="Слишком много записей",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not created:
+            log_event(logger, 'questions_bulk_rejected', "Пакетное создание вопросов отклонено",
+                      level=logging.WARNING, errors=len(errors), items=len(items))
+            return api_response(
+                success=False,
+                error={"items": errors},
+                message="Ошибка валидации данных",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        log_event(logger, 'questions_bulk_created', "Пакетно созданы вопросы",
+                  created=len(created), rejected=len(errors))
+        return api_response(
+            success=True,
+            data={
+                "created": len(created),
+                "ids": [question.id for question in created],
+                "errors": errors,
+            },
+            message=f"Создано вопросов: {len(created)}",
+            status_code=status.HTTP_201_CREATED
+        )
+
+
+# POST /api/questions/bulk-delete/ — удалить вопросы (вместе с ответами) по списку id
+# или по диапазону created_at
+class QuestionBulkDeleteView(APIView):
+    @swagger_auto_schema(
+        tags=['Questions'],
+        operation_summary="Пакетно удалить вопросы",
+        operation_description=(
+            "Удаляет вопросы по списку ids и/или по периоду created_at (since включительно, "
+            "until — нет) вместе со всеми ответами. Нужно указать хотя бы один критерий. "
+            "Строки помечаются удаленными сразу, физически их удаляет purge_deleted."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                      items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                'since': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                'until': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            },
+        ),
+        responses={
+            200: 'Вопросы удалены',
+            400: 'Ошибка валидации'
+        }
+    )
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        ids = data.get('ids')
+        try:
+            since = parse_bound(data.get('since'))
+            until = parse_bound(data.get('until'))
+            if ids is not None:
+                if not isinstance(ids, list) or any(isinstance(pk, bool) for pk in ids):
+                    raise ValueError("ids должен быть массивом целых чисел")
+                ids = [int(pk) for pk in ids]
+                check_bulk_size(ids)
+        except (TypeError, ValueError) as exc:
+            return api_response(
+                success=False,
+                error={"params": str(exc)},
+                message="Ошибка валидации данных",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        if ids is None and since is None and until is None:
+            return api_response(
+                success=False,
+                error={"params": "Укажите ids, since или until"},
+                message="Ошибка валидации данных",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = filter_period(Question.objects.all(), since, until)
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+        questions_deleted, answers_deleted = tombstone_questions(queryset)
+
+        log_event(logger, 'questions_bulk_deleted', "Пакетно удалены вопросы",
+                  questions=questions_deleted, answers=answers_deleted)
+        return api_response(
+            success=True,
+            data={"deleted_questions": questions_deleted, "deleted_answers": answers_deleted},
+            message=f"Удалено вопросов: {questions_deleted}, ответов: {answers_deleted}"
+        )
+
+
+# GET /api/questions/{id}/ — получить вопрос и первую страницу ответов на него
 # DELETE /api/questions/{id}/ — удалить вопрос (вместе с ответами)
 class QuestionDetailView(APIView):
-    def get_object(self, pk: int) -> Question | None:
-        try:
-            return Question.objects.prefetch_related('answers').get(pk=pk)
-        except Question.DoesNotExist:
-            logger.warning(f"Попытка доступа к несуществующему вопросу id={pk}")
-            return None
+    renderer_classes = [FastJSONRenderer]
 
     @swagger_auto_schema(
         tags=['Questions'],
-        operation_summary="Получить вопрос со всеми ответами",
-        operation_description="Возвращает детальную информацию о вопросе включая все ответы на него.",
+        operation_summary="Получить вопрос с ответами",
+        operation_description=(
+            "Возвращает детальную информацию о вопросе и первую страницу ответов на него. "
+            "Остальные ответы доступны по ссылке answers_next."
+        ),
         responses={
             200: QuestionDetailSerializer(),
             404: 'Вопрос не найден'
         },
     )
     def get(self, request, pk: int):
-        question = self.get_object(pk)
-        if not question:
+        if request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since'):
+            stamp = get_question_stamp(pk)
+            if stamp is not None:
+                response = not_modified(request, question_etag(pk, stamp), stamp)
+                if response is not None:
+                    return response
+
+        def build():
+            using, question = get_on_shards(Question.objects.values(*QUESTION_VALUES), pk)
+            if not question:
+                # Холодный вопрос без ответов перенесен в архив (archive_cold) — читаем оттуда
+                archived = find_archived('questions', pk)
+                if archived:
+                    return question_detail_dict(archived, [], None), archived['last_activity_at']
+                log_event(logger, 'question_not_found', "Попытка доступа к несуществующему вопросу",
+                          level=logging.WARNING, question_id=pk)
+                return None
+            paginator = AnswerKeysetPagination()
+            answers_url = request.build_absolute_uri(reverse('qa_api:answer-create', args=[pk]))
+            answers = paginator.paginate_first_page(
+                on_shard(Answer.objects.of_live_question(pk), using).values(*ANSWER_VALUES), answers_url
+            )
+            data = question_detail_dict(question, answers, paginator.get_next_link())
+            return data, question['last_activity_at']
+
+        cached = qa_cache.get_or_build(qa_cache.question_key(pk, request.build_absolute_uri()), build)
+        if cached is None:
             return api_response(
                 success=False,
                 error={"id": f"Вопрос с id={pk} не найден"},
@@ -108,26 +360,33 @@ class QuestionDetailView(APIView):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = QuestionDetailSerializer(question)
-        logger.info(f"Запрос детальной информации о вопросе id={pk}")
-        return api_response(
+        data, stamp = cached
+        log_event(logger, 'question_viewed', "Запрос детальной информации о вопросе", question_id=pk)
+        response = api_response(
             success=True,
-            data=serializer.data,
+            data=data,
             message="Детальная информация о вопросе успешно получена"
         )
+        return set_validators(response, question_etag(pk, stamp), stamp)
 
     @swagger_auto_schema(
         tags=['Questions'],
         operation_summary="Удалить вопрос",
-        operation_description="Удаляет вопрос и все его ответы (каскадное удаление).",
+        operation_description=(
+            "Удаляет вопрос и все его ответы. Вопрос сразу скрывается из всех ответов API, "
+            "физически строки удаляет фоновая команда purge_deleted."
+        ),
         responses={
             204: 'Вопрос успешно удален',
             404: 'Вопрос не найден'
         },
     )
     def delete(self, request, pk: int):
-        question = self.get_object(pk)
-        if not question:
+        # Вопрос помечается удаленным одним UPDATE, ответы скрываются вместе с ним
+        questions_deleted, answers_count = tombstone_question(pk)
+        if not questions_deleted:
+            log_event(logger, 'question_not_found', "Попытка доступа к несуществующему вопросу",
+                      level=logging.WARNING, question_id=pk)
             return api_response(
                 success=False,
                 error={"id": f"Вопрос с id={pk} не найден"},
@@ -135,9 +394,7 @@ class QuestionDetailView(APIView):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        answers_count = question.answers.count()
-        question.delete()
-        logger.info(f"Удален вопрос id={pk} с {answers_count} ответами")
+        log_event(logger, 'question_deleted', "Удален вопрос", question_id=pk, answers=answers_count)
         return api_response(
             success=True,
             data={"id": pk, "deleted_answers": answers_count},
@@ -146,15 +403,112 @@ class QuestionDetailView(APIView):
         )
 
 
+# GET /api/questions/{id}/answers/ — постранично получить ответы на вопрос
 # POST /api/questions/{id}/answers/ — добавить ответ к вопросу
-class AnswerCreateView(APIView):
+class AnswerListCreateView(APIView):
+    renderer_classes = [FastJSONRenderer]
+    # Один экземпляр на все запросы, как в bulk_create_answers: поля ModelSerializer
+    # строятся один раз, а не на каждый ответ
+    validator = AnswerCreateSerializer()
+    stream_fields = ('id', 'question_id', 'user_id', 'text', 'created_at')
+    stream_chunk_size = 2000
+
+    @swagger_auto_schema(
+        tags=['Answers'],
+        operation_summary="Получить ответы на вопрос",
+        operation_description=(
+            "Возвращает страницу ответов в порядке добавления с курсорами next/previous. "
+            "С параметром stream=true отдает все ответы потоком в формате NDJSON."
+        ),
+        manual_parameters=[
+            openapi.Parameter('question_id', openapi.IN_PATH, type=openapi.TYPE_INTEGER,
+                              description="ID вопроса"),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Курсор страницы из ссылок next/previous"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Размер страницы (по умолчанию 20, максимум 100)"),
+            openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Отдать все ответы потоком NDJSON"),
+        ],
+        responses={
+            200: AnswerSerializer(many=True),
+            404: 'Вопрос не найден'
+        }
+    )
+    def get(self, request, question_id: int):
+        if is_truthy(request.query_params.get('stream')):
+            queryset = self.question_answers(question_id)
+            if queryset is None:
+                return self.question_not_found(question_id)
+            return ndjson_response(self.stream_rows(queryset), asynchronous=is_asgi(request))
+
+        def build():
+            queryset = self.question_answers(question_id)
+            if queryset is None:
+                return None
+            paginator = AnswerKeysetPagination()
+            page = paginator.paginate_queryset(queryset.values(*ANSWER_VALUES), request, view=self)
+            return paginator.get_paginated_data(answer_dicts(page))
+
+        try:
+            data = qa_cache.get_or_build(qa_cache.question_key(question_id, request.build_absolute_uri()), build)
+        except InvalidCursor as exc:
+            return invalid_cursor_response(exc)
+        if data is None:
+            return self.question_not_found(question_id)
+
+        return api_response(
+            success=True,
+            data=data,
+            message="Список ответов успешно получен"
+        )
+
+    # Ответы вопроса или None, если вопроса нет. У вопроса из архива ответов нет:
+    # archive_cold переносит только вопросы без ответов (archive.cold_questions)
+    @staticmethod
+    def question_answers(question_id: int):
+        using, _ = get_on_shards(Question.objects.values_list('pk', flat=True), question_id)
+        if using is not None:
+            return on_shard(Answer.objects.of_live_question(question_id), using)
+        if find_archived('questions', question_id) is not None:
+            return Answer.objects.none()
+        return None
+
+    def question_not_found(self, question_id: int):
+        return api_response(
+            success=False,
+            error={"question_id": f"Вопрос с id={question_id} не найден"},
+            message="Вопрос не найден",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+
+    def stream_rows(self, queryset):
+        # values() + iterator() — без создания моделей и без буферизации всего набора
+        rows = (
+            queryset.order_by('created_at', 'id')
+            .values_list(*self.stream_fields)
+            .iterator(chunk_size=self.stream_chunk_size)
+        )
+        for answer_id, question_id, user_id, text, created_at in rows:
+            yield {
+                'id': answer_id,
+                'question': question_id,
+                'user_id': user_id,
+                'text': text,
+                'created_at': created_at,
+            }
+
     @swagger_auto_schema(
         tags=['Answers'],
         operation_summary="Создать ответ на вопрос",
-        operation_description="Создает новый ответ на указанный вопрос",
+        operation_description=(
+            "Создает новый ответ на указанный вопрос. В режиме отложенной записи возвращает 202: "
+            "ответ с присвоенным id будет сохранен со следующей пачкой"
+        ),
         request_body=AnswerCreateSerializer,
         responses={
             201: AnswerSerializer,
+            202: 'Ответ принят в отложенную запись (QA_WRITE_BEHIND)',
             400: 'Ошибка валидации',
             404: 'Вопрос не найден'
         },
@@ -168,10 +522,16 @@ class AnswerCreateView(APIView):
         ]
     )
     def post(self, request, question_id: int):
-        try:
-            question = Question.objects.get(pk=question_id)
-        except Question.DoesNotExist:
-            logger.warning(f"Попытка создать ответ на несуществующий вопрос id={question_id}")
+        # Ответ сохраняется в шард вопроса (shards.ShardRouter). Вопрос читается на
+        # каждый ответ и при отложенной записи — иначе ответ на удаленный вопрос получил бы 202
+        writer = get_writer()
+        if writer is not None:
+            found, _ = get_on_shards(Question.objects.values_list('pk', flat=True), question_id)
+        else:
+            _, found = get_on_shards(Question.objects.all(), question_id)
+        if found is None:
+            log_event(logger, 'answer_question_not_found', "Попытка создать ответ на несуществующий вопрос",
+                      level=logging.WARNING, question_id=question_id)
             return api_response(
                 success=False,
                 error={"question_id": f"Вопрос с id={question_id} не найден"},
@@ -179,39 +539,126 @@ class AnswerCreateView(APIView):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = AnswerCreateSerializer(data=request.data)
-        if serializer.is_valid():
-            answer = serializer.save(question=question)
-            logger.info(f"Создан ответ id={answer.id} на вопрос id={question_id}")
-
-            response_serializer = AnswerSerializer(answer)
+        try:
+            validated = self.validator.run_validation(request.data)
+        except ValidationError as exc:
+            log_event(logger, 'answer_invalid', "Ошибка валидации при создании ответа",
+                      level=logging.WARNING, question_id=question_id, errors=exc.detail)
             return api_response(
-                success=True,
-                data=response_serializer.data,
-                message="Ответ успешно создан",
-                status_code=status.HTTP_201_CREATED
+                success=False,
+                error=exc.detail,
+                message="Ошибка валидации данных",
+                status_code=status.HTTP_400_BAD_REQUEST
             )
+
+        if writer is None:
+            answer = Answer.objects.create(question=found, **validated)
         else:
-            logger.warning(
-                f"Ошибка валидации при создании ответа на вопрос id={question_id}: {serializer.errors}"
+            # Отложенная запись (writebehind.py): id и время присваиваются сейчас,
+            # строка попадет в БД со следующей пачкой
+            answer = Answer(id=new_answer_id(question_id), question_id=question_id, **validated)
+            if writer.submit(answer, found):
+                log_event(logger, 'answer_accepted', "Ответ принят в отложенную запись",
+                          answer_id=answer.id, question_id=question_id)
+                return api_response(
+                    success=True,
+                    data=answer_dict(answer),
+                    message="Ответ принят и будет сохранен",
+                    status_code=status.HTTP_202_ACCEPTED
+                )
+            answer.save(force_insert=True, using=found)
+        log_event(logger, 'answer_created', "Создан ответ", answer_id=answer.id, question_id=question_id)
+
+        return api_response(
+            success=True,
+            data=answer_dict(answer),
+            message="Ответ успешно создан",
+            status_code=status.HTTP_201_CREATED
+        )
+
+# POST /api/answers/bulk/ — создать пачку ответов на один или несколько вопросов
+class AnswerBulkCreateView(APIView):
+    @swagger_auto_schema(
+        tags=['Answers'],
+        operation_summary="Пакетно создать ответы",
+        operation_description=(
+            "Принимает массив ответов вида {question, user_id, text} (или объект {answers: [...]}). "
+            "По умолчанию при любой ошибке ничего не сохраняется; с partial=true сохраняются "
+            "корректные элементы, ошибки возвращаются с индексами."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                required=['question', 'user_id', 'text'],
+                properties={
+                    'question': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'user_id': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
+                    'text': openapi.Schema(type=openapi.TYPE_STRING),
+                },
+            ),
+        ),
+        manual_parameters=[
+            openapi.Parameter('partial', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Сохранить корректные элементы, даже если есть ошибки"),
+        ],
+        responses={
+            201: 'Ответы созданы',
+            400: 'Ошибка валидации'
+        }
+    )
+    def post(self, request):
+        items = request.data.get('answers') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return api_response(
+                success=False,
+                error={"answers": "Ожидается непустой массив ответов"},
+                message="Ошибка валидации данных",
+                status_code=status.HTTP_400_BAD_REQUEST
             )
+
+        partial = is_truthy(request.query_params.get('partial'))
+        started = time.perf_counter()
+        try:
+            created, errors = bulk_create_answers(items, partial=partial)
+        except BulkLimitExceeded as exc:
             return api_response(
                 success=False,
-                error=serializer.errors,
+                error={"answers": str(exc)},
+                message="Слишком много записей",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not created:
+            log_event(logger, 'answers_bulk_rejected', "Пакетное создание ответов отклонено",
+                      level=logging.WARNING, errors=len(errors), items=len(items))
+            return api_response(
+                success=False,
+                error={"items": errors},
                 message="Ошибка валидации данных",
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
+        elapsed = time.perf_counter() - started
+        log_event(logger, 'answers_bulk_created', "Пакетно созданы ответы",
+                  created=len(created), rejected=len(errors), seconds=round(elapsed, 3),
+                  rows_per_second=round(len(created) / elapsed))
+        return api_response(
+            success=True,
+            data={
+                "created": len(created),
+                "ids": [answer.id for answer in created],
+                "errors": errors,
+            },
+            message=f"Создано ответов: {len(created)}",
+            status_code=status.HTTP_201_CREATED
+        )
+
+
 # GET /api/answers/{id}/ — получить конкретный ответ
 # DELETE /api/answers/{id}/ — удалить ответ
 class AnswerDetailView(APIView):
-
-    def get_object(self, pk: int) -> Answer | None:
-        try:
-            return Answer.objects.select_related('question').get(pk=pk)
-        except Answer.DoesNotExist:
-            logger.warning(f"Попытка доступа к несуществующему ответу id={pk}")
-            return None
+    renderer_classes = [FastJSONRenderer]
 
     @swagger_auto_schema(
         tags=['Answers'],
@@ -222,8 +669,15 @@ class AnswerDetailView(APIView):
         }
     )
     def get(self, request, pk: int):
-        answer = self.get_object(pk)
-        if not answer:
+        _, answer = get_on_shards(Answer.objects.values(*ANSWER_VALUES), pk)
+        if answer:
+            [data] = answer_dicts([answer])
+        else:
+            # Старые ответы перенесены в архив (archive_cold) — читаем оттуда
+            data = find_archived_answer(pk)
+        if not data:
+            log_event(logger, 'answer_not_found', "Попытка доступа к несуществующему ответу",
+                      level=logging.WARNING, answer_id=pk)
             return api_response(
                 success=False,
                 error={"answer_id": f"Ответ с id={pk} не найден"},
@@ -231,11 +685,10 @@ class AnswerDetailView(APIView):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = AnswerSerializer(answer)
-        logger.info(f"Запрос информации об ответе id={pk}")
+        log_event(logger, 'answer_viewed', "Запрос информации об ответе", answer_id=pk)
         return api_response(
             success=True,
-            data=serializer.data,
+            data=data,
             message="Ответ получен",
             status_code=status.HTTP_200_OK
         )
@@ -249,8 +702,10 @@ class AnswerDetailView(APIView):
         }
     )
     def delete(self, request, pk: int):
-        answer = self.get_object(pk)
-        if not answer:
+        question_id = tombstone_answer(pk)
+        if question_id is None:
+            log_event(logger, 'answer_not_found', "Попытка доступа к несуществующему ответу",
+                      level=logging.WARNING, answer_id=pk)
             return api_response(
                 success=False,
                 error={"answer_id": f"Ответ с id={pk} не найден"},
@@ -258,12 +713,187 @@ class AnswerDetailView(APIView):
                 status_code=status.HTTP_404_NOT_FOUND
             )
 
-        question_id = answer.question_id
-        answer.delete()
-        logger.info(f"Удален ответ id={pk} на вопрос id={question_id}")
+        log_event(logger, 'answer_deleted', "Удален ответ", answer_id=pk, question_id=question_id)
         return api_response(
             success=True,
             data={"answer_id": pk, "question_id": question_id},
             message=f"Ответ #{pk} успешно удален",
             status_code=status.HTTP_204_NO_CONTENT
         )
+
+
+# GET /api/users/{user_id}/answers/ — история ответов пользователя в порядке добавления.
+# Страницы выбираются по индексу (user_id, created_at), count=exact считается по нему же
+class UserAnswerListView(APIView):
+    renderer_classes = [FastJSONRenderer]
+    pagination_class = AnswerKeysetPagination
+
+    @swagger_auto_schema(
+        tags=['Answers'],
+        operation_summary="Получить ответы пользователя",
+        operation_description=(
+            "Возвращает страницу ответов пользователя в порядке добавления с курсорами next/previous. "
+            "С include_question=true к каждому ответу добавляется текст вопроса (question_text)."
+        ),
+        manual_parameters=[
+            openapi.Parameter('user_id', openapi.IN_PATH, type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID,
+                              description="Идентификатор пользователя"),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Курсор страницы из ссылок next/previous"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Размер страницы (по умолчанию 20, максимум 100)"),
+            openapi.Parameter('count', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['exact', 'estimate'],
+                              description="Добавить в ответ общее число ответов пользователя"),
+            openapi.Parameter('include_question', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Добавить текст вопроса к каждому ответу"),
+        ],
+        responses={
+            200: AnswerSerializer(many=True),
+            400: 'Некорректные параметры пагинации'
+        }
+    )
+    def get(self, request, user_id):
+        include_question = is_truthy(request.query_params.get('include_question'))
+        fields = ANSWER_VALUES + ('question__text',) if include_question else ANSWER_VALUES
+        paginator = self.pagination_class()
+        try:
+            page = paginator.paginate_querysets(
+                read_querysets(Answer.objects.filter(user_id=user_id).values(*fields)), request
+            )
+        except InvalidCursor as exc:
+            return invalid_cursor_response(exc)
+
+        results = answer_dicts(page)
+        if include_question:
+            results = with_question_text(results, page)
+        return api_response(
+            success=True,
+            data=paginator.get_paginated_data(results),
+            message="Список ответов пользователя успешно получен"
+        )
+
+
+# GET /api/export/ — потоковая выгрузка вопросов и ответов в NDJSON
+class ExportView(APIView):
+    @swagger_auto_schema(
+        tags=['Export'],
+        operation_summary="Выгрузить вопросы и ответы",
+        operation_description=(
+            "Отдает вопросы, затем ответы потоком в формате NDJSON (одна JSON-строка на запись "
+            "с полем type). Период задается по created_at: since включительно, until — нет."
+        ),
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Начало периода (ISO 8601)"),
+            openapi.Parameter('until', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Конец периода (ISO 8601, не включительно)"),
+            openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="questions, answers или оба через запятую"),
+            openapi.Parameter('gzip', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Сжать выгрузку gzip"),
+        ],
+        responses={
+            200: 'Поток NDJSON',
+            400: 'Некорректные параметры'
+        }
+    )
+    def get(self, request):
+        try:
+            since = parse_bound(request.query_params.get('since'))
+            until = parse_bound(request.query_params.get('until'))
+            types = parse_types(request.query_params.get('type'))
+        except ValueError as exc:
+            return api_response(
+                success=False,
+                error={"params": str(exc)},
+                message="Некорректные параметры выгрузки",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        compress = is_truthy(request.query_params.get('gzip'))
+        filename = 'qa_export.ndjson.gz' if compress else 'qa_export.ndjson'
+        log_event(logger, 'export_requested', "Запрошена выгрузка",
+                  types=','.join(types), since=since, until=until)
+        return ndjson_response(export_rows(since, until, types), filename=filename, compress=compress,
+                               asynchronous=is_asgi(request))
+
+
+# GET /api/search/?q=... — полнотекстовый поиск по вопросам и ответам
+class SearchView(APIView):
+    renderer_classes = [FastJSONRenderer]
+    pagination_class = RankedPagination
+
+    @swagger_auto_schema(
+        tags=['Search'],
+        operation_summary="Поиск по вопросам и ответам",
+        operation_description=(
+            "Ищет слова запроса в тексте вопросов и ответов по полнотекстовому индексу. "
+            "Результаты отсортированы по релевантности (rank), у ответов есть поле question."
+        ),
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Поисковый запрос"),
+            openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="questions, answers или оба через запятую"),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Курсор страницы из ссылок next/previous"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Размер страницы (по умолчанию 20, максимум 100)"),
+        ],
+        responses={
+            200: 'Найденные вопросы и ответы',
+            400: 'Некорректные параметры'
+        }
+    )
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        try:
+            if not query:
+                raise ValueError("Параметр q обязателен")
+            if len(query) > MAX_QUERY_LENGTH:
+                raise ValueError(f"Запрос длиннее {MAX_QUERY_LENGTH} символов")
+            types = parse_types(request.query_params.get('type'))
+        except ValueError as exc:
+            return api_response(
+                success=False,
+                error={"params": str(exc)},
+                message="Некорректные параметры поиска",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+
+        paginator = self.pagination_class()
+        try:
+            results = paginator.paginate(
+                lambda limit, offset: search(query, types, limit=limit, offset=offset), request
+            )
+        except InvalidCursor as exc:
+            return invalid_cursor_response(exc)
+
+        log_event(logger, 'search', "Выполнен поиск", types=','.join(types), found=len(results))
+        return api_response(
+            success=True,
+            data=paginator.get_paginated_data(results),
+            message="Результаты поиска получены"
+        )
+
+
+# GET /api/stats/ — счетчики для настройки кэша, очереди логов и пулов соединений
+class StatsView(APIView):
+    @swagger_auto_schema(
+        tags=['Stats'],
+        operation_summary="Получить статистику сервиса",
+        operation_description="Счетчики попаданий и промахов кэша, состояние очереди логов, пулов соединений с БД "
+                              "(размер, ожидание соединения) и буфера отложенной записи ответов текущего процесса.",
+        responses={200: 'Статистика'}
+    )
+    def get(self, request):
+        return api_response(
+            success=True,
+            data={
+                "cache": qa_cache.stats.snapshot(),
+                "logging": queue_stats(),
+                "database": pool_stats(),
+                "write_behind": writer_stats(),
+            },
+            message="Статистика получена"
+        )
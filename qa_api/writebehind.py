@@ -0,0 +1,457 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DataError, IntegrityError, connections, transaction
+from django.dispatch import receiver
+from django.utils.dateparse import parse_datetime
+
+from . import cache
+from .logqueue import log_event
+from .models import Answer, Question, adjust_answers_count
+from .shards import shard_aliases, shard_for_id
+
+# Отложенная запись ответов (write-behind). Когда на один вопрос одновременно отвечают
+# тысячи пользователей, каждая вставка по отдельности конкурирует за одни и те же
+# страницы индексов. В этом режиме POST /api/questions/{id}/answers/ после валидации
+# присваивает ответу id и время, кладет его в буфер процесса и сразу отвечает 202,
+# а фоновый поток раз в FLUSH_INTERVAL_MS или по накоплении MAX_BATCH ответов пишет
+# их пачкой: на шард одна транзакция с проверкой вопросов, bulk_create, обновлением
+# answers_count и инвалидацией кэша. Шард — тот, где вопрос нашелся при приеме ответа
+# (он же записывается в журнал). Ответ становится виден в чтении после сброса.
+#
+# Надежность (DURABILITY):
+#   memory  — буфер только в памяти: при штатной остановке процесса он сбрасывается
+#             (atexit, worker_exit gunicorn), при аварийной (kill -9, OOM) принятые,
+#             но не записанные ответы теряются;
+#   journal — до ответа 202 запись дописывается в журнал процесса в JOURNAL_DIR и
+#             переживает аварию процесса; с JOURNAL_FSYNC — и отключение питания
+#             (fsync на каждый ответ, ценой пропускной способности). Журнал
+#             удаляется после записи в БД, журналы упавших процессов применяет
+#             следующий запуск (replay_journals).
+# Если буфер заполнен (MAX_PENDING), ответ пишется сразу, как без этого режима.
+# Ответ на вопрос, удаленный до сброса, отбрасывается (счетчик dropped). Пачка, не
+# записанная из-за недоступности БД, повторяется с пропуском уже записанных ответов
+# (часть шардов могла успеть закоммитить); ответ с ошибкой в данных не блокирует
+# очередь, а откладывается в dead letters (store_dead_letter)
+
+JOURNAL_PREFIX = 'answers-'
+DEAD_LETTER_PREFIX = 'dead-answers-'
+# Ошибки в данных ответа, а не недоступность БД: повтор той же пачки не поможет
+ROW_ERRORS = (IntegrityError, DataError)
+
+logger = logging.getLogger(__name__)
+
+
+def _answer_record(answer: Answer) -> str:
+    return json.dumps({
+        'id': answer.id,
+        'question_id': answer.question_id,
+        'shard': answer._state.db,
+        'user_id': str(answer.user_id),
+        'text': answer.text,
+        'created_at': answer.created_at.isoformat(),
+    }, ensure_ascii=False)
+
+
+def _answer_from_record(record: dict) -> Answer:
+    answer = Answer(
+        id=record['id'],
+        question_id=record['question_id'],
+        user_id=record['user_id'],
+        text=record['text'],
+        created_at=parse_datetime(record['created_at']),
+    )
+    # Шард, где вопрос был найден при приеме ответа, если он еще есть в QA_SHARDS
+    if record.get('shard') in shard_aliases():
+        answer._state.db = record['shard']
+    return answer
+
+
+# Ответ несет в _state.db шард, где его вопрос нашелся при приеме (submit): вопрос,
+# еще не перенесенный rebalance_shards, лежит не в шарде своего id
+def _answer_shard(answer: Answer) -> str:
+    return answer._state.db or shard_for_id(answer.question_id)
+
+
+def _group_answers(answers: list[Answer]) -> dict[str, list[Answer]]:
+    groups = defaultdict(list)
+    for answer in answers:
+        groups[_answer_shard(answer)].append(answer)
+    return dict(groups)
+
+
+# Шарды живых вопросов question_ids (по основным БД, не репликам)
+def _find_questions(question_ids: set[int]) -> dict[int, str]:
+    found = {}
+    for alias in shard_aliases():
+        missing = question_ids - found.keys()
+        if not missing:
+            break
+        found.update(dict.fromkeys(
+            Question.objects.using(alias).filter(pk__in=missing).values_list('pk', flat=True), alias))
+    return found
+
+
+# Одна транзакция на шард alias. Возвращает (записано, ответы без живого вопроса в alias)
+def _write_shard(alias: str, rows: list[Answer], skip_existing: bool) -> tuple[int, list[Answer]]:
+    with transaction.atomic(using=alias):
+        live = set(
+            Question.objects.using(alias)
+            .filter(pk__in={answer.question_id for answer in rows})
+            .values_list('pk', flat=True)
+        )
+        if skip_existing:
+            present = set(
+                Answer.all_objects.using(alias)
+                .filter(pk__in=[answer.pk for answer in rows])
+                .values_list('pk', flat=True)
+            )
+            rows = [answer for answer in rows if answer.pk not in present]
+        kept = [answer for answer in rows if answer.question_id in live]
+        missing = [answer for answer in rows if answer.question_id not in live]
+        if kept:
+            Answer.objects.using(alias).bulk_create(kept)
+            question_ids = Counter(answer.question_id for answer in kept)
+            adjust_answers_count(question_ids, using=alias)
+            cache.invalidate_questions(question_ids, using=alias)
+    return len(kept), missing
+
+
+# Запись пачки ответов: по транзакции на шард, где вопрос нашелся при приеме ответа.
+# Если вопрос с тех пор перенесен в другой шард, ответ пишется туда вторым проходом;
+# ответы на отсутствующие (или удаленные) вопросы отбрасываются, с skip_existing —
+# и уже записанные ответы (повтор пачки, применение журнала). Возвращает (записано, отброшено)
+def write_answers(answers: list[Answer], skip_existing: bool = False) -> tuple[int, int]:
+    written = dropped = 0
+    strays = []
+    for alias, rows in _group_answers(answers).items():
+        shard_written, missing = _write_shard(alias, rows, skip_existing)
+        written += shard_written
+        strays += missing
+    if strays:
+        found = _find_questions({answer.question_id for answer in strays})
+        dropped += sum(answer.question_id not in found for answer in strays)
+        for answer in strays:
+            answer._state.db = found.get(answer.question_id)
+        for alias, rows in _group_answers([answer for answer in strays if answer._state.db]).items():
+            shard_written, missing = _write_shard(alias, rows, skip_existing)
+            written += shard_written
+            dropped += len(missing)
+    return written, dropped
+
+
+# Пачка, в которой есть ответ с ошибкой в данных: ответы пишутся по одному,
+# не записанные передаются в dead_letter. Возвращает (записано, отброшено)
+def write_isolated(answers: list[Answer], dead_letter) -> tuple[int, int]:
+    written = dropped = 0
+    for answer in answers:
+        try:
+            answer_written, answer_dropped = write_answers([answer], skip_existing=True)
+        except ROW_ERRORS as exc:
+            dead_letter(answer, exc)
+            continue
+        written += answer_written
+        dropped += answer_dropped
+    return written, dropped
+
+
+# Ответ, который не удалось записать, попадает в лог с полной записью и, если
+# есть каталог журнала, в его файл dead-answers-<token>.jsonl — для ручного разбора
+def store_dead_letter(directory: Path | None, token: str, answer: Answer, exc: Exception) -> None:
+    record = _answer_record(answer)
+    log_event(logger, 'write_behind_dead_letter', "Ответ не записан из-за ошибки в данных",
+              level=logging.ERROR, answer_id=answer.id, question_id=answer.question_id, error=exc, record=record)
+    if directory is None:
+        return
+    with open(os.path.join(directory, f'{DEAD_LETTER_PREFIX}{token}.jsonl'), 'a', encoding='utf-8') as dead_file:
+        dead_file.write(record + '\n')
+        dead_file.flush()
+        os.fsync(dead_file.fileno())
+
+
+# Журнал процесса: сегменты answers-<token>-<N>.wal (JSON-строка на ответ) и файл
+# блокировки answers-<token>.lock, который процесс держит, пока жив. Сегмент
+# закрывается, когда буфер опустел, и удаляется после записи его ответов в БД
+class Journal:
+    def __init__(self, directory: Path, fsync: bool = False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.token = f'{os.getpid()}-{secrets.token_hex(4)}'
+        self._lock_file = open(self.directory / f'{JOURNAL_PREFIX}{self.token}.lock', 'w')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._segment = None
+        self._sequence = 0
+        self.sealed: list[Path] = []
+
+    def append(self, answer: Answer) -> None:
+        if self._segment is None:
+            self._sequence += 1
+            path = self.directory / f'{JOURNAL_PREFIX}{self.token}-{self._sequence:06d}.wal'
+            self._segment = open(path, 'a', encoding='utf-8')
+        self._segment.write(_answer_record(answer) + '\n')
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+
+    # Закрывает текущий сегмент; возвращает все закрытые, но еще не удаленные
+    def seal(self) -> list[Path]:
+        if self._segment is not None:
+            os.fsync(self._segment.fileno())
+            self._segment.close()
+            self.sealed.append(Path(self._segment.name))
+            self._segment = None
+        return list(self.sealed)
+
+    def remove(self, paths: list[Path]) -> None:
+        for path in paths:
+            path.unlink(missing_ok=True)
+            self.sealed.remove(path)
+
+    def close(self) -> None:
+        if self._segment is None and not self.sealed:
+            os.unlink(self._lock_file.name)
+        self._lock_file.close()
+
+
+def _read_segment(path: str) -> list[Answer]:
+    answers = []
+    with open(path, encoding='utf-8') as segment:
+        for line in segment:
+            try:
+                answers.append(_answer_from_record(json.loads(line)))
+            except (ValueError, KeyError, TypeError):
+                # Оборванная последняя строка: процесс упал посреди записи, 202 не отправлен
+                continue
+    return answers
+
+
+# Применяет журналы процессов, которые больше не держат блокировку (упали или
+# остановились, не успев записать буфер). Ответы, уже попавшие в БД, пропускаются
+def replay_journals(directory: Path) -> int:
+    replayed = 0
+    for lock_path in sorted(glob.glob(os.path.join(directory, f'{JOURNAL_PREFIX}*.lock'))):
+        token = os.path.basename(lock_path)[len(JOURNAL_PREFIX):-len('.lock')]
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            segments = sorted(glob.glob(os.path.join(directory, f'{JOURNAL_PREFIX}{token}-*.wal')))
+            for path in segments:
+                answers = _read_segment(path)
+                try:
+                    written, dropped = write_answers(answers, skip_existing=True) if answers else (0, 0)
+                except ROW_ERRORS:
+                    written, dropped = write_isolated(
+                        answers, lambda answer, exc: store_dead_letter(directory, token, answer, exc))
+                os.unlink(path)
+                replayed += written
+                log_event(logger, 'write_behind_replayed', "Применен журнал отложенной записи",
+                          segment=os.path.basename(path), written=written, skipped=len(answers) - written)
+            os.unlink(lock_path)
+    return replayed
+
+
+class WriteBehind:
+    def __init__(self, config: dict[str, Any]):
+        durability = config.get('DURABILITY') or 'memory'
+        if durability not in ('memory', 'journal'):
+            raise ValueError(f"Неизвестный режим надежности отложенной записи: {durability}")
+        self.flush_interval = int(config.get('FLUSH_INTERVAL_MS') or 50) / 1000
+        self.batch_size = int(config.get('MAX_BATCH') or 500)
+        self.max_pending = int(config.get('MAX_PENDING') or 20000)
+        self.journal_dir = Path(config.get('JOURNAL_DIR') or 'journal')
+        self.journal = Journal(self.journal_dir, bool(config.get('JOURNAL_FSYNC'))) if durability == 'journal' else None
+        self._cond = threading.Condition()
+        self._pending: list[Answer] = []
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.accepted = self.written = self.dropped = self.fallbacks = 0
+        self.batches = self.errors = self.dead_letters = 0
+        self.flush_seconds = 0.0
+        # Сколько ответов в начале буфера, возможно, уже записаны неудачной попыткой
+        self._uncertain = 0
+
+    # Ответ пишется в шард alias, где представление только что прочитало живой вопрос
+    # (так же, как без отложенной записи: на удаленный вопрос — 404, а не 202).
+    # False — буфер заполнен, ответ нужно записать сразу
+    def submit(self, answer: Answer, alias: str) -> bool:
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.fallbacks += 1
+                return False
+            answer._state.db = alias
+            if self.journal is not None:
+                self.journal.append(answer)
+            self._pending.append(answer)
+            self.accepted += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name='qa-answer-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        if self.journal is not None:
+            self._replay()
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or len(self._pending) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+            for connection in connections.all(initialized_only=True):
+                connection.close_if_unusable_or_obsolete()
+
+    def _replay(self) -> None:
+        try:
+            replay_journals(self.journal_dir)
+        except Exception:
+            logger.exception("Не удалось применить журналы отложенной записи")
+
+    def _dead_letter(self, answer: Answer, exc: Exception) -> None:
+        with self._cond:
+            self.dead_letters += 1
+        if self.journal is not None:
+            store_dead_letter(self.journal_dir, self.journal.token, answer, exc)
+        else:
+            store_dead_letter(None, str(os.getpid()), answer, exc)
+
+    # Пишет накопленные ответы пачками по MAX_BATCH. Если БД недоступна, пачка
+    # возвращается в начало буфера и при следующем сбросе пишется с пропуском уже
+    # записанных ответов; ответы с ошибкой в данных уходят в dead letters
+    def flush(self) -> int:
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:self.batch_size]
+                    sealed = self.journal.seal() if self.journal is not None and not self._pending else []
+                if not batch:
+                    return written
+                started = time.perf_counter()
+                try:
+                    try:
+                        batch_written, batch_dropped = write_answers(batch, skip_existing=self._uncertain > 0)
+                    except ROW_ERRORS:
+                        batch_written, batch_dropped = write_isolated(batch, self._dead_letter)
+                except Exception:
+                    with self._cond:
+                        self._pending[:0] = batch
+                        self._uncertain = len(batch)
+                        self.errors += 1
+                    logger.exception("Не удалось записать пачку отложенных ответов (%s)", len(batch))
+                    return written
+                self._uncertain = 0
+                elapsed = time.perf_counter() - started
+                if self.journal is not None and sealed:
+                    self.journal.remove(sealed)
+                with self._cond:
+                    self.written += batch_written
+                    self.dropped += batch_dropped
+                    self.batches += 1
+                    self.flush_seconds += elapsed
+                written += batch_written
+                if batch_dropped:
+                    log_event(logger, 'write_behind_dropped', "Отброшены ответы на удаленные вопросы",
+                              level=logging.WARNING, dropped=batch_dropped)
+
+    # Останавливает поток и дописывает буфер в вызывающем потоке
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+        if self.journal is not None:
+            self.journal.close()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'accepted': self.accepted,
+                'written': self.written,
+                'dropped': self.dropped,
+                'fallbacks': self.fallbacks,
+                'batches': self.batches,
+                'errors': self.errors,
+                'dead_letters': self.dead_letters,
+                'flush_seconds': round(self.flush_seconds, 6),
+            }
+
+
+_writer: WriteBehind | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehind | None:
+    global _writer
+    config = getattr(settings, 'QA_WRITE_BEHIND', None) or {}
+    if not config.get('ENABLED'):
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehind(config)
+    return _writer
+
+
+# Сброс буфера при остановке процесса (atexit, worker_exit gunicorn)
+def shutdown() -> None:
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+# Состояние буфера процесса — для /api/stats/ и /metrics
+def writer_stats() -> dict[str, Any]:
+    writer = _writer
+    if writer is None:
+        return {'enabled': False}
+    return {'enabled': True, **writer.stats()}
+
+
+@receiver(setting_changed)
+def _reset_writer(setting, **kwargs):
+    if setting == 'QA_WRITE_BEHIND':
+        shutdown()
+
+
+# Буфер и поток записи остаются родителю (мастеру gunicorn), дочерний процесс
+# начинает с пустого
+def _after_fork() -> None:
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,53 @@
+# Хуки gunicorn для python manage.py serve; параметры запуска (bind, workers и т.д.)
+# передает сама команда. Приложение загружается в мастере до fork (preload_app),
+# поэтому соединения с БД, открытые при импорте, мастер закрывает до запуска
+# воркеров — иначе воркеры унаследуют общий сокет и мертвые потоки пула
+import glob
+import os
+
+
+# Снимки метрик прошлого запуска сервера не должны попасть в счетчики нового
+def on_starting(server):
+    directory = os.environ.get('METRICS_DIR')
+    for path in glob.glob(os.path.join(directory, '*.json')) if directory else []:
+        os.remove(path)
+
+
+# Журналы отложенной записи, оставшиеся от упавших воркеров прошлого запуска,
+# применяются до запуска новых воркеров (без preload — потоком записи воркера при первом ответе)
+def when_ready(server):
+    from django.apps import apps
+    from django.conf import settings
+    from django.db import connections
+
+    from qa_api.pool import close_pools
+
+    config = settings.QA_WRITE_BEHIND
+    if apps.ready and config['ENABLED'] and config['DURABILITY'] == 'journal' and config['JOURNAL_DIR'].is_dir():
+        from qa_api.writebehind import replay_journals
+
+        replay_journals(config['JOURNAL_DIR'])
+    connections.close_all()
+    close_pools()
+
+
+# Буфер отложенной записи воркера дописывается до его завершения, метрики
+# последней секунды сбрасываются в его снимок
+def worker_exit(server, worker):
+    from qa_api import metrics
+    from qa_api.writebehind import shutdown
+
+    shutdown()
+    metrics.flush()
+
+
+# Снимок метрик завершившегося воркера переносится в общий снимок exited.json:
+# файлы не копятся при перезапуске воркеров, а новый воркер с тем же pid
+# не затирает счетчики прежнего
+def child_exit(server, worker):
+    from django.apps import apps
+
+    if apps.ready:
+        from qa_api.metrics import fold_worker
+
+        fold_worker(worker.pid)
@@ -34,6 +34,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым — чтобы время запроса включало остальные middleware
+    'qa_api.metrics.metrics_middleware',
+    'qa_api.admission.AdmissionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -41,6 +44,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'qa_api.middleware.primary_stickiness_middleware',
 ]
 
 ROOT_URLCONF = 'qa_project.urls'
@@ -68,20 +72,158 @@ WSGI_APPLICATION = 'qa_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+DB_ENGINE = os.environ.get('DB_ENGINE') or 'django.db.backends.postgresql'
+IS_SQLITE = DB_ENGINE == 'django.db.backends.sqlite3'
+
+# Соединения с PostgreSQL берутся из пула psycopg (DB_POOL, по умолчанию включен):
+# соединение выдается на время запроса и возвращается в пул, рукопожатие и
+# аутентификация не повторяются на каждый запрос. Без пула (и для SQLite) —
+# постоянные соединения на DB_CONN_MAX_AGE секунд с проверкой перед повторным
+# использованием. Каждый алиас (реплики, шарды) получает свой пул с теми же параметрами
+DB_POOL = not IS_SQLITE and (os.environ.get('DB_POOL') or 'true').lower() in ('1', 'true', 'yes', 'on')
+DB_OPTIONS = {}
+if not IS_SQLITE:
+    DB_OPTIONS['connect_timeout'] = int(os.environ.get('DB_CONNECT_TIMEOUT') or 5)
+if DB_POOL:
+    DB_OPTIONS['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE') or 2),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE') or 10),
+        # Соединение пересоздается после max_lifetime и закрывается после max_idle простоя, с
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME') or 1800),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE') or 300),
+        # Сколько запрос ждет свободное соединение, прежде чем упасть с ошибкой, с
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT') or 10),
+    }
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.environ.get('DB_NAME'),
+        'ENGINE': DB_ENGINE,
+        'NAME': os.environ.get('DB_NAME') or (BASE_DIR / 'db.sqlite3' if IS_SQLITE else None),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
-        'TEST': {
+        'OPTIONS': DB_OPTIONS,
+        # С пулом соединения не должны жить дольше запроса — ими управляет пул
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE') or 60),
+        'CONN_HEALTH_CHECKS': not DB_POOL,
+        # SQLite в тестах — в памяти
+        'TEST': {} if IS_SQLITE else {
             'NAME': 'test_db',
         },
     }
 }
 
+# Реплики только для чтения: DB_REPLICAS=host1[:port],host2[:port] (для SQLite —
+# пути к файлам). Остальные параметры подключения — как у основной БД. В тестах
+# реплики зеркалируют основную БД
+QA_DATABASE_REPLICAS = []
+for _index, _location in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    _replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if IS_SQLITE:
+        _replica['NAME'] = _location.strip()
+    else:
+        _host, _, _port = _location.strip().partition(':')
+        _replica.update(HOST=_host, PORT=_port or DATABASES['default']['PORT'])
+    DATABASES[f'replica{_index}'] = _replica
+    QA_DATABASE_REPLICAS.append(f'replica{_index}')
+
+# Шарды вопросов и ответов: DB_SHARDS=host1[:port],host2[:port] (для SQLite — пути
+# к файлам) — БД shard1, shard2... в дополнение к default. DB_SHARD_MAP задает,
+# какие виртуальные шарды где лежат: "0-511:default,512-1023:shard1" (по умолчанию
+# поровну). После изменения списка шардов или карты — manage.py rebalance_shards
+QA_SHARDS = ['default']
+for _index, _location in enumerate(filter(None, os.environ.get('DB_SHARDS', '').split(',')), start=1):
+    _shard = {**DATABASES['default'], 'TEST': {} if IS_SQLITE else {'NAME': f'test_db_shard{_index}'}}
+    if IS_SQLITE:
+        _shard['NAME'] = _location.strip()
+    else:
+        _host, _, _port = _location.strip().partition(':')
+        _shard.update(HOST=_host, PORT=_port or DATABASES['default']['PORT'])
+    DATABASES[f'shard{_index}'] = _shard
+    QA_SHARDS.append(f'shard{_index}')
+QA_SHARD_MAP = os.environ.get('DB_SHARD_MAP', '')
+
+DATABASE_ROUTERS = ['qa_api.shards.ShardRouter', 'qa_api.routers.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной БД (read-your-writes)
+QA_PRIMARY_STICKY_SECONDS = int(os.environ.get('DB_STICKY_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# По умолчанию — память процесса; для нескольких процессов укажите общий бэкенд,
+# например CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'qa-api'),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+    }
+}
+
+# Алиас из CACHES для кэша ответов API вопросов
+QA_CACHE_ALIAS = 'default'
+
+# Каталог сжатых сегментов архива старых ответов и вопросов (manage.py archive_cold)
+QA_ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', BASE_DIR / 'archive'))
+
+# Контроль допуска и сброс нагрузки (qa_api/admission.py). Лимиты — на процесс:
+# concurrency — одновременных запросов маршрута (сверх — 503), rate/burst — корзина
+# токенов в секунду на клиента или пользователя (сверх — 429), priority — доля
+# MAX_INFLIGHT, доступная маршруту: дорогие выборки отклоняются раньше дешевых чтений
+ADMISSION_SCALE = float(os.environ.get('ADMISSION_SCALE') or 1)
+QA_ADMISSION = {
+    'ENABLED': (os.environ.get('ADMISSION_ENABLED') or 'true').lower() in ('1', 'true', 'yes', 'on'),
+    'MAX_INFLIGHT': int(os.environ.get('ADMISSION_MAX_INFLIGHT') or 64),
+    'PRIORITY_SHARE': {'cheap': 1.0, 'normal': 0.9, 'expensive': 0.5},
+    'RETRY_AFTER': 1,
+    # За обратным прокси клиента определяет первый адрес X-Forwarded-For
+    'TRUST_X_FORWARDED_FOR': (os.environ.get('ADMISSION_TRUST_PROXY') or '').lower() in ('1', 'true', 'yes', 'on'),
+    'ROUTES': {
+        'qa_api:question-list-create GET': {'priority': 'expensive', 'concurrency': 16,
+                                            'rate': 20 * ADMISSION_SCALE, 'burst': 60 * ADMISSION_SCALE},
+        'qa_api:async-question-list GET': {'priority': 'expensive', 'concurrency': 16,
+                                           'rate': 20 * ADMISSION_SCALE, 'burst': 60 * ADMISSION_SCALE},
+        'qa_api:question-list-create POST': {'rate': 5 * ADMISSION_SCALE, 'burst': 30 * ADMISSION_SCALE},
+        'qa_api:search': {'priority': 'expensive', 'concurrency': 8,
+                          'rate': 10 * ADMISSION_SCALE, 'burst': 30 * ADMISSION_SCALE},
+        'qa_api:export': {'priority': 'expensive', 'concurrency': 2, 'rate': 1, 'burst': 5},
+        'qa_api:question-bulk-create': {'priority': 'expensive', 'concurrency': 4},
+        'qa_api:question-bulk-delete': {'priority': 'expensive', 'concurrency': 2},
+        'qa_api:answer-bulk-create': {'priority': 'expensive', 'concurrency': 4},
+        'qa_api:user-answers': {'key': 'user_id', 'rate': 20 * ADMISSION_SCALE, 'burst': 60 * ADMISSION_SCALE},
+        'qa_api:answer-create POST': {'key': 'user_id', 'rate': 10 * ADMISSION_SCALE, 'burst': 50 * ADMISSION_SCALE},
+        'qa_api:question-detail GET': {'priority': 'cheap'},
+        'qa_api:answer-detail GET': {'priority': 'cheap'},
+        'qa_api:answer-create GET': {'priority': 'cheap'},
+        'qa_api:async-question-detail': {'priority': 'cheap'},
+        'qa_api:async-answer-detail': {'priority': 'cheap'},
+        'qa_api:stats': {'priority': 'cheap'},
+        'metrics': {'priority': 'cheap'},
+    },
+}
+
+# Каталог снимков метрик процессов (GET /metrics суммирует их); пусто — метрики
+# только текущего процесса. manage.py serve задает его для воркеров gunicorn
+QA_METRICS_DIR = os.environ.get('METRICS_DIR') or ''
+
+# Отложенная запись ответов (qa_api/writebehind.py): POST ответа возвращает 202 после
+# валидации, ответы пишутся пачками каждые FLUSH_INTERVAL_MS или по MAX_BATCH штук.
+# DURABILITY: memory — незаписанные ответы теряются при аварии процесса; journal —
+# ответ до 202 дописывается в журнал JOURNAL_DIR (с JOURNAL_FSYNC — с fsync),
+# журналы упавших процессов применяются при следующем запуске
+QA_WRITE_BEHIND = {
+    'ENABLED': (os.environ.get('WRITE_BEHIND_ENABLED') or '').lower() in ('1', 'true', 'yes', 'on'),
+    'FLUSH_INTERVAL_MS': int(os.environ.get('WRITE_BEHIND_INTERVAL_MS') or 50),
+    'MAX_BATCH': int(os.environ.get('WRITE_BEHIND_MAX_BATCH') or 500),
+    'MAX_PENDING': int(os.environ.get('WRITE_BEHIND_MAX_PENDING') or 20000),
+    'DURABILITY': os.environ.get('WRITE_BEHIND_DURABILITY') or 'journal',
+    'JOURNAL_DIR': Path(os.environ.get('WRITE_BEHIND_JOURNAL_DIR') or BASE_DIR / 'journal'),
+    'JOURNAL_FSYNC': (os.environ.get('WRITE_BEHIND_FSYNC') or '').lower() in ('1', 'true', 'yes', 'on'),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -163,14 +305,24 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
         },
+        # Запросы только кладут записи в очередь; в файл и консоль их пишет
+        # фоновый поток пачками. При переполнении новые записи отбрасываются
+        'queue': {
+            '()': 'qa_api.logqueue.NonBlockingQueueHandler',
+            'targets': ['console', 'file'],
+            'maxsize': int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+            'batch_size': 200,
+            'flush_interval': 0.5,
+            'drop_policy': os.environ.get('LOG_DROP_POLICY', 'drop_newest'),
+        },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
     'loggers': {
         'qa_api': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'DEBUG',
             'propagate': False,
         },
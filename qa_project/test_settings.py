@@ -0,0 +1,15 @@
+# Настройки тестов (pytest.ini). Без DB_ENGINE тесты идут на SQLite в памяти с
+# репликой и двумя шардами, так что тесты маршрутизации, шардов и реплик выполняются
+# без внешних БД. Заданные переменные DB_* имеют приоритет: с DB_ENGINE тот же набор
+# тестов запускается на PostgreSQL, DB_SHARDS= и DB_REPLICAS= отключают шарды и реплики
+import os
+from pathlib import Path
+
+if not os.environ.get('DB_ENGINE'):
+    _base = Path(__file__).resolve().parent.parent
+    os.environ['DB_ENGINE'] = 'django.db.backends.sqlite3'
+    os.environ.setdefault('DB_NAME', str(_base / 'test_db.sqlite3'))
+    os.environ.setdefault('DB_REPLICAS', str(_base / 'test_replica.sqlite3'))
+    os.environ.setdefault('DB_SHARDS', f"{_base / 'test_shard1.sqlite3'},{_base / 'test_shard2.sqlite3'}")
+
+from .settings import *  # noqa: E402,F401,F403
@@ -5,6 +5,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from qa_api.metrics import metrics_view
+
 
 
 schema_view = get_schema_view(
@@ -21,5 +23,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('qa_api.urls')),
     path('swagger/', schema_view.with_ui('swagger'), name='schema-swagger-ui'),
+    path('metrics', metrics_view, name='metrics'),
 
 ]